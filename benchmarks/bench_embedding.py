@@ -0,0 +1,71 @@
+"""
+Embeddings/sec of the length-bucketed pipeline in embedding.py against a
+single naive model.encode(texts).tolist() call, on synthetic articles of
+mixed length.
+
+    python benchmarks/bench_embedding.py --n 2000 --batch-size 32
+    python benchmarks/bench_embedding.py --backend onnx \\
+        --onnx-file onnx/model_qint8_avx512_vnni.onnx
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import embedding
+
+WORDS = "market model release data policy research climate energy health chip".split()
+
+
+def synthetic_texts(n, seed=0):
+    rng = random.Random(seed)
+    # mostly short titles/summaries with a long tail of full articles
+    lengths = [int(rng.paretovariate(1.2) * 20) for _ in range(n)]
+    return [" ".join(rng.choices(WORDS, k=min(k, 600))) for k in lengths]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--model", default=embedding.DEFAULT_MODEL_NAME)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-seq-length", type=int)
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--onnx-file")
+    args = parser.parse_args()
+
+    embedding._config = {
+        "embedding_model": args.model,
+        "embedding_device": "cpu",
+        "embedding_backend": args.backend,
+        "embedding_onnx_file": args.onnx_file,
+        "embedding_max_seq_length": args.max_seq_length,
+        "embedding_threads": args.threads,
+    }
+    texts = synthetic_texts(args.n)
+    model = embedding.get_model()
+    # warm up kernels and the tokenizer
+    embedding.compute_embeddings(texts[:64], batch_size=args.batch_size)
+
+    naive = timed(lambda: model.encode(texts, show_progress_bar=False).tolist())
+    bucketed = timed(
+        lambda: embedding.compute_embeddings(texts, batch_size=args.batch_size)
+    )
+    print(f"{args.n} texts, backend={args.backend}, batch_size={args.batch_size}")
+    print(f"naive encode + tolist  {args.n / naive:8.1f} embeddings/s")
+    print(f"bucketed float32       {args.n / bucketed:8.1f} embeddings/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Per-rerun filter evaluation time of the columnar FilterColumns engine against
+the per-object Newsletter.filters loops it replaced, on synthetic articles.
+
+    python benchmarks/bench_filters.py --n 100000
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from filter_engine import FilterColumns
+from newsletter import Newsletter
+
+WORDS = "ai health market trial drug cancer data model policy study".split()
+
+
+def articles(n, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    return [
+        Newsletter(
+            title=" ".join(rng.choices(WORDS, k=8)) + f" {i}",
+            content="",
+            publication_date=start + timedelta(minutes=rng.randrange(365 * 24 * 60)),
+            url=f"https://example.com/{i}",
+            filters={"AI_filter": {"match": rng.random() < 0.3}},
+        )
+        for i in range(n)
+    ]
+
+
+def dict_filters(newsletters, start, end, selected):
+    """The app's filter loops before the columnar engine."""
+    for n in newsletters:
+        n.filters["date_filter"] = (
+            n.publication_date.date() >= start and n.publication_date.date() <= end
+        )
+    date_count = sum(1 for n in newsletters if n.filters.get("date_filter") is True)
+    filtered = [
+        n
+        for n in newsletters
+        if all(
+            (n.filters.get(f) is True)
+            or (isinstance(n.filters.get(f), dict) and n.filters[f].get("match"))
+            for f in selected
+        )
+    ]
+    return date_count, len(filtered)
+
+
+def columnar_filters(columns, start, end, selected):
+    date_count = np.count_nonzero(columns.date_range(start, end))
+    return date_count, np.count_nonzero(columns.combine(selected))
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    newsletters = articles(args.n)
+    start, end = date(2025, 3, 1), date(2025, 6, 30)
+    selected = ["date_filter", "AI_filter", "health"]
+
+    build, columns = timed(lambda: FilterColumns(newsletters), 1)
+    keyword, _ = timed(lambda: columns.keyword("health"), args.repeat)
+    for n in newsletters:
+        n.filters["health"] = {"match": "health" in n.title.lower()}
+    loop, loop_counts = timed(
+        lambda: dict_filters(newsletters, start, end, selected), args.repeat
+    )
+    counts = columnar_filters(columns, start, end, selected)
+    assert counts == loop_counts, (counts, loop_counts)
+    # a rerun with an unchanged date range reuses the date column
+    cached, _ = timed(
+        lambda: columnar_filters(columns, start, end, selected), args.repeat
+    )
+    ranges = itertools.cycle([(date(2025, 1, 1), end), (start, end)])
+    changed, _ = timed(
+        lambda: columnar_filters(columns, *next(ranges), selected), args.repeat
+    )
+    print(f"{args.n} articles, {counts[0]} in date range, {counts[1]} pass all filters")
+    print(f"columnar build {build * 1e3:8.1f} ms  keyword {keyword * 1e3:6.2f} ms")
+    print(f"dict loops     {loop * 1e3:8.2f} ms/rerun")
+    print(f"columnar       {cached * 1e6:8.1f} us/rerun")
+    print(f"  new range    {changed * 1e6:8.1f} us/rerun")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Entries/sec of ingest's entry normalization (title/content cleanup, date
+parsing, Newsletter construction) against the regex-per-call and dateutil
+version it replaced, on the bundled feed.
+
+    python benchmarks/bench_ingest.py --feed data/master_feed.xml --repeat 5
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import feedparser
+from dateutil import parser as date_parser
+
+from ingest import entry_id, newsletter_from_entry
+from newsletter import Newsletter
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+def old_newsletter_from_entry(entry) -> Newsletter:
+    """newsletter_from_entry before the normalization stage was optimized."""
+
+    def strip_html_tags(text):
+        return re.sub(r"<[^>]+>", "", text)
+
+    title = strip_html_tags(entry.get("title", "")).replace("STAT+:", "").strip()
+    url = entry.get("link", "")
+    domain = [urlparse(url).netloc] if url else None
+    return Newsletter(
+        title=title,
+        content=entry.get("summary", ""),
+        publication_date=date_parser.parse(entry.get("published", "")),
+        url=url,
+        domain=domain[0] if domain else None,
+        guid=entry_id(entry),
+    )
+
+
+def entries_per_second(fn, entries, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for entry in entries:
+            fn(entry)
+        best = min(best, time.perf_counter() - start)
+    return len(entries) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--feed", default=os.path.join(ROOT, "data", "master_feed.xml"))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    entries = feedparser.parse(args.feed).entries
+    parse_seconds = time.perf_counter() - start
+    print(
+        f"{len(entries)} entries, feedparser {len(entries) / parse_seconds:9.0f} entries/s"
+    )
+    before = entries_per_second(old_newsletter_from_entry, entries, args.repeat)
+    after = entries_per_second(newsletter_from_entry, entries, args.repeat)
+    print(f"normalize before  {before:9.0f} entries/s")
+    print(f"normalize after   {after:9.0f} entries/s ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
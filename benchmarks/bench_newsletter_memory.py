@@ -0,0 +1,80 @@
+"""
+Bytes per article of the slotted Newsletter against the plain dataclass it
+replaced, on synthetic feed entries.
+
+    python benchmarks/bench_newsletter_memory.py --n 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from newsletter import Newsletter
+
+WORDS = "market model release data policy research climate energy health chip".split()
+DOMAINS = ["tech", "health", "finance", "science", "policy"]
+
+
+@dataclass
+class DataclassNewsletter:
+    """The Newsletter definition before it was slotted."""
+
+    title: str
+    content: str
+    publication_date: datetime
+    url: Optional[str] = None
+    embedding: Optional[List[float]] = None
+    tsne: Optional[List[float]] = None
+    filters: Dict[str, Any] = None
+    full_text: Optional[str] = None
+    user_selected: bool = False
+    domain: Optional[str] = None
+    guid: Optional[str] = None
+
+
+def entries(n, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    for i in range(n):
+        words = rng.choices(WORDS, k=rng.randint(40, 400))
+        yield dict(
+            title=" ".join(rng.choices(WORDS, k=8)),
+            content=" ".join(words),
+            publication_date=start + timedelta(minutes=i),
+            url=f"https://example.com/{i}",
+            filters={"date_filter": rng.random() < 0.5},
+            # domain strings come from parsing each entry, so they are not shared
+            domain="".join(rng.choice(DOMAINS)),
+            guid=f"guid-{i}",
+        )
+
+
+def bytes_per_article(cls, n):
+    tracemalloc.start()
+    articles = [cls(**e) for e in entries(n)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del articles
+    return size / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=100000)
+    args = parser.parse_args()
+    before = bytes_per_article(DataclassNewsletter, args.n)
+    after = bytes_per_article(Newsletter, args.n)
+    print(f"{args.n} articles")
+    print(f"dataclass  {before:8.0f} bytes/article")
+    print(f"slotted    {after:8.0f} bytes/article ({before / after:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
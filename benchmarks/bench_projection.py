@@ -0,0 +1,72 @@
+"""
+Runtime and trustworthiness (neighborhood preservation, 1.0 is perfect) of
+the 2-D projection backends in clustering.py on synthetic clustered
+embeddings, plus the time to build the scatter plot for each size.
+
+    python benchmarks/bench_projection.py --sizes 1000 10000 100000
+
+t-SNE is skipped above --tsne-max points; UMAP runs when umap-learn is installed.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from clustering import project_2d, umap_available
+
+
+def clustered_embeddings(n, dim, clusters=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    X = centers[rng.integers(0, clusters, n)] + 0.5 * rng.normal(size=(n, dim))
+    return (X / np.linalg.norm(X, axis=1, keepdims=True)).astype(np.float32)
+
+
+def trustworthiness(X, Y, sample=2000, seed=0):
+    from sklearn.manifold import trustworthiness as score
+
+    rows = np.random.default_rng(seed).permutation(len(X))[:sample]
+    return score(X[rows], Y[rows], n_neighbors=10)
+
+
+def plot_seconds(Y):
+    import pandas as pd
+    import plotly.express as px
+
+    df = pd.DataFrame(Y, columns=["x", "y"])
+    df["title"] = [f"article {i}" for i in range(len(Y))]
+    start = time.perf_counter()
+    fig = px.scatter(df, x="x", y="y", hover_name="title", render_mode="webgl")
+    fig.to_json()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--tsne-max", type=int, default=10000)
+    args = parser.parse_args()
+    methods = ["tsne", "pca"] + (["umap"] if umap_available() else [])
+    for n in args.sizes:
+        X = clustered_embeddings(n, args.dim)
+        for method in methods:
+            if method == "tsne" and n > args.tsne_max:
+                continue
+            start = time.perf_counter()
+            Y = project_2d(X, method=method, random_state=0)
+            seconds = time.perf_counter() - start
+            print(
+                f"n={n:>6} {method:5} {seconds:8.2f} s  "
+                f"trustworthiness {trustworthiness(X, Y):.3f}"
+            )
+        print(f"n={n:>6} scatter plot {plot_seconds(Y):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Import time of the app modules, each measured in a fresh interpreter.
+
+    python benchmarks/bench_startup.py --repeat 3
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+ROOT = os.path.join(SRC, "..")
+MODULES = [
+    "embedding",
+    "clustering",
+    "grouping",
+    "llm_tagging",
+    "web_search",
+    "visualization",
+]
+
+TIMER = (
+    "import sys, time; sys.path.insert(0, {src!r}); "
+    "start = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def import_seconds(module, repeat):
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", TIMER.format(src=SRC, module=module)],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+    for module in args.modules:
+        print(f"{module:<16} {import_seconds(module, args.repeat) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Lookup and digest fan-out time of the indexed SubscriptionStore against the
+list-scanning store it replaced, on synthetic users and newsletters.
+
+    python benchmarks/bench_subscription_store.py --subscriptions 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from newsletter import Newsletter
+from subscription import Subscription
+from subscription_store import SubscriptionStore
+from user import User
+
+
+class ListSubscriptionStore:
+    """The SubscriptionStore lookups before they were indexed."""
+
+    def __init__(self):
+        self._subscriptions: List[Subscription] = []
+
+    def create(self, subscription: Subscription) -> None:
+        self._subscriptions.append(subscription)
+
+    def read(self, user_email: str, newsletter_title: str) -> Optional[Subscription]:
+        for s in self._subscriptions:
+            if s.user.email == user_email and s.newsletter.title == newsletter_title:
+                return s
+        return None
+
+    def subscribers(self, newsletter_title: str) -> List[User]:
+        return [
+            s.user
+            for s in self._subscriptions
+            if s.newsletter.title == newsletter_title
+        ]
+
+
+def subscriptions(n, per_user, n_newsletters, seed=0):
+    rng = random.Random(seed)
+    newsletters = [
+        Newsletter(
+            title=f"newsletter {i}", content="", publication_date=datetime(2025, 1, 1)
+        )
+        for i in range(n_newsletters)
+    ]
+    subs = []
+    for i in range(n // per_user):
+        user = User(email=f"user{i}@example.com", password_hash="")
+        for newsletter in rng.sample(newsletters, per_user):
+            subs.append(Subscription(user, newsletter, datetime(2025, 1, 1)))
+    return subs
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subscriptions", type=int, default=100000)
+    parser.add_argument("--per-user", type=int, default=10)
+    parser.add_argument("--newsletters", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    subs = subscriptions(args.subscriptions, args.per_user, args.newsletters)
+    probes = random.Random(1).sample(subs, args.lookups)
+    titles = sorted({s.newsletter.title for s in subs})[: args.lookups]
+    print(f"{len(subs)} subscriptions, {args.lookups} lookups / fan-outs")
+    for name, cls in (
+        ("list scan", ListSubscriptionStore),
+        ("indexed", SubscriptionStore),
+    ):
+        store = cls()
+        build = timed(lambda: [store.create(s) for s in subs])
+        read = timed(
+            lambda: [store.read(s.user.email, s.newsletter.title) for s in probes]
+        )
+        fan_out = timed(lambda: [store.subscribers(t) for t in titles])
+        print(
+            f"{name:10} build {build * 1e3:8.1f} ms  "
+            f"read {read / len(probes) * 1e6:10.1f} us/op  "
+            f"subscribers {fan_out / len(titles) * 1e6:10.1f} us/op"
+        )
+
+
+if __name__ == "__main__":
+    main()
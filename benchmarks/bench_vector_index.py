@@ -0,0 +1,69 @@
+"""
+Recall/latency of the approximate vector index backends against exact search.
+
+    python benchmarks/bench_vector_index.py --n 100000 --dim 384
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from vector_index import ExactIndex, IVFIndex, hnswlib_available, make_vector_index
+
+
+def clustered_vectors(n, dim, n_clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    labels = rng.integers(0, n_clusters, size=n)
+    return (centers[labels] + 0.5 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def bench(name, index, keys, X, queries, k, truth):
+    start = time.perf_counter()
+    index.add(keys, X)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    results = [index.search(q, k=k) for q in queries]
+    query_ms = (time.perf_counter() - start) / len(queries) * 1000
+    if truth is None:
+        recall = "  (reference)"
+    else:
+        hits = [len(t & {key for key, _ in r}) / k for t, r in zip(truth, results)]
+        recall = f"  recall@{k} {np.mean(hits):.3f}"
+    print(f"{name:>8}: build {build_s:7.2f}s  query {query_ms:8.3f} ms{recall}")
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--clusters", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--nprobe", type=int, default=8)
+    args = ap.parse_args()
+
+    X = clustered_vectors(args.n, args.dim, args.clusters)
+    keys = [str(i) for i in range(args.n)]
+    rng = np.random.default_rng(1)
+    queries = X[rng.choice(args.n, args.queries, replace=False)]
+    print(f"n={args.n} dim={args.dim} queries={args.queries}")
+
+    exact = ExactIndex()
+    results = bench("exact", exact, keys, X, queries, args.k, None)
+    truth = [{key for key, _ in r} for r in results]
+    bench("ivf", IVFIndex(nprobe=args.nprobe), keys, X, queries, args.k, truth)
+    if hnswlib_available():
+        bench("hnswlib", make_vector_index("hnswlib"), keys, X, queries, args.k, truth)
+    else:
+        print(" hnswlib: not installed, skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,30 @@
 import streamlit as st
-from ingest import ingest_newsletters_from_feed
+import background
+from embedding import prewarm as prewarm_embedding_model
+from ingest import (
+    FeedState,
+    configured_feeds,
+    feed_state_dir_from_config,
+    ingest_new_newsletters_from_feeds,
+)
 from visualization import compute_and_assign_embeddings_tsne, tsne_visualization
 from llm_tagging import filter_newsletters_with_ai
-from grouping import render_similar_articles
-from web_search import find_full_text
+from grouping import find_similar_articles
+from web_search import FullTextFetcher
+from vector_index import vector_index_from_config
+from projection import projection_from_config
+from verdict_cache import verdict_cache_from_config
+from content_cache import content_cache_from_config
+from newsletter import newsletter_key
+from newsletter_store import newsletter_store_from_config
+from shared_cache import cache_key, computation_cache_from_config, overlay_newsletters
+from filter_engine import FilterColumns
+import numpy as np
 import pandas as pd
+import copy
 import datetime
 import logging
+import threading
 
 logging.basicConfig(
     filename="app.log",
@@ -20,26 +38,238 @@ st.title("Smart Newsletter Dashboard")
 # --- Load Newsletters and Compute Embeddings/tSNE on Startup ---
 import datetime
 
-feed_path = st.text_input("RSS/XML Feed Path", value="data/master_feed.xml")
+feed_paths_text = st.text_area(
+    "RSS/XML Feed Paths (one per line)",
+    value="\n".join(configured_feeds() or ["data/master_feed.xml"]),
+)
+feed_paths = [p.strip() for p in feed_paths_text.splitlines() if p.strip()]
+
+
+# --- State shared by every session of this process ---
+# The store, vector index, projection, caches and the preparation of the
+# newsletters exist once per process, so concurrent users cost one ingest,
+# embedding and projection run; each session works on its own overlay of the
+# shared newsletters (see shared_cache.overlay_newsletters).
+@st.cache_resource
+def shared_vector_index():
+    return vector_index_from_config()
+
+
+@st.cache_resource
+def shared_projection():
+    return projection_from_config()
+
+
+@st.cache_resource
+def shared_store():
+    """
+    The newsletter store, which keeps the vector index in sync with the
+    articles it saves and deletes.
+    """
+    return newsletter_store_from_config(index=shared_vector_index()[0])
+
+
+@st.cache_resource
+def shared_newsletters():
+    """
+    {"view": (version, newsletters), "source": str}, the latest published list
+    of the shared articles and where they were first loaded from. The
+    background preparation builds a new list and publishes it with a single
+    assignment; a published list and its articles are never changed
+    afterwards, so sessions read them without locking.
+    """
+    return {"view": (0, []), "source": "the database"}
+
+
+@st.cache_resource
+def shared_feed_states():
+    return {}
+
+
+@st.cache_resource
+def shared_computations():
+    return computation_cache_from_config()
+
+
+@st.cache_resource
+def shared_prepare_lock():
+    return threading.Lock()
+
+
+vector_index, vector_index_path = shared_vector_index()
+projection, projection_path = shared_projection()
+newsletter_store = shared_store()
+published = shared_newsletters()
+feed_states = shared_feed_states()
+computations = shared_computations()
+
+
+def prepare_newsletters(
+    published, store, lock, feed_paths, feed_states=None, load=False
+):
+    """
+    Background part of loading the dashboard. Starts from the articles in
+    published (see shared_newsletters), or with load from those in the store,
+    whose feeds are then only ingested if it is empty. With feed_states, new
+    feed entries are ingested. The articles are published right away, so
+    sessions can browse and filter them; then every article missing an
+    embedding or coordinates is embedded and projected, the articles this
+    changed are saved to the store, the index and projection are saved, and
+    the result is published again. Each publication is a new list of new
+    objects, since sessions may be reading the old one.
+    Runs off the script thread, so it gets everything it needs, including the
+    preparation lock and the feed paths, as arguments rather than from
+    st.cache_resource, st.session_state or the submitting script run.
+    Returns how many newsletters were ingested.
+    """
+    with lock:
+        version, newsletters = published["view"]
+        if load:
+            newsletters = store.list_all()
+            if newsletters:
+                feed_states = None
+            elif feed_states is not None:
+                # start from scratch: saved feed states would skip the missing entries
+                feed_states.update((path, FeedState()) for path in feed_paths)
+                published["source"] = "the feeds"
+        new_newsletters = []
+        if feed_states is not None:
+            new_newsletters = ingest_new_newsletters_from_feeds(
+                feed_paths, store, feed_states, state_dir=feed_state_dir_from_config()
+            )
+        newsletters = newsletters + new_newsletters
+        if load or new_newsletters:
+            version += 1
+            published["view"] = (version, newsletters)
+        if any(n.embedding is None or n.tsne is None for n in newsletters):
+            before = newsletters
+            newsletters = [copy.copy(n) for n in before]
+            compute_and_assign_embeddings_tsne(newsletters, projection=projection)
+            # only articles whose embedding or coordinates are new or changed
+            # (a refit moves them all) are saved; the store adds the new
+            # embeddings to the vector index
+            store.upsert_many(
+                n
+                for n, old in zip(newsletters, before)
+                if old.embedding is None
+                or old.tsne is None
+                or not np.array_equal(old.embedding, n.embedding)
+                or not np.array_equal(old.tsne, n.tsne)
+            )
+            vector_index.save(vector_index_path)
+            projection.save(projection_path)
+        published["view"] = (version + 1, newsletters)
+    return len(new_newsletters)
+
+
+@st.cache_resource
+def shared_pipeline():
+    """
+    {"future": Future} of the latest preparation of the shared newsletters,
+    which every session follows. The first one runs at startup and loads the
+    database; newsletters, embeddings and filter results persist across
+    restarts, so feeds are only ingested then when the database is empty.
+    """
+    # load the embedding model on its own thread while the database is read,
+    # so new articles and the AI filter's prompt prefilter do not wait for it;
+    # the page renders without it and embedding.get_model stays lazy
+    prewarm_embedding_model()
+    return {
+        "future": background.submit(
+            "prepare newsletters",
+            prepare_newsletters,
+            published,
+            newsletter_store,
+            shared_prepare_lock(),
+            feed_paths,
+            feed_states=feed_states,
+            load=True,
+        )
+    }
+
+
+pipeline = shared_pipeline()["future"]
+embeddings_ready = pipeline.done()
+published_version, shared = published["view"]
 
-if "newsletters" not in st.session_state:
-    newsletters = ingest_newsletters_from_feed(feed_path)
-    # show user how many newsletters were ingested in main area
-    st.success(f"Ingested {len(newsletters)} newsletters from feed.")
+# summarise the articles once per session, as soon as they are loaded
+if shared and not st.session_state.get("summary_shown"):
+    st.session_state["summary_shown"] = True
+    st.success(f"Loaded {len(shared)} newsletters from {published['source']}.")
     # show domain name counts across newsletter
-    domain_counts = pd.Series(
-        [n.domain if n.domain else "unknown" for n in newsletters]
-    ).value_counts()
-    st.success(f"Domain counts:\n{domain_counts.to_dict()}")
-    compute_and_assign_embeddings_tsne(newsletters, perplexity=3)
+    domain_counts = {
+        domain or "unknown": count
+        for domain, count in newsletter_store.domain_counts().items()
+    }
+    st.success(f"Domain counts:\n{domain_counts}")
     # show available date range
-    dates = [n.publication_date for n in newsletters]
+    dates = [n.publication_date for n in shared]
     min_date = min(dates).strftime("%Y-%m-%d")
     max_date = max(dates).strftime("%Y-%m-%d")
     st.info(f"Available date range: {min_date} to {max_date}")
-    st.session_state["newsletters"] = newsletters
-else:
-    newsletters = st.session_state["newsletters"]
+
+# this session's copies of the shared newsletters, rebuilt (keeping its
+# selections and filter results) whenever the shared list has changed
+view_version = (published_version, embeddings_ready)
+if st.session_state.get("view_version") != view_version:
+    st.session_state["newsletters"] = overlay_newsletters(
+        shared, st.session_state.get("newsletters", ())
+    )
+    # filter results as columns over this session's articles (see
+    # filter_engine.py); applied keyword filters are evaluated again
+    previous = st.session_state.get("filter_columns")
+    st.session_state["filter_columns"] = FilterColumns(
+        st.session_state["newsletters"],
+        keywords=previous.keywords if previous else (),
+        previous=previous,
+    )
+    st.session_state["view_version"] = view_version
+newsletters = st.session_state["newsletters"]
+filter_columns = st.session_state["filter_columns"]
+
+
+@st.fragment(run_every=1.0)
+def pipeline_status():
+    """
+    Poll the background pipeline and rerun the page when it publishes
+    articles or has finished.
+    """
+    if published["view"][0] != published_version:
+        st.rerun()
+    if not pipeline.done():
+        loading = (
+            f"Preparing {len(shared)} newsletters" if shared else "Loading newsletters"
+        )
+        st.info(
+            f"{loading} in the background; "
+            "similarity search unlocks when embeddings are ready."
+        )
+        return
+    if pipeline.exception() is None:
+        st.session_state["pipeline_new"] = pipeline.result()
+    st.rerun()
+
+
+if not embeddings_ready:
+    pipeline_status()
+elif pipeline.exception() is not None:
+    st.error(f"Preparing newsletters failed: {pipeline.exception()}")
+elif "pipeline_new" in st.session_state:
+    st.sidebar.info(f"Found {st.session_state.pop('pipeline_new')} new newsletters.")
+
+if st.sidebar.button("Check Feed for New Articles", disabled=not embeddings_ready):
+    # ingesting has side effects, so every check runs; concurrent checks queue
+    # on the preparation lock and later ones find the entries already seen
+    shared_pipeline()["future"] = background.submit(
+        "check feeds",
+        prepare_newsletters,
+        published,
+        newsletter_store,
+        shared_prepare_lock(),
+        feed_paths,
+        feed_states=feed_states,
+    )
+    st.rerun()
 
 # --- Date Filter ---
 today = datetime.date.today()
@@ -48,49 +278,19 @@ start_date = st.sidebar.date_input("Start Date", value=today)
 end_date = st.sidebar.date_input("End Date", value=today)
 
 
-def apply_date_filter(newsletters, start_date, end_date):
-    for n in newsletters:
-        n.filters = n.filters or {}
-        n.filters["date_filter"] = (
-            not start_date or n.publication_date.date() >= start_date
-        ) and (not end_date or n.publication_date.date() <= end_date)
-
-
-apply_date_filter(newsletters, start_date, end_date)
+date_mask = filter_columns.date_range(start_date, end_date)
 # show how many newsletters match the date filter
-date_filtered_count = sum(
-    1 for n in newsletters if n.filters and n.filters.get("date_filter") is True
-)
-st.sidebar.info(f"{date_filtered_count} newsletters match the date filter.")
+st.sidebar.info(f"{np.count_nonzero(date_mask)} newsletters match the date filter.")
 
 # --- Keyword Filter ---
 st.sidebar.header("Keyword Filter")
-
-
-def apply_keyword_filter(newsletters, keyword):
-    keyword_lower = keyword.lower()
-    for n in newsletters:
-        n.filters = n.filters or {}
-        match = keyword_lower in n.title.lower()
-        n.filters[f"{keyword}"] = {"match": match}
-    return newsletters
-
-
 keyword = st.sidebar.text_input("Keyword to filter (title, case-insensitive)", value="")
 if keyword:
     if st.sidebar.button(f"Apply Keyword Filter: '{keyword}'"):
-        newsletters = apply_keyword_filter(newsletters, keyword)
-        st.session_state["newsletters"] = newsletters
+        keyword_mask = filter_columns.keyword(keyword)
         # show how many newsletters match the keyword filter
-        keyword_filtered_count = sum(
-            1
-            for n in newsletters
-            if n.filters
-            and n.filters.get(f"{keyword}")
-            and n.filters[f"{keyword}"].get("match") is True
-        )
         st.sidebar.info(
-            f"{keyword_filtered_count} newsletters match the keyword filter."
+            f"{np.count_nonzero(keyword_mask)} newsletters match the keyword filter."
         )
 
 # --- AI Filter ---
@@ -138,57 +338,73 @@ ai_filter_key = st.sidebar.text_input(
     value="AI_filter",
     help="Name for this AI filter (e.g. 'AI_filter', 'topic_filter', etc.)",
 )
+ai_batch_size = st.sidebar.number_input(
+    "Articles per AI request",
+    min_value=1,
+    max_value=50,
+    value=10,
+    help="Judge several articles in one request to cut request counts and prompt tokens.",
+)
+use_prefilter = st.sidebar.checkbox(
+    "Embedding prefilter",
+    value=False,
+    help="Skip the LLM for articles whose embedding is far from the filter prompt.",
+)
+prefilter_floor = (
+    st.sidebar.slider(
+        "Minimum prompt similarity",
+        min_value=0.0,
+        max_value=1.0,
+        value=0.35,
+        step=0.05,
+        help="Articles less similar than this to the filter prompt skip the LLM. Short prompts score low even against relevant articles, so raise it with care.",
+    )
+    if use_prefilter
+    else None
+)
+
+
+@st.cache_resource
+def shared_verdict_cache():
+    return verdict_cache_from_config()
+
+
 if user_prompt and ai_filter_key and st.sidebar.button("Apply AI Filter"):
-    # message on this is running
+    # only articles within the date filter are judged
+    date_filtered = filter_columns.select(date_mask)
+    verdicts = []
     filter_newsletters_with_ai(
-        newsletters,
+        date_filtered,
         user_prompt,
         ai_provider,
         # {"openai": openai_api_key, "claude": claude_api_key, "gemini": gemini_api_key},
         {"gemini": gemini_api_key},
         ollama_url=ollama_url,
         filter_key=ai_filter_key,
+        batch_size=int(ai_batch_size),
+        cache=shared_verdict_cache(),
+        pass_date=False,
+        min_similarity=prefilter_floor,
+        record=lambda n, verdict: verdicts.append((n, verdict)),
     )
-    st.session_state["newsletters"] = newsletters
+    # verdicts are this session's and go straight into its filter columns; the
+    # shared verdict cache makes applying the same filter again cheap for
+    # every session and after restarts
+    ai_mask = filter_columns.set_results(ai_filter_key, verdicts)
     # show how many newsletters match the AI filter
-    ai_filtered_count = sum(
-        1
-        for n in newsletters
-        if n.filters
-        and n.filters.get(ai_filter_key)
-        and n.filters[ai_filter_key].get("match") is True
-    )
-    st.sidebar.info(f"{ai_filtered_count} newsletters match the AI filter.")
+    st.sidebar.info(f"{np.count_nonzero(ai_mask)} newsletters match the AI filter.")
 
 # --- Filter Selection for Display ---
 st.sidebar.header("Filter Selection")
-unique_filters = set()
-for n in newsletters:
-    if hasattr(n, "filters") and n.filters:
-        unique_filters.update(n.filters.keys())
 selected_filters = st.sidebar.multiselect(
-    "Select filters to show articles (AND logic):", sorted(unique_filters), default=[]
+    "Select filters to show articles:", filter_columns.names, default=[]
+)
+combine_with = st.sidebar.radio(
+    "Show articles passing", ["all selected filters", "any selected filter"]
+)
+filter_mask = filter_columns.combine(
+    selected_filters, how="and" if combine_with.startswith("all") else "or"
 )
-
-
-def filter_articles(newsletters, selected_filters):
-    if not selected_filters:
-        return newsletters
-    filtered = []
-    for n in newsletters:
-        if all(
-            (n.filters.get(f) is True)
-            or (
-                isinstance(n.filters.get(f), dict)
-                and n.filters.get(f).get("match") is True
-            )
-            for f in selected_filters
-        ):
-            filtered.append(n)
-    return filtered
-
-
-filtered_newsletters = filter_articles(newsletters, selected_filters)
 
 # --- Show Articles Button and Display ---
 
@@ -209,14 +425,11 @@ if st.session_state["show_articles"]:
     with col_btns:
         select_all = st.button("Select All", key="select_all_btn")
         deselect_all = st.button("Deselect All", key="deselect_all_btn")
+    filtered_newsletters = filter_columns.select(filter_mask)
     if not filtered_newsletters:
         st.info("No articles match the selected filters.")
     else:
         for n in filtered_newsletters:
-            # if user_selected is not an attribute of n
-            if not hasattr(n, "user_selected"):
-                n.user_selected = False
-
             with st.container():
                 col1, col2 = st.columns([0.05, 0.95])
                 with col1:
@@ -249,7 +462,7 @@ if st.session_state["show_articles"]:
 st.sidebar.header("Find Similar Articles as selected article")
 selected_articles = [n for n in newsletters if n.user_selected]
 deselected_articles = [
-    n for n in newsletters if not n.user_selected and n.filters["date_filter"] is True
+    n for n in filter_columns.select(date_mask) if not n.user_selected
 ]
 sim_threshold = st.sidebar.slider(
     "Cosine similarity threshold",
@@ -260,20 +473,41 @@ sim_threshold = st.sidebar.slider(
     key="similarity_threshold",
 )
 
-if st.sidebar.button("Show Similar Articles"):
-    similar_articles = {}
-    for n in selected_articles:
-        results = render_similar_articles(
-            n, deselected_articles, threshold=sim_threshold
-        )
-        # update the dict if similarity > existing similarity
-        for art, sim in results.values():
-            if (
-                art.title not in similar_articles
-                or sim > similar_articles[art.title][1]
-            ):
-                similar_articles[art.title] = (art, sim)
-    st.session_state["similar_articles"] = similar_articles
+max_similar = st.sidebar.number_input(
+    "Max similar articles", min_value=1, value=50, step=1, key="max_similar"
+)
+
+
+def similar_article_keys(selected, candidates, threshold, top_k):
+    """find_similar_articles as (key, similarity) pairs, valid in any session."""
+    results = find_similar_articles(
+        selected, candidates, threshold=threshold, top_k=top_k, index=vector_index
+    )
+    return [(newsletter_key(a), sim) for a, sim in results.values()]
+
+
+if st.sidebar.button("Show Similar Articles", disabled=not embeddings_ready):
+    # best similarity to any selected article, computed in one batch and
+    # shared with other sessions asking the same question
+    similar = computations.get_or_compute(
+        cache_key(
+            "similar articles",
+            sorted(newsletter_key(n) for n in selected_articles),
+            [newsletter_key(n) for n in deselected_articles],
+            sim_threshold,
+            int(max_similar),
+            len(vector_index),
+        ),
+        similar_article_keys,
+        selected_articles,
+        deselected_articles,
+        sim_threshold,
+        int(max_similar),
+    )
+    by_key = {newsletter_key(n): n for n in newsletters}
+    st.session_state["similar_articles"] = {
+        by_key[key].title: (by_key[key], sim) for key, sim in similar
+    }
 
 
 if "similar_articles" in st.session_state:
@@ -301,13 +535,33 @@ if "similar_articles" in st.session_state:
 
 
 # --- get full text for selected articles if not already present ---
+@st.cache_resource
+def shared_content_cache():
+    return content_cache_from_config()
+
+
 def fetch_all_full_text(newsletters):
-    for n in newsletters:
-        if n.user_selected and not n.full_text:
-            try:
-                n.full_text = find_full_text(n.url, n.title)
-            except Exception as e:
-                logging.error(f"Error fetching full text for {n.url}: {e}")
+    pending = [n for n in newsletters if n.user_selected and not n.full_text]
+    if not pending:
+        return
+    progress_bar = st.progress(
+        0.0, text=f"Fetching full text of {len(pending)} articles..."
+    )
+
+    def on_progress(done, total):
+        progress_bar.progress(done / total, text=f"Fetched full text {done}/{total}")
+
+    texts = FullTextFetcher(cache=shared_content_cache()).fetch_all(
+        [(n.url, n.title) for n in pending], on_progress=on_progress
+    )
+    progress_bar.empty()
+    fetched = {}
+    for n, text in zip(pending, texts):
+        if text:
+            n.full_text = text
+            fetched[newsletter_key(n)] = text
+    # full texts are not user-specific, unlike selections and filter results
+    newsletter_store.set_full_texts(fetched)
 
 
 # --- Export Selected Articles as CSV ---
@@ -327,9 +581,11 @@ def export_as_csv(newsletters):
                 "content": n.content,
                 "publication_date": n.publication_date,
                 "url": n.url,
-                "embedding": n.embedding,
-                "tsne": n.tsne,
-                "filters": n.filters,
+                "embedding": (
+                    n.embedding.tolist() if n.embedding is not None else None
+                ),
+                "tsne": n.tsne.tolist() if n.tsne is not None else None,
+                "filters": filter_columns.filters_of(n),
                 "date": n.publication_date.strftime("%Y-%m-%d %H:%M"),
                 "full_text": n.full_text,
             }
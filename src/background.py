@@ -0,0 +1,44 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+MAX_WORKERS = 2
+
+# Shared by all sessions of the app process; created on first use
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_WORKERS, thread_name_prefix="background"
+            )
+        return _executor
+
+
+def submit(name: str, fn: Callable, *args, **kwargs) -> Future:
+    """
+    Run fn(*args, **kwargs) on the background thread pool and return its
+    Future, so a page can render now and pick up the result on a later rerun.
+    fn must not call Streamlit, which only works on the script thread.
+    Duration and failures are logged.
+    """
+
+    def run():
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            logging.exception(f"Background task {name} failed")
+            raise
+        logging.info(
+            f"Background task {name} finished in {time.perf_counter() - start:.1f}s"
+        )
+        return result
+
+    return _get_executor().submit(run)
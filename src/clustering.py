@@ -1,18 +1,227 @@
+import logging
 import numpy as np
-from sklearn.manifold import TSNE
-from typing import List
-import matplotlib.pyplot as plt
+from typing import Any, List, Optional, Tuple
 
+# Above this many points "auto" projections skip t-SNE (Barnes-Hut is
+# O(n log n) but still minutes at 10k+); UMAP is used when installed, else PCA.
+TSNE_MAX_POINTS = 5000
+PROJECTION_METHODS = ("auto", "tsne", "umap", "pca")
 
-def tsne_cluster(embeddings: List[List[float]], perplexity: int = 3) -> np.ndarray:
-    X = np.array(embeddings)
+
+def auto_perplexity(n: int) -> float:
+    """Perplexity scaled with dataset size (n / 100, clamped to 5..50), below n."""
+    return float(max(1, min(max(5, min(n / 100, 50)), n - 1)))
+
+
+def umap_available() -> bool:
+    try:
+        import umap  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def tsne_cluster(
+    embeddings: List[List[float]],
+    perplexity: Optional[float] = None,
+    init="pca",
+    random_state: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Barnes-Hut t-SNE layout of embeddings. perplexity defaults to
+    auto_perplexity. init is "pca", "random" or an (n, 2) array of starting
+    coordinates, e.g. a previous layout to keep positions stable.
+    """
+    from sklearn.manifold import TSNE
+
+    X = np.asarray(embeddings)
+    if not isinstance(init, str):
+        # t-SNE expects a tiny initial spread; keep the shape, not the scale
+        init = np.asarray(init, dtype=np.float64)
+        init = (init - init.mean(axis=0)) / (init[:, 0].std() or 1.0) * 1e-4
     X_embedded = TSNE(
-        n_components=2, learning_rate="auto", init="random", perplexity=perplexity
+        n_components=2,
+        learning_rate="auto",
+        init=init,
+        perplexity=perplexity or auto_perplexity(len(X)),
+        random_state=random_state,
+        method="barnes_hut",
+        n_jobs=-1,
     ).fit_transform(X)
     return X_embedded
 
 
+def _pca(random_state: Optional[int] = None):
+    from sklearn.decomposition import PCA
+
+    return PCA(n_components=2, svd_solver="randomized", random_state=random_state)
+
+
+def _umap(n: int, init="spectral", random_state=None, n_neighbors: int = 15):
+    import umap
+
+    if not isinstance(init, str):
+        init = np.asarray(init, dtype=np.float32)
+    return umap.UMAP(
+        n_components=2,
+        n_neighbors=max(2, min(n_neighbors, n - 1)),
+        metric="cosine",
+        init=init,
+        random_state=random_state,
+    )
+
+
+def pca_project(embeddings, random_state: Optional[int] = None) -> np.ndarray:
+    """First two principal components, via randomized SVD; seconds at 100k+ points."""
+    X = np.asarray(embeddings, dtype=np.float32)
+    return _pca(random_state).fit_transform(X)
+
+
+def umap_project(
+    embeddings,
+    init="spectral",
+    random_state: Optional[int] = None,
+    n_neighbors: int = 15,
+) -> np.ndarray:
+    """UMAP layout of embeddings (needs the optional umap-learn package)."""
+    X = np.asarray(embeddings, dtype=np.float32)
+    return _umap(len(X), init, random_state, n_neighbors).fit_transform(X)
+
+
+def choose_projection_method(n: int) -> str:
+    """The method "auto" resolves to for n points."""
+    if n <= TSNE_MAX_POINTS:
+        return "tsne"
+    return "umap" if umap_available() else "pca"
+
+
+def fit_projection(
+    embeddings,
+    method: str = "auto",
+    perplexity: Optional[float] = None,
+    init="pca",
+    random_state: Optional[int] = None,
+) -> Tuple[np.ndarray, str, Any]:
+    """
+    project_2d, also returning the backend that ran and its fitted model,
+    whose transform() places further points into the same layout. t-SNE has
+    no such model and returns None, as do layouts of fewer than 3 points.
+    """
+    X = np.asarray(embeddings)
+    if method not in PROJECTION_METHODS:
+        raise ValueError(f"Unknown projection method: {method}")
+    if method == "auto":
+        method = choose_projection_method(len(X))
+    if method == "umap" and not umap_available():
+        logging.warning("umap-learn is not installed, projecting with PCA instead")
+        method = "pca"
+    if len(X) < 3:
+        # too few points for a neighborhood-based layout
+        return np.zeros((len(X), 2), dtype=np.float32), method, None
+    model = None
+    if method == "tsne":
+        coords = tsne_cluster(
+            X, perplexity=perplexity, init=init, random_state=random_state
+        )
+    elif method == "umap":
+        if isinstance(init, str) and init == "pca":
+            init = "spectral"
+        model = _umap(len(X), init, random_state)
+        coords = model.fit_transform(np.asarray(X, dtype=np.float32))
+    else:
+        model = _pca(random_state)
+        coords = model.fit_transform(np.asarray(X, dtype=np.float32))
+    return np.asarray(coords, dtype=np.float32), method, model
+
+
+def project_2d(
+    embeddings,
+    method: str = "auto",
+    perplexity: Optional[float] = None,
+    init="pca",
+    random_state: Optional[int] = None,
+) -> np.ndarray:
+    """
+    2-D layout of embeddings with the given backend: "tsne", "umap", "pca",
+    or "auto" (see choose_projection_method). init applies to t-SNE and UMAP;
+    an unavailable UMAP falls back to PCA with a warning.
+    """
+    return fit_projection(embeddings, method, perplexity, init, random_state)[0]
+
+
+def _neighbor_affinities(sq_dists: np.ndarray, perplexity: float) -> np.ndarray:
+    """
+    Row-wise Gaussian affinities over each row's neighbor distances, with the
+    bandwidth of every row found by bisection so its perplexity matches.
+    """
+    target = np.log(min(perplexity, sq_dists.shape[1]))
+    d = sq_dists - sq_dists.min(axis=1, keepdims=True)
+    lo = np.zeros(len(d))
+    hi = np.full(len(d), np.inf)
+    beta = np.ones(len(d))
+    for _ in range(64):
+        p = np.exp(-d * beta[:, None])
+        p /= p.sum(axis=1, keepdims=True)
+        entropy = -(p * np.log(np.maximum(p, 1e-12))).sum(axis=1)
+        too_flat = entropy > target
+        lo = np.where(too_flat, beta, lo)
+        hi = np.where(too_flat, hi, beta)
+        beta = np.where(np.isinf(hi), beta * 2, (lo + hi) / 2)
+    return p
+
+
+def tsne_transform(
+    embeddings,
+    anchor_embeddings,
+    anchor_coords,
+    perplexity: Optional[float] = None,
+    n_iter: int = 250,
+    learning_rate: float = 1.0,
+    chunk_size: int = 128,
+) -> np.ndarray:
+    """
+    Place new points into an existing t-SNE layout without moving it: each
+    point starts at the affinity-weighted mean of its nearest anchors and only
+    its own coordinates are optimized against the fixed anchor_coords.
+    Cost is O(new x anchors) per iteration. perplexity defaults to
+    auto_perplexity of the anchor count.
+    """
+    X = np.asarray(embeddings, dtype=np.float64)
+    A = np.asarray(anchor_embeddings, dtype=np.float64)
+    Y = np.asarray(anchor_coords, dtype=np.float64)
+    perplexity = perplexity or auto_perplexity(len(A))
+    k = max(1, min(len(A), int(3 * perplexity)))
+    out = np.empty((len(X), 2))
+    for start in range(0, len(X), chunk_size):
+        x = X[start : start + chunk_size]
+        sq = (x**2).sum(1)[:, None] + (A**2).sum(1)[None, :] - 2 * x @ A.T
+        nn = np.argpartition(sq, k - 1, axis=1)[:, :k]
+        p = _neighbor_affinities(
+            np.maximum(np.take_along_axis(sq, nn, axis=1), 0), perplexity
+        )
+        y = (p[:, :, None] * Y[nn]).sum(axis=1)
+        # jitter so points with identical neighbors do not coincide
+        y += np.random.default_rng(start).normal(scale=1e-3, size=y.shape)
+        velocity = np.zeros_like(y)
+        Y_sq = (Y**2).sum(1)[None, :]
+        for it in range(n_iter):
+            sq_2d = np.maximum((y**2).sum(1)[:, None] + Y_sq - 2 * y @ Y.T, 0)
+            w = 1.0 / (1.0 + sq_2d)
+            # repulsion sum_j q_ij w_ij (y_i - y_j), with q_ij = w_ij / Z_i
+            w2 = w * w
+            repel = (y * w2.sum(1)[:, None] - w2 @ Y) / w.sum(1)[:, None]
+            near = p * np.take_along_axis(w, nn, axis=1)
+            attract = (near[:, :, None] * (y[:, None, :] - Y[nn])).sum(axis=1)
+            momentum = 0.5 if it < 50 else 0.8
+            velocity = momentum * velocity - learning_rate * 4 * (attract - repel)
+            y += velocity
+        out[start : start + chunk_size] = y
+    return out
+
+
 def plot_tsne(X_embedded: np.ndarray, show: bool = True, save_path: str = None):
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(8, 6))
     plt.plot(X_embedded[:, 0], X_embedded[:, 1], "o")
     plt.title("t-SNE Clustering")
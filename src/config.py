@@ -0,0 +1,10 @@
+import yaml
+
+
+def load_config(config_path: str = "config.yaml") -> dict:
+    """The settings in config.yaml, or {} if the file does not exist."""
+    try:
+        with open(config_path, "r") as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
@@ -0,0 +1,190 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from config import load_config
+
+# Responses remembered as failures so blocked or missing pages are not refetched
+NEGATIVE_STATUSES = (401, 403, 404, 410, 451)
+
+
+@dataclass
+class CachedPage:
+    """A cached fetch: status 200 with the extracted text, or a failure status."""
+
+    status: int
+    text: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    # False once max_age (or negative_ttl for failures) has passed since the
+    # page was last fetched or revalidated
+    fresh: bool
+
+
+def _pack(text: Optional[str]) -> Optional[bytes]:
+    return None if text is None else zlib.compress(text.encode("utf-8"))
+
+
+def _unpack(blob: Optional[bytes]) -> Optional[str]:
+    return None if blob is None else zlib.decompress(blob).decode("utf-8")
+
+
+class ContentCache:
+    """
+    Persistent SQLite cache of fetched article pages keyed by URL: the
+    zlib-compressed HTML and extracted text, with the ETag/Last-Modified
+    validators needed to revalidate them.
+
+    Pages younger than max_age_seconds are fresh and can be served without a
+    request; older ones should be revalidated with a conditional request.
+    Failures in NEGATIVE_STATUSES are remembered for negative_ttl_seconds.
+    When the stored bodies exceed max_bytes, the least recently used pages
+    are evicted. hits and misses count lookups since the cache was opened.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: Optional[int] = None,
+        max_age_seconds: Optional[float] = None,
+        negative_ttl_seconds: float = 86400,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, status INTEGER NOT NULL, "
+            "etag TEXT, last_modified TEXT, html BLOB, text BLOB, "
+            "size INTEGER NOT NULL, fetched REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed)"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def _is_fresh(self, status: int, fetched: float) -> bool:
+        ttl = self.max_age_seconds if status == 200 else self.negative_ttl_seconds
+        return ttl is None or self._clock() - fetched < ttl
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """The cached page for url, fresh or stale, or None if never fetched."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT status, etag, last_modified, text, fetched FROM pages "
+                "WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE pages SET accessed = ? WHERE url = ?", (self._clock(), url)
+                )
+        if row is None:
+            self.misses += 1
+            return None
+        status, etag, last_modified, text, fetched = row
+        page = CachedPage(
+            status, _unpack(text), etag, last_modified, self._is_fresh(status, fetched)
+        )
+        if page.fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return page
+
+    def get_html(self, url: str) -> Optional[str]:
+        """The cached HTML of url, e.g. to extract its text again."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT html FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        return None if row is None else _unpack(row[0])
+
+    def put(
+        self,
+        url: str,
+        html: str,
+        text: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """Store a successfully fetched page, then evict pages over max_bytes."""
+        html_blob, text_blob = _pack(html), _pack(text)
+        self._store(
+            (url, 200, etag, last_modified, html_blob, text_blob),
+            len(html_blob) + len(text_blob),
+        )
+
+    def put_failure(self, url: str, status: int) -> None:
+        """Remember that url answered with a failure status."""
+        self._store((url, status, None, None, None, None), 0)
+
+    def _store(self, values: tuple, size: int) -> None:
+        now = self._clock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, status, etag, last_modified, "
+                "html, text, size, fetched, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                values + (size, now, now),
+            )
+            if self.max_bytes is not None:
+                # keep the most recently used pages whose sizes add up to max_bytes
+                self._conn.execute(
+                    "DELETE FROM pages WHERE url IN (SELECT url FROM ("
+                    "SELECT url, SUM(size) OVER (ORDER BY accessed DESC, url) "
+                    "AS running FROM pages) WHERE running > ?)",
+                    (self.max_bytes,),
+                )
+
+    def revalidated(self, url: str) -> None:
+        """Mark url fresh again after a 304 Not Modified."""
+        now = self._clock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE pages SET fetched = ?, accessed = ? WHERE url = ?",
+                (now, now, url),
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def content_cache_from_config(config_path: str = "config.yaml") -> ContentCache:
+    """
+    Open the page cache named in config.yaml (content_cache_path), limited to
+    content_cache_max_mb, with pages fresh for content_cache_max_age_days and
+    failures remembered for content_cache_negative_ttl_hours.
+    """
+    config = load_config(config_path)
+    path = config.get("content_cache_path", "data/content_cache/pages.sqlite")
+    max_mb = config.get("content_cache_max_mb", 200)
+    max_age_days = config.get("content_cache_max_age_days", 7)
+    negative_ttl_hours = config.get("content_cache_negative_ttl_hours", 24)
+    try:
+        return ContentCache(
+            path,
+            max_bytes=int(max_mb * 1024 * 1024) if max_mb else None,
+            max_age_seconds=max_age_days * 86400 if max_age_days else None,
+            negative_ttl_seconds=negative_ttl_hours * 3600,
+        )
+    except sqlite3.DatabaseError as e:
+        logging.warning(f"Ignoring unreadable content cache {path}: {e}")
+        return ContentCache(":memory:")
@@ -1,15 +1,217 @@
-import yaml
-from sentence_transformers import SentenceTransformer
-from typing import List
+import hashlib
+import json
+import logging
+import threading
+import numpy as np
+from typing import Dict, List, Optional
+from config import load_config
+from embedding_cache import EmbeddingCache
 
-# Load config
-with open("config.yaml", "r") as f:
-    config = yaml.safe_load(f)
-model_name = config.get("embedding_model", "BAAI/bge-small-en-v1.5")
+DEFAULT_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+DEFAULT_CACHE_DIR = "data/embedding_cache"
+DEFAULT_BATCH_SIZE = 32
+# instruction the English BGE models expect before a retrieval query
+BGE_QUERY_INSTRUCTION = "Represent this sentence for searching relevant passages: "
 
-# Load embedding model
-model = SentenceTransformer(model_name)
+# Models and caches are created on first use, not at import time, so
+# importing this module does not pull in torch or read config.yaml.
+_models: Dict[str, object] = {}
+_caches: Dict[str, EmbeddingCache] = {}
+# backend each loaded model actually uses (onnx/openvino may fall back to torch)
+_backends: Dict[str, str] = {}
+_lock = threading.Lock()
+_config: Optional[dict] = None
 
 
-def compute_embeddings(texts: List[str]) -> List[List[float]]:
-    return model.encode(texts, show_progress_bar=False).tolist()
+def _load_config(config_path: str = "config.yaml") -> dict:
+    global _config
+    if _config is None:
+        _config = load_config(config_path)
+    return _config
+
+
+def get_model_name() -> str:
+    return _load_config().get("embedding_model", DEFAULT_MODEL_NAME)
+
+
+def _load_model(name: str):
+    """
+    Build the SentenceTransformer for name using the embedding_* settings in
+    config.yaml: embedding_device (e.g. cpu, cuda), embedding_backend (torch,
+    onnx or openvino), embedding_onnx_file (e.g. a quantized
+    onnx/model_qint8_avx512_vnni.onnx), embedding_precision (float32 or
+    float16, GPU only), embedding_max_seq_length and embedding_threads.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    config = _load_config()
+    threads = config.get("embedding_threads")
+    if threads:
+        import torch
+
+        torch.set_num_threads(int(threads))
+    kwargs = {"device": config.get("embedding_device")}
+    backend = config.get("embedding_backend", "torch")
+    if backend != "torch":
+        kwargs["backend"] = backend
+        if config.get("embedding_onnx_file"):
+            kwargs["model_kwargs"] = {"file_name": config["embedding_onnx_file"]}
+    try:
+        model = SentenceTransformer(name, **kwargs)
+    except ImportError as e:
+        # onnx/openvino backends need the optional optimum extras
+        logging.warning(f"Embedding backend {backend} unavailable, using torch: {e}")
+        model = SentenceTransformer(name, device=kwargs["device"])
+        backend = "torch"
+    _backends[name] = backend
+    if config.get("embedding_max_seq_length"):
+        model.max_seq_length = int(config["embedding_max_seq_length"])
+    if config.get("embedding_precision") == "float16":
+        if backend == "torch" and model.device.type != "cpu":
+            model.half()
+        else:
+            logging.warning("embedding_precision float16 needs a GPU torch backend")
+    return model
+
+
+def get_model(name: Optional[str] = None):
+    """Return the SentenceTransformer for name (default: configured model), loading it once."""
+    name = name or get_model_name()
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                model = _models[name] = _load_model(name)
+    return model
+
+
+# embedding_* settings that change the vectors a model produces
+ENCODER_SETTINGS = (
+    "embedding_backend",
+    "embedding_onnx_file",
+    "embedding_precision",
+    "embedding_max_seq_length",
+)
+
+
+def cache_name(name: Optional[str] = None) -> str:
+    """
+    Name of the embedding cache for name (default: configured model) under the
+    configured encoder settings: the model name, followed by a hash of the
+    ENCODER_SETTINGS that are set, so vectors from a different backend,
+    quantized file, precision or sequence length are never mixed. A model
+    configured for onnx or openvino is loaded first, since it falls back to
+    torch when the backend is unavailable.
+    """
+    name = name or get_model_name()
+    config = _load_config()
+    backend = config.get("embedding_backend", "torch")
+    if backend != "torch":
+        get_model(name)
+        backend = _backends.get(name, backend)
+    settings = {
+        key: config[key]
+        for key in ENCODER_SETTINGS
+        if config.get(key) is not None
+        and not (
+            backend == "torch" and key in ("embedding_backend", "embedding_onnx_file")
+        )
+    }
+    if not settings:
+        return name
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return f"{name}@{digest.hexdigest()[:12]}"
+
+
+def get_cache(name: Optional[str] = None) -> EmbeddingCache:
+    """Return the on-disk embedding cache for name and the encoder settings."""
+    name = cache_name(name)
+    cache = _caches.get(name)
+    if cache is None:
+        with _lock:
+            cache = _caches.get(name)
+            if cache is None:
+                cache_dir = _load_config().get("embedding_cache_dir", DEFAULT_CACHE_DIR)
+                cache = _caches[name] = EmbeddingCache(cache_dir, name)
+    return cache
+
+
+def prewarm(name: Optional[str] = None) -> Optional[threading.Thread]:
+    """
+    Load the model on a background thread so the first embedding call does not wait.
+    Returns the thread, or None if the model is already loaded.
+    """
+    if (name or get_model_name()) in _models:
+        return None
+
+    def load():
+        try:
+            get_model(name)
+        except Exception as e:
+            # the first real embedding call will retry and surface the error
+            logging.warning(f"Embedding model prewarm failed: {e}")
+
+    thread = threading.Thread(target=load, name="embedding-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def compute_embeddings(
+    texts: List[str], batch_size: Optional[int] = None, model=None
+) -> np.ndarray:
+    """
+    Embed texts with the configured model and return a contiguous float32
+    array with one row per text, in input order. Texts are sent to the model
+    in one call, longest first by character length, so each batch of
+    batch_size (default: embedding_batch_size) pads to little more than its
+    own longest text.
+    """
+    model = model or get_model()
+    batch_size = batch_size or _load_config().get(
+        "embedding_batch_size", DEFAULT_BATCH_SIZE
+    )
+    if not texts:
+        dim = model.get_sentence_embedding_dimension() or 0
+        return np.empty((0, dim), dtype=np.float32)
+    order = np.argsort(
+        -np.fromiter(map(len, texts), np.int64, len(texts)), kind="stable"
+    )
+    vectors = model.encode(
+        [texts[i] for i in order],
+        batch_size=batch_size,
+        show_progress_bar=False,
+        convert_to_numpy=True,
+    )
+    out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+    out[order] = vectors
+    return out
+
+
+def compute_embeddings_cached(texts: List[str]) -> np.ndarray:
+    """Like compute_embeddings, but only unseen texts are sent to the model."""
+    return get_cache().get_or_compute(texts, compute_embeddings)
+
+
+def query_prefix(name: Optional[str] = None) -> str:
+    """
+    Text put before queries for name (default: configured model):
+    embedding_query_prefix from config.yaml if set, else the retrieval
+    instruction for English BGE models, else nothing.
+    """
+    name = name or get_model_name()
+    prefix = _load_config().get("embedding_query_prefix")
+    if prefix is not None:
+        return prefix
+    if name.startswith("BAAI/bge-") and "-en" in name:
+        return BGE_QUERY_INSTRUCTION
+    return ""
+
+
+def compute_query_embedding(text: str) -> np.ndarray:
+    """
+    Embed a one-off query such as an AI filter prompt, after the model's
+    query_prefix, for comparison with article embeddings. Not cached, so
+    prompts do not pile up in the article embedding cache.
+    """
+    return compute_embeddings([query_prefix() + text])[0]
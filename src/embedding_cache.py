@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def content_hash(text: str) -> str:
+    """Stable key for a piece of text (sha256 of its UTF-8 bytes)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# a content hash and its newline in the key file
+_KEY_LINE = 65
+
+
+class EmbeddingCache:
+    """
+    Persistent on-disk embedding cache keyed by content hash and model name.
+
+    Each model gets its own files in cache_dir:
+      <model>.f32   raw float32 rows, appended as new texts are embedded
+      <model>.keys  the content hash of each row, one per line, appended likewise
+      <model>.json  header with the model name and vector dimension
+    Adding texts only appends to the row and key files, so a flush costs the
+    new rows, not the whole cache. The vector file is memory-mapped on load,
+    so only rows that are looked up are read.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self._vectors_path = os.path.join(cache_dir, f"{slug}.f32")
+        self._keys_path = os.path.join(cache_dir, f"{slug}.keys")
+        self._index_path = os.path.join(cache_dir, f"{slug}.json")
+        self._lock = threading.Lock()
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._dim: Optional[int] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, text: str) -> bool:
+        return content_hash(text) in self._rows
+
+    def _load(self) -> None:
+        if not os.path.exists(self._index_path):
+            return
+        try:
+            with open(self._index_path, "r") as f:
+                index = json.load(f)
+            if index.get("model") != self.model_name:
+                raise ValueError(f"index belongs to model {index.get('model')!r}")
+            dim = int(index["dim"])
+            if "keys" in index and not os.path.exists(self._keys_path):
+                # written before the key file existed: the keys are in the header
+                with open(self._keys_path, "w") as f:
+                    f.writelines(f"{k}\n" for k in index["keys"])
+            keys = self._read_keys()
+            n_bytes = os.path.getsize(self._vectors_path)
+            if n_bytes < len(keys) * dim * 4:
+                raise ValueError("vector file is shorter than its index")
+        except Exception as e:
+            logging.warning(
+                f"Ignoring unreadable embedding cache {self._index_path}: {e}"
+            )
+            return
+        self._keys = keys
+        self._rows = {k: i for i, k in enumerate(keys)}
+        self._dim = dim
+        self._map()
+
+    def _read_keys(self) -> List[str]:
+        if not os.path.exists(self._keys_path):
+            return []
+        with open(self._keys_path, "rb") as f:
+            data = f.read()
+        # rows are fixed width, so a line cut short by a crash is dropped
+        n = len(data) // _KEY_LINE
+        return data[: n * _KEY_LINE].decode("ascii").split("\n")[:n]
+
+    def _map(self) -> None:
+        if not self._keys:
+            self._matrix = None
+            return
+        self._matrix = np.memmap(
+            self._vectors_path,
+            dtype=np.float32,
+            mode="r",
+            shape=(len(self._keys), self._dim),
+        )
+
+    def _append(self, keys: List[str], vectors: np.ndarray) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if self._dim is None:
+            self._dim = vectors.shape[1]
+            # Start fresh files; stale bytes from an unreadable cache are dropped
+            open(self._vectors_path, "wb").close()
+            open(self._keys_path, "wb").close()
+            tmp_path = self._index_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"model": self.model_name, "dim": self._dim}, f)
+            os.replace(tmp_path, self._index_path)
+        elif vectors.shape[1] != self._dim:
+            raise ValueError(
+                f"Embedding dimension changed from {self._dim} to {vectors.shape[1]} for model {self.model_name}"
+            )
+        # Truncate anything written by an interrupted flush before appending.
+        # Rows are written before their keys, so a crash never leaves a key
+        # pointing at a missing row.
+        for path, size, data in (
+            (
+                self._vectors_path,
+                len(self._keys) * self._dim * 4,
+                np.ascontiguousarray(vectors, dtype=np.float32).tobytes(),
+            ),
+            (
+                self._keys_path,
+                len(self._keys) * _KEY_LINE,
+                "".join(f"{k}\n" for k in keys).encode("ascii"),
+            ),
+        ):
+            with open(path, "r+b") as f:
+                f.truncate(size)
+                f.seek(0, os.SEEK_END)
+                f.write(data)
+        for k in keys:
+            self._rows[k] = len(self._keys)
+            self._keys.append(k)
+        self._map()
+
+    def get_or_compute(
+        self, texts: List[str], compute_fn: Callable[[List[str]], List[List[float]]]
+    ) -> np.ndarray:
+        """
+        Return a float32 matrix with one row per text.
+        Only texts whose content hash is not cached yet are passed to compute_fn,
+        and their vectors are persisted before returning.
+        """
+        if not texts:
+            return np.empty((0, self._dim or 0), dtype=np.float32)
+        keys = [content_hash(t) for t in texts]
+        with self._lock:
+            missing = {}
+            for k, t in zip(keys, texts):
+                if k not in self._rows and k not in missing:
+                    missing[k] = t
+            if missing:
+                logging.info(
+                    f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses"
+                )
+                vectors = np.asarray(
+                    compute_fn(list(missing.values())), dtype=np.float32
+                )
+                self._append(list(missing.keys()), vectors)
+            rows = [self._rows[k] for k in keys]
+            return np.asarray(self._matrix[rows], dtype=np.float32)
@@ -0,0 +1,185 @@
+import re
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from newsletter import Newsletter, newsletter_key
+
+DATE_FILTER = "date_filter"
+
+# separates titles in the joined search text; cannot occur in a typed keyword
+_SEPARATOR = "\0"
+
+
+def filter_passes(value) -> bool:
+    """Whether a stored filter result is a match: True, or a dict with match True."""
+    return value is True or (isinstance(value, dict) and value.get("match") is True)
+
+
+class FilterColumns:
+    """
+    Filter results over a fixed list of newsletters as boolean NumPy columns,
+    one row per article, so a rerun evaluates and combines filters with a few
+    vectorized operations instead of looping over the objects.
+
+    Results stored in Newsletter.filters (e.g. AI filter verdicts from the
+    database) become columns when the engine is built; new results such as
+    AI verdicts go straight into the columns via set_results(), keeping the
+    full verdicts alongside. Rows belong to the article objects, not their
+    keys, so articles sharing a key keep separate results.
+    Date ranges are compared on a column of day ordinals and keywords are
+    searched in one joined string of the lowercased titles. Keyword filters
+    named in keywords are evaluated again on the new articles, e.g. when a
+    session's newsletters are rebuilt, and results set on previous (an
+    engine over an earlier list of the same articles) are carried over by
+    newsletter_key. Newsletter.filters is not written; filters_of() gives the
+    dict view for display and export.
+    """
+
+    def __init__(
+        self,
+        newsletters: Sequence[Newsletter],
+        keywords: Iterable[str] = (),
+        previous: Optional["FilterColumns"] = None,
+    ):
+        self.newsletters = list(newsletters)
+        self.keywords: List[str] = []
+        self._columns: Dict[str, np.ndarray] = {}
+        # stored results (True, or verdict dicts) of filters that have them
+        self._results: Dict[str, List[Any]] = {}
+        self._rows = {id(n): i for i, n in enumerate(self.newsletters)}
+        # .toordinal() of a datetime is that of its own (local) date
+        self._days = np.fromiter(
+            (n.publication_date.toordinal() for n in self.newsletters),
+            dtype=np.int32,
+            count=len(self.newsletters),
+        )
+        titles = [n.title.lower() for n in self.newsletters]
+        self._text = _SEPARATOR.join(titles)
+        lengths = np.fromiter((len(t) + 1 for t in titles), np.int64, len(titles))
+        self._starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        self._date_range: Optional[Tuple[Optional[date], Optional[date]]] = None
+        names = set()
+        for n in self.newsletters:
+            if n.filters:
+                names.update(n.filters)
+        for name in sorted(names):
+            self._results[name] = [
+                (n.filters or {}).get(name) for n in self.newsletters
+            ]
+        if previous is not None:
+            keys = [newsletter_key(n) for n in self.newsletters]
+            for name, results in previous._results.items():
+                carried = {}
+                for n, result in zip(previous.newsletters, results):
+                    if result is not None:
+                        carried.setdefault(newsletter_key(n), result)
+                stored = self._results.get(name, [None] * len(self))
+                self._results[name] = [carried.get(k, r) for k, r in zip(keys, stored)]
+        for name in sorted(self._results):
+            self._from_results(name)
+        for keyword in keywords:
+            self.keyword(keyword)
+
+    def __len__(self) -> int:
+        return len(self.newsletters)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    @property
+    def names(self) -> List[str]:
+        return sorted(self._columns)
+
+    def column(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
+    def set(self, name: str, mask: np.ndarray) -> np.ndarray:
+        # a copy, so the caller's array is neither frozen nor aliased
+        mask = np.array(mask, dtype=bool)
+        if mask.shape != (len(self),):
+            raise ValueError(
+                f"Filter {name} has {mask.shape} rows, expected {len(self)}"
+            )
+        mask.flags.writeable = False
+        self._columns[name] = mask
+        return mask
+
+    def _from_results(self, name: str) -> np.ndarray:
+        return self.set(
+            name,
+            np.fromiter(
+                (filter_passes(r) for r in self._results[name]),
+                dtype=bool,
+                count=len(self),
+            ),
+        )
+
+    def set_results(
+        self, name: str, results: Iterable[Tuple[Newsletter, Any]]
+    ) -> np.ndarray:
+        """
+        Column name updated with (newsletter, result) pairs, e.g. AI verdicts;
+        articles without a new result keep their previous one.
+        """
+        stored = self._results.setdefault(name, [None] * len(self))
+        for n, result in results:
+            stored[self._rows[id(n)]] = result
+        return self._from_results(name)
+
+    def date_range(
+        self, start: Optional[date], end: Optional[date], name: str = DATE_FILTER
+    ) -> np.ndarray:
+        """Column name: articles published from start to end inclusive."""
+        if self._date_range == (start, end) and name in self._columns:
+            return self._columns[name]
+        mask = np.ones(len(self), dtype=bool)
+        if start:
+            mask &= self._days >= start.toordinal()
+        if end:
+            mask &= self._days <= end.toordinal()
+        self._date_range = (start, end)
+        return self.set(name, mask)
+
+    def keyword(self, keyword: str) -> np.ndarray:
+        """Column keyword: articles whose title contains it, ignoring case."""
+        mask = np.zeros(len(self), dtype=bool)
+        needle = keyword.lower()
+        if needle and _SEPARATOR not in needle:
+            hits = [m.start() for m in re.finditer(re.escape(needle), self._text)]
+            mask[np.searchsorted(self._starts, hits, side="right") - 1] = True
+        if keyword not in self.keywords:
+            self.keywords.append(keyword)
+        return self.set(keyword, mask)
+
+    def combine(self, names: Sequence[str], how: str = "and") -> np.ndarray:
+        """Rows passing all (how="and") or any (how="or") of the named filters."""
+        if not names:
+            return np.ones(len(self), dtype=bool)
+        columns = [self._columns[name] for name in names]
+        if how == "and":
+            return np.logical_and.reduce(columns)
+        if how == "or":
+            return np.logical_or.reduce(columns)
+        raise ValueError(f"Unknown filter combination: {how}")
+
+    def select(self, mask: np.ndarray) -> List[Newsletter]:
+        """The newsletters of the rows set in mask, in order."""
+        return [self.newsletters[i] for i in np.flatnonzero(mask)]
+
+    def filters_of(self, newsletter: Newsletter) -> Dict[str, Any]:
+        """
+        {filter name: result} for one article, for display and export: the
+        stored result (e.g. an AI verdict with its confidence and reason)
+        where there is one, else whether it passed.
+        """
+        row = self._rows[id(newsletter)]
+        return {
+            name: (
+                self._results[name][row]
+                if name in self._results and self._results[name][row] is not None
+                else bool(column[row])
+            )
+            for name, column in self._columns.items()
+        }
@@ -1,30 +1,112 @@
 import numpy as np
 from typing import List, Dict
-from sklearn.metrics.pairwise import cosine_similarity
-import matplotlib.pyplot as plt
-from scipy.cluster.hierarchy import linkage, dendrogram
-import plotly.figure_factory as ff
+from newsletter import newsletter_key
 
 
 def group_by_cosine_similarity(
-    embeddings: List[List[float]], threshold: float = 0.7
+    embeddings: List[List[float]],
+    threshold: float = 0.7,
+    block_size: int = 1024,
+    mode: str = "greedy",
 ) -> Dict[int, List[int]]:
-    X = np.array(embeddings)
-    sim_matrix = cosine_similarity(X)
-    n = len(embeddings)
+    """
+    Group items whose cosine similarity exceeds threshold.
+    mode="greedy": walk items in order; each ungrouped item starts a group and
+    pulls in every later ungrouped item similar to it.
+    mode="components": groups are the connected components of the
+    "similarity > threshold" graph, so similarity chains end up together.
+    Similarities are computed block_size rows at a time on normalized float32
+    embeddings, so memory stays O(block_size x N) instead of a full N x N matrix.
+    Returns group_id -> list of item indices.
+    """
+    X = normalize_rows(embeddings) if len(embeddings) else np.empty((0, 0))
+    n = len(X)
+    if mode == "components":
+        return _group_connected_components(X, threshold, block_size)
+    if mode != "greedy":
+        raise ValueError(f"Unknown grouping mode: {mode}")
+    groups = []
+    assigned = np.zeros(n, dtype=bool)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        # (row, col) pairs with col > row whose similarity clears the threshold
+        block_rows, cols = _block_edges(X, start, stop, threshold)
+        bounds = np.searchsorted(block_rows, np.arange(stop - start + 1))
+        for i in range(start, stop):
+            if assigned[i]:
+                continue
+            neighbours = cols[bounds[i - start] : bounds[i - start + 1]]
+            members = neighbours[~assigned[neighbours]]
+            assigned[i] = True
+            assigned[members] = True
+            groups.append([i] + members.tolist())
+    # Return as dict: group_id -> list of indices
+    return {idx: group for idx, group in enumerate(groups)}
+
+
+def _block_edges(X: np.ndarray, start: int, stop: int, threshold: float):
+    """
+    Similar pairs for rows start:stop as (row offset within block, column),
+    upper triangle only (column > row), sorted by row.
+    """
+    # columns before start belong to earlier blocks, so only X[start:] is scored
+    above = X[start:stop] @ X[start:].T > threshold
+    square = above[:, : stop - start]
+    square[np.tril_indices(stop - start)] = False
+    rows, cols = np.nonzero(above)
+    return rows, cols + start
+
+
+def _group_connected_components(
+    X: np.ndarray, threshold: float, block_size: int
+) -> Dict[int, List[int]]:
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n = len(X)
+    rows, cols = [], []
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block_rows, block_cols = _block_edges(X, start, stop, threshold)
+        rows.append(block_rows + start)
+        cols.append(block_cols)
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+    graph = coo_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    # Number groups by their first member so ordering matches greedy mode
+    groups = {}
+    for i, label in enumerate(labels):
+        groups.setdefault(label, []).append(i)
+    return {idx: group for idx, group in enumerate(groups.values())}
+
+
+def group_with_index(keys: List[str], index, threshold: float = 0.7):
+    """
+    Same greedy grouping as group_by_cosine_similarity, but neighbours come from
+    radius queries against a vector index instead of a dense similarity matrix.
+    keys are the index keys of the items to group, in grouping order.
+    """
+    position = {k: i for i, k in enumerate(keys)}
     groups = []
     assigned = set()
-    for i in range(n):
+    for i, key in enumerate(keys):
         if i in assigned:
             continue
         group = [i]
         assigned.add(i)
-        for j in range(i + 1, n):
-            if sim_matrix[i, j] > threshold and j not in assigned:
-                group.append(j)
-                assigned.add(j)
+        vector = index.get(key)
+        if vector is not None:
+            neighbours = sorted(
+                position[k]
+                for k, _ in index.radius_search(vector, threshold)
+                if k in position
+            )
+            for j in neighbours:
+                if j > i and j not in assigned:
+                    group.append(j)
+                    assigned.add(j)
         groups.append(group)
-    # Return as dict: group_id -> list of indices
     return {idx: group for idx, group in enumerate(groups)}
 
 
@@ -33,8 +115,10 @@ def plot_cosine_dendrogram(
 ):
     # Compute cosine distance matrix
     from sklearn.metrics.pairwise import cosine_distances
+    from scipy.cluster.hierarchy import linkage, dendrogram
+    import matplotlib.pyplot as plt
 
-    X = np.array(embeddings)
+    X = np.asarray(embeddings)
     dist_matrix = cosine_distances(X)
     # Hierarchical clustering
     Z = linkage(dist_matrix, method="average")
@@ -50,9 +134,9 @@ def plot_cosine_dendrogram(
 
 def plotly_cosine_dendrogram(embeddings, titles):
     from sklearn.metrics.pairwise import cosine_distances
-    import numpy as np
+    import plotly.figure_factory as ff
 
-    X = np.array(embeddings)
+    X = np.asarray(embeddings)
     dist_matrix = cosine_distances(X)
     fig = ff.create_dendrogram(
         dist_matrix, labels=titles, orientation="top", color_threshold=None
@@ -63,32 +147,81 @@ def plotly_cosine_dendrogram(embeddings, titles):
     return fig
 
 
+def normalize_rows(embeddings) -> np.ndarray:
+    """Float32 copy of embeddings with each row scaled to unit length (zero rows stay zero)."""
+    X = np.asarray(embeddings, dtype=np.float32)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return X / norms
+
+
+def find_similar_articles(
+    selected_articles,
+    candidates,
+    threshold=0.7,
+    top_k=None,
+    block_size=8192,
+    index=None,
+):
+    """
+    Batched similar-article search for one or more selected articles.
+    Candidates without an embedding, already selected by the user, or in
+    selected_articles are skipped. Each remaining candidate is scored by its
+    best cosine similarity to any selected article using one matrix multiply
+    per block of candidates, or with radius queries against a vector index
+    (see vector_index.py) when one is given.
+    Returns {title: (article, similarity)} for candidates above threshold,
+    ordered by similarity descending and truncated to top_k if given.
+    """
+    selected = [
+        a for a in selected_articles if getattr(a, "embedding", None) is not None
+    ]
+    selected_ids = {id(a) for a in selected_articles}
+    pool = [
+        a
+        for a in candidates
+        if id(a) not in selected_ids
+        and getattr(a, "embedding", None) is not None
+        and getattr(a, "user_selected", False) is not True
+    ]
+    if not selected or not pool:
+        return {}
+    if index is not None and len(index):
+        best = np.full(len(pool), -np.inf, dtype=np.float32)
+        position = {newsletter_key(a): i for i, a in enumerate(pool)}
+        for a in selected:
+            for key, sim in index.radius_search(a.embedding, threshold):
+                i = position.get(key)
+                if i is not None and sim > best[i]:
+                    best[i] = sim
+    else:
+        S = normalize_rows([a.embedding for a in selected])
+        best = np.empty(len(pool), dtype=np.float32)
+        for start in range(0, len(pool), block_size):
+            block = pool[start : start + block_size]
+            C = normalize_rows([a.embedding for a in block])
+            best[start : start + len(block)] = (S @ C.T).max(axis=0)
+    hits = np.flatnonzero(best > threshold)
+    order = hits[np.argsort(-best[hits], kind="stable")]
+    results = {}
+    for i in order:
+        if top_k is not None and len(results) >= top_k:
+            break
+        art = pool[i]
+        if art.title not in results:
+            results[art.title] = (art, float(best[i]))
+    return results
+
+
 def render_similar_articles(selected_article, all_articles, threshold=0.7):
     """
     Given a selected article and a list of all articles (with .embedding),
-    return a list of (article, similarity) tuples for articles with cosine similarity > threshold.
+    return a dict of title -> (article, similarity) for articles with cosine similarity > threshold,
+    sorted by similarity descending.
     The selected_article itself is excluded from the results.
     """
-    import numpy as np
-    from sklearn.metrics.pairwise import cosine_similarity
-
     if not hasattr(selected_article, "embedding") or selected_article.embedding is None:
         return []
-    selected_emb = np.array(selected_article.embedding).reshape(1, -1)
-    results = {}
-    for art in all_articles:
-        if (
-            art is selected_article
-            or not hasattr(art, "embedding")
-            or art.embedding is None
-            or art.user_selected is True
-        ):
-            # Skip articles already selected by user
-            continue
-        sim = cosine_similarity(selected_emb, np.array(art.embedding).reshape(1, -1))[
-            0, 0
-        ]
-        if sim > threshold:
-            results[art.title] = (art, sim)
-    # Sort by similarity descending
-    return results
+    return find_similar_articles([selected_article], all_articles, threshold=threshold)
@@ -1,27 +1,81 @@
 import feedparser
-from datetime import datetime
-from typing import List
+import hashlib
+import html
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Set, Union
+from urllib.parse import urlparse
 from newsletter import Newsletter
+from newsletter_store import NewsletterStore, SQLiteNewsletterStore
 from dateutil import parser
 import logging
 import re
 import requests
+import threading
+from requests.adapters import HTTPAdapter
+from time import sleep
 from bs4 import BeautifulSoup
 import streamlit as st
+from config import load_config
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
 
+_TAG_RE = re.compile(r"<[^>]+>")
+_SCRIPT_RE = re.compile(r"<(script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_BREAK_RE = re.compile(r"<(?:br|/p|/div|/li|/h[1-6])\b[^>]*>", re.IGNORECASE)
+_SPACES_RE = re.compile(r"[ \t\r\f\v\xa0]+")
+_BLANK_LINES_RE = re.compile(r"\s*\n\s*")
+
+
 def strip_html_tags(text: str) -> str:
-    return re.sub(r"<[^>]+>", "", text)
+    return _TAG_RE.sub("", text)
+
+
+def html_to_text(text: str) -> str:
+    """
+    Plain text of an HTML fragment such as a feed summary: scripts and tags
+    removed (line breaks kept for <br> and block ends), entities decoded and
+    whitespace collapsed. Text without markup is only stripped.
+    """
+    if "<" not in text and "&" not in text:
+        return text.strip()
+    if "<" in text:
+        text = _SCRIPT_RE.sub("", text)
+        text = _TAG_RE.sub("", _BREAK_RE.sub("\n", text))
+    text = _SPACES_RE.sub(" ", html.unescape(text))
+    return _BLANK_LINES_RE.sub("\n", text).strip()
 
 
 def clean_title(text: str) -> str:
     # Remove HTML tags and unwanted prefixes
-    text = strip_html_tags(text)
+    text = html_to_text(text)
     return text.replace("STAT+:", "").strip()
 
 
+def parse_date(value: str) -> datetime:
+    """
+    Parse a feed date. RFC 822 (RSS) and ISO 8601 (Atom) dates take a fast
+    path; anything else falls back to dateutil's heuristic parser. Dates with
+    an unknown zone (no offset, or RFC 822 "-0000") are taken as UTC, so every
+    parser returns aware datetimes that compare with each other.
+    """
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            parsed = parser.parse(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
 def get_publication_date_from_url(url: str) -> str:
     """
     Try to fetch the publication date from the article's webpage using common meta tags.
@@ -49,6 +103,40 @@ def get_publication_date_from_url(url: str) -> str:
     return None
 
 
+def entry_id(entry) -> str:
+    """Stable identity for a feed entry: its GUID, else its link, else its title."""
+    return entry.get("id") or entry.get("link") or clean_title(entry.get("title", ""))
+
+
+def newsletter_from_entry(entry) -> Newsletter:
+    raw_title = entry.get("title", "")
+    title = clean_title(raw_title)
+    content = html_to_text(entry.get("summary", ""))  # 'summary' or 'description'
+    publication_date = parse_date(entry.get("published", ""))
+    url = entry.get("link", "")
+    # parse domain name from url if possible
+    domain = [urlparse(url).netloc] if url else None
+    # Try to get date from the web page if possible
+    # web_date = get_publication_date_from_url(url) if url else None
+    # try:
+    #     publication_date = (
+    #         parser.parse(web_date)
+    #         if web_date
+    #         else (parser.parse(date_str) if date_str else datetime.now())
+    #     )
+    # except Exception as e:
+    #     logging.warning(f"Failed to parse date for entry '{title}': {e}")
+    #     publication_date = datetime.now()
+    return Newsletter(
+        title=title,
+        content=content,
+        publication_date=publication_date,
+        url=url,
+        domain=domain[0] if domain else None,
+        guid=entry_id(entry),
+    )
+
+
 def ingest_newsletters_from_feed(feed_path: str) -> List[Newsletter]:
     logging.info(f"Parsing feed: {feed_path}")
     feed = feedparser.parse(feed_path)
@@ -59,40 +147,268 @@ def ingest_newsletters_from_feed(feed_path: str) -> List[Newsletter]:
     progress_bar = st.progress(0, text="Ingesting newsletters...")
     for i, entry in enumerate(feed.entries):
         logging.info(f"Processing entry {i+1}/{len(feed.entries)}")
-        raw_title = entry.get("title", "")
-        title = clean_title(raw_title)
-        content = entry.get("summary", "")  # 'summary' or 'description'
-        publication_date = parser.parse(entry.get("published", ""))
-        url = entry.get("link", "")
-        # parse domain name from url if possible
-        from urllib.parse import urlparse
-
-        domain = [urlparse(url).netloc] if url else None
-        # Try to get date from the web page if possible
-        # web_date = get_publication_date_from_url(url) if url else None
-        # try:
-        #     publication_date = (
-        #         parser.parse(web_date)
-        #         if web_date
-        #         else (parser.parse(date_str) if date_str else datetime.now())
-        #     )
-        # except Exception as e:
-        #     logging.warning(f"Failed to parse date for entry '{title}': {e}")
-        #     publication_date = datetime.now()
-        newsletters.append(
-            Newsletter(
-                title=title,
-                content=content,
-                publication_date=publication_date,
-                url=url,
-                domain=domain[0] if domain else None,
-            )
+        newsletter = newsletter_from_entry(entry)
+        newsletters.append(newsletter)
+        logging.info(
+            f"Added newsletter: {newsletter.title} | {newsletter.publication_date}"
         )
-        logging.info(f"Added newsletter: {title} | {publication_date}")
     logging.info(f"Total newsletters ingested: {len(newsletters)}")
     return newsletters
 
 
+@dataclass
+class FeedState:
+    """
+    What we remember about a feed between ingests.
+    etag/modified are the HTTP validators for remote feeds; for local files
+    modified holds an mtime/size fingerprint instead.
+    """
+
+    etag: Optional[str] = None
+    modified: Optional[str] = None
+    seen_ids: Set[str] = field(default_factory=set)
+
+
+def load_feed_state(path: str) -> FeedState:
+    if not os.path.exists(path):
+        return FeedState()
+    try:
+        with open(path, "r") as f:
+            raw = json.load(f)
+        return FeedState(
+            etag=raw.get("etag"),
+            modified=raw.get("modified"),
+            seen_ids=set(raw.get("seen_ids", [])),
+        )
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable feed state {path}: {e}")
+        return FeedState()
+
+
+def save_feed_state(state: FeedState, path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {
+                "etag": state.etag,
+                "modified": state.modified,
+                "seen_ids": sorted(state.seen_ids),
+            },
+            f,
+        )
+    os.replace(tmp_path, path)
+
+
+def feed_state_path(feed_path: str, state_dir: str) -> str:
+    """Where the state of feed_path is saved under state_dir."""
+    name = hashlib.sha256(feed_path.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(state_dir, f"{name}.json")
+
+
+def is_remote_feed(feed_path: str) -> bool:
+    return urlparse(feed_path).scheme in ("http", "https")
+
+
+class RetryableFetchError(Exception):
+    pass
+
+
+class FeedFetcher:
+    """
+    Fetches many feeds concurrently on a thread pool.
+    Remote feeds share one pooled HTTP session, are limited to per_host
+    simultaneous connections per host, and are retried with exponential
+    backoff on connection errors, timeouts, 429 and 5xx responses.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        per_host: int = 2,
+        timeout: float = 10.0,
+        retries: int = 2,
+        backoff: float = 0.5,
+    ):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+    def _get(self, url: str, headers: dict) -> requests.Response:
+        for attempt in range(self.retries + 1):
+            try:
+                with self._host_limit(url):
+                    resp = self._session.get(url, headers=headers, timeout=self.timeout)
+                if resp.status_code == 429 or resp.status_code >= 500:
+                    raise RetryableFetchError(f"HTTP {resp.status_code}")
+                resp.raise_for_status()
+                return resp
+            except (
+                requests.ConnectionError,
+                requests.Timeout,
+                RetryableFetchError,
+            ) as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2**attempt
+                logging.warning(f"Retrying {url} in {delay:.1f}s after error: {e}")
+                sleep(delay)
+
+    def fetch(self, feed_path: str, state: FeedState):
+        """
+        Returns the parsed feed, or None if it is unchanged since state was last
+        updated (HTTP 304, or same local mtime/size). Updates state's validators.
+        """
+        if is_remote_feed(feed_path):
+            headers = {}
+            if state.etag:
+                headers["If-None-Match"] = state.etag
+            if state.modified:
+                headers["If-Modified-Since"] = state.modified
+            resp = self._get(feed_path, headers)
+            if resp.status_code == 304:
+                logging.info(f"Feed not modified since last ingest: {feed_path}")
+                return None
+            feed = feedparser.parse(resp.content)
+            state.etag = resp.headers.get("ETag", state.etag)
+            state.modified = resp.headers.get("Last-Modified", state.modified)
+            return feed
+        stat = os.stat(feed_path)
+        fingerprint = f"{stat.st_mtime_ns}:{stat.st_size}"
+        if fingerprint == state.modified:
+            logging.info(f"Feed not modified since last ingest: {feed_path}")
+            return None
+        feed = feedparser.parse(feed_path)
+        state.modified = fingerprint
+        return feed
+
+    def fetch_all(self, feed_paths: List[str], states: Dict[str, FeedState]) -> dict:
+        """
+        Fetch all feeds concurrently. Returns feed_path -> parsed feed, or None
+        for feeds that are unchanged or failed (failures are logged, not raised).
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                pool.submit(self.fetch, path, states[path]): path for path in feed_paths
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    logging.error(f"Failed to fetch feed {path}: {e}")
+                    results[path] = None
+        return results
+
+
+def ingest_new_newsletters_from_feeds(
+    feed_paths: List[str],
+    existing: Union[List[Newsletter], NewsletterStore, SQLiteNewsletterStore],
+    states: Dict[str, FeedState],
+    fetcher: Optional[FeedFetcher] = None,
+    state_dir: Optional[str] = None,
+) -> List[Newsletter]:
+    """
+    Incremental ingest of several feeds fetched concurrently.
+    Feeds that are unchanged since their state was last updated are skipped, and
+    Newsletter objects are only built for entries whose id has not been seen in
+    any feed yet, so the same article syndicated by two feeds is added once.
+    New newsletters are appended to existing and also returned; states (one per
+    feed path, created on demand) are updated in place.
+    existing may be a NewsletterStore or SQLiteNewsletterStore, whose GUID index
+    then also rules out entries already stored (e.g. in the newsletter database
+    from a previous run, whose feed state was not kept).
+    With state_dir, feeds without an entry in states get the state saved there
+    by an earlier run, and the updated states are saved back afterwards.
+    Entries that fail to parse are skipped without being marked as seen.
+    """
+    feed_paths = list(dict.fromkeys(feed_paths))
+    for path in feed_paths:
+        if path not in states:
+            states[path] = (
+                load_feed_state(feed_state_path(path, state_dir))
+                if state_dir
+                else FeedState()
+            )
+    fetcher = fetcher or FeedFetcher()
+    feeds = fetcher.fetch_all(feed_paths, states)
+    seen = set().union(*(state.seen_ids for state in states.values()))
+    is_store = not isinstance(existing, list)
+    new_newsletters = []
+    total_entries = 0
+    # Merge in the caller's feed order so results do not depend on fetch timing
+    for path in feed_paths:
+        feed = feeds.get(path)
+        if feed is None:
+            continue
+        total_entries += len(feed.entries)
+        for entry in feed.entries:
+            eid = entry_id(entry)
+            if eid in seen or (is_store and existing.read_by_guid(eid) is not None):
+                states[path].seen_ids.add(eid)
+                continue
+            try:
+                newsletter = newsletter_from_entry(entry)
+            except Exception as e:
+                logging.warning(f"Skipping unparsable entry {eid} in {path}: {e}")
+                continue
+            new_newsletters.append(newsletter)
+            seen.add(eid)
+            states[path].seen_ids.add(eid)
+    existing.extend(new_newsletters)
+    if state_dir:
+        for path in feed_paths:
+            save_feed_state(states[path], feed_state_path(path, state_dir))
+    logging.info(
+        f"Incremental ingest: {len(new_newsletters)} new of {total_entries} entries from {len(feed_paths)} feeds"
+    )
+    return new_newsletters
+
+
+def ingest_new_newsletters(
+    feed_path: str, existing: List[Newsletter], state: FeedState
+) -> List[Newsletter]:
+    """
+    Incremental ingest of a single feed, see ingest_new_newsletters_from_feeds.
+    """
+    return ingest_new_newsletters_from_feeds([feed_path], existing, {feed_path: state})
+
+
+def ingest_newsletters_from_feeds(
+    feed_paths: List[str], fetcher: Optional[FeedFetcher] = None
+) -> List[Newsletter]:
+    """Fetch several feeds concurrently and return their merged, deduplicated entries."""
+    newsletters = []
+    ingest_new_newsletters_from_feeds(feed_paths, newsletters, {}, fetcher=fetcher)
+    return newsletters
+
+
+def configured_feeds(config_path: str = "config.yaml") -> List[str]:
+    """Feed URLs/paths listed under 'feeds' in config.yaml."""
+    return list(load_config(config_path).get("feeds", []))
+
+
+def feed_state_dir_from_config(config_path: str = "config.yaml") -> Optional[str]:
+    """Directory for per-feed ingest state (feed_state_dir), or None to keep it in memory."""
+    return load_config(config_path).get("feed_state_dir", "data/feed_state") or None
+
+
 def demo_ingest():
     logging.info("Starting demo ingestion...")
     newsletters = ingest_newsletters_from_feed("data/master_feed.xml")
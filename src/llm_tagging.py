@@ -1,10 +1,13 @@
 import logging
 import json
 import streamlit as st
-from google import genai
-from pydantic import BaseModel, ValidationError, Field
+from pydantic import BaseModel, ConfigDict, ValidationError, Field
 import re
-from time import sleep
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rate_limit import call_with_backoff, get_rate_limiter, is_rate_limit_error
+from verdict_cache import verdict_key
+from grouping import normalize_rows
 
 
 def clean_json_response(text: str) -> str:
@@ -27,129 +30,410 @@ def get_google_genai_client(api_key):
     api_key: str, your Google Gemini API key
     Returns: genai.Client instance
     """
+    from google import genai
+
     client = genai.Client(
         api_key=api_key,
     )
     return client
 
 
-def ai_newsletter_filter(context, user_prompt, ai_provider, api_keys, ollama_url=None):
+SYSTEM_PROMPT = (
+    "You are an assistant that decides if a newsletter matches a user's filter. "
+    "Base your decision ONLY on the provided User Filter and Newsletter Content. "
+    "Do not speculate or use outside knowledge. "
+    "Always justify using specific phrases or facts from the newsletter."
+)
+OUTPUT_PROMPT = (
+    "Output ONLY valid JSON with the following fields:\n"
+    '{ "match": true|false, "confidence": float (0-1), "reason": string }\n'
+    "- 'match': true if the newsletter clearly fits the filter, else false.\n"
+    "- 'confidence': your certainty as a float between 0 and 1.\n"
+)
+# Upper bound on response tokens we ask providers for, used for TPM accounting
+MAX_OUTPUT_TOKENS = 128
+
+
+def build_filter_prompt(context, user_prompt):
+    return (
+        f"{SYSTEM_PROMPT}\n\n"
+        f"User Filter: {user_prompt}\n"
+        f"Newsletter Content:\n{context}\n"
+        f"{OUTPUT_PROMPT}"
+    )
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for rate-limit accounting."""
+    return len(text) // 4 + 1
+
+
+def ai_newsletter_filter(
+    context,
+    user_prompt,
+    ai_provider,
+    api_keys,
+    ollama_url=None,
+    limiter=None,
+    max_retries=5,
+):
     """
     Returns a dict: {"match": bool, "confidence": float, "reason": str}
+    Failed calls return a non-matching result that also has "error": True.
     context: str, all newsletter info (title, content)
     user_prompt: str, the user's filter prompt
-    ai_provider: str, one of 'OpenAI', 'Claude', 'Vertex AI', 'Ollama (local)'
-    api_keys: dict, e.g. {"openai": ..., "claude": ..., "vertex_project": ..., "vertex_location": ...}
+    ai_provider: str, one of 'OpenAI', 'Claude', 'Google', 'Ollama (local)'
+    api_keys: dict, e.g. {"openai": ..., "claude": ..., "gemini": ...}
     ollama_url: str, if using Ollama
+    limiter: optional rate_limit.RateLimiter; a slot is acquired before every attempt
+    max_retries: retries with exponential backoff when the provider answers 429
     """
-    system_prompt = (
-        "You are an assistant that decides if a newsletter matches a user's filter. "
-        "Base your decision ONLY on the provided User Filter and Newsletter Content. "
-        "Do not speculate or use outside knowledge. "
-        "Always justify using specific phrases or facts from the newsletter."
-    )
-    output_prompt = (
-        "Output ONLY valid JSON with the following fields:\n"
-        '{ "match": true|false, "confidence": float (0-1), "reason": string }\n'
-        "- 'match': true if the newsletter clearly fits the filter, else false.\n"
-        "- 'confidence': your certainty as a float between 0 and 1.\n"
-    )
-    full_prompt = (
-        f"{system_prompt}\n\n"
-        f"User Filter: {user_prompt}\n"
-        f"Newsletter Content:\n{context}\n"
-        f"{output_prompt}"
-    )
+    full_prompt = build_filter_prompt(context, user_prompt)
     logging.info(f"AI Provider: {ai_provider}, Prompt: {full_prompt}")
+
+    def attempt():
+        if limiter is not None:
+            limiter.acquire(estimate_tokens(full_prompt) + MAX_OUTPUT_TOKENS)
+        return _ai_newsletter_filter_once(
+            full_prompt, ai_provider, api_keys, ollama_url
+        )
+
+    try:
+        return call_with_backoff(attempt, max_retries=max_retries)
+    except Exception as e:
+        logging.exception(f"{ai_provider} rate limit not cleared after retries:")
+        return {
+            "match": False,
+            "confidence": 0.0,
+            "reason": f"{ai_provider} rate limit error: {e}",
+            "error": True,
+        }
+
+
+# Model queried for each provider; part of the verdict cache key
+PROVIDER_MODELS = {
+    "OpenAI": "gpt-3.5-turbo",
+    "Claude": "claude-3-opus-20240229",
+    "Google": "gemma-3-12b-it",
+    "Ollama (local)": "gemma3:1b",
+}
+# Label used in error reasons and logs for each provider
+PROVIDER_LABELS = {
+    "OpenAI": "OpenAI",
+    "Claude": "Claude",
+    "Google": "Google gemma-3-12b-it",
+    "Ollama (local)": "Ollama",
+}
+
+
+def _generate_text(
+    full_prompt, ai_provider, api_keys, ollama_url=None, max_tokens=MAX_OUTPUT_TOKENS
+):
+    """
+    Send full_prompt to the provider and return the raw response text, or None
+    if no provider or key is available. Provider errors are raised.
+    """
     if ai_provider == "OpenAI" and api_keys.get("openai"):
-        try:
-            import openai
-
-            openai.api_key = api_keys["openai"]
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": full_prompt},
-                ],
-                max_tokens=128,
-                temperature=0.2,
-            )
-            result = json.loads(response.choices[0].message.content)
-            if "confidence" in result:
-                try:
-                    result["confidence"] = float(result["confidence"])
-                except Exception:
-                    result["confidence"] = 0.0
-            return result
-        except Exception as e:
-            logging.exception("OpenAI error during newsletter filter:")
-            return {"match": False, "confidence": 0.0, "reason": f"OpenAI error: {e}"}
+        import openai
+
+        openai.api_key = api_keys["openai"]
+        response = openai.ChatCompletion.create(
+            model=PROVIDER_MODELS["OpenAI"],
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": full_prompt},
+            ],
+            max_tokens=max_tokens,
+            temperature=0.2,
+        )
+        return response.choices[0].message.content
     elif ai_provider == "Claude" and api_keys.get("claude"):
-        try:
-            import anthropic
-
-            client = anthropic.Anthropic(api_key=api_keys["claude"])
-            response = client.messages.create(
-                model="claude-3-opus-20240229",
-                max_tokens=128,
-                temperature=0.2,
-                messages=[{"role": "user", "content": full_prompt}],
-            )
-            result = json.loads(response.content[0].text)
-            if "confidence" in result:
-                try:
-                    result["confidence"] = float(result["confidence"])
-                except Exception:
-                    result["confidence"] = 0.0
-            return result
-        except Exception as e:
-            logging.exception("Claude error during newsletter filter:")
-            return {"match": False, "confidence": 0.0, "reason": f"Claude error: {e}"}
+        import anthropic
+
+        client = anthropic.Anthropic(api_key=api_keys["claude"])
+        response = client.messages.create(
+            model=PROVIDER_MODELS["Claude"],
+            max_tokens=max_tokens,
+            temperature=0.2,
+            messages=[{"role": "user", "content": full_prompt}],
+        )
+        return response.content[0].text
     elif ai_provider == "Google" and api_keys.get("gemini"):
-        try:
-            # Gemma does not have a json output mode, so we need to clean the response
-            client = get_google_genai_client(api_keys.get("gemini"))
-            response = client.models.generate_content(
-                model="gemma-3-12b-it", contents=full_prompt
-            )
-            logging.info(f"Google response: {response.text}, prompt: {full_prompt}")
-            raw_result = json.loads(clean_json_response(response.text))
-            result = NewsletterResult(**raw_result)
-            # sleep 2s because of rate limits
-            sleep(2)
-            return dict(result)
-        except Exception as e:
-            logging.exception("Google gemma-3-12b-it error during newsletter filter:")
-            logging.info(f"Response text: {response.text}")
+        client = get_google_genai_client(api_keys.get("gemini"))
+        response = client.models.generate_content(
+            model=PROVIDER_MODELS["Google"], contents=full_prompt
+        )
+        return response.text
+    elif ai_provider == "Ollama (local)" and ollama_url:
+        from langchain_community.chat_models import ChatOllama
+
+        json_llm = ChatOllama(model=PROVIDER_MODELS["Ollama (local)"], format="json")
+        response = json_llm.invoke(full_prompt)
+        return response.content if hasattr(response, "content") else response
+    return None
+
+
+def _ai_newsletter_filter_once(full_prompt, ai_provider, api_keys, ollama_url=None):
+    """
+    One provider call. Rate-limit errors are raised so the caller can back off;
+    any other failure is returned as a non-matching result with the error as reason.
+    """
+    label = PROVIDER_LABELS.get(ai_provider, ai_provider)
+    text = None
+    try:
+        text = _generate_text(full_prompt, ai_provider, api_keys, ollama_url)
+        if text is None:
             return {
                 "match": False,
                 "confidence": 0.0,
-                "reason": f"Google gemma-3-12b-it error: {e}",
-                "response": response.text,
+                "reason": "No AI provider or key available.",
+                "error": True,
             }
-    elif ai_provider == "Ollama (local)" and ollama_url:
+        logging.info(f"{label} response: {text}, prompt: {full_prompt}")
+        # Gemma does not have a json output mode, so we need to clean the response
+        raw_result = json.loads(clean_json_response(text))
+        result = NewsletterResult(**raw_result)
+        return dict(result)
+    except Exception as e:
+        if is_rate_limit_error(e):
+            raise
+        logging.exception(f"{label} error during newsletter filter:")
+        logging.info(f"Response text: {text}")
+        return {
+            "match": False,
+            "confidence": 0.0,
+            "reason": f"{label} error: {e}",
+            "response": text,
+            "error": True,
+        }
+
+
+class BatchNewsletterResult(NewsletterResult):
+    # models often echo numeric ids back as numbers
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    id: str
+
+
+BATCH_OUTPUT_PROMPT = (
+    "Output ONLY a valid JSON array with one object per article, in any order:\n"
+    '[{ "id": string, "match": true|false, "confidence": float (0-1), "reason": string }]\n'
+    "- 'id': the Article id exactly as given above.\n"
+    "- 'match': true if the newsletter clearly fits the filter, else false.\n"
+    "- 'confidence': your certainty as a float between 0 and 1.\n"
+)
+# Default prompt size for one batched request (input + expected output tokens)
+BATCH_TOKEN_BUDGET = 6000
+
+
+def _batch_article_block(article_id, context):
+    return f"--- Article id: {article_id} ---\n{context}\n"
+
+
+def build_batch_filter_prompt(contexts, user_prompt):
+    """contexts: dict of article id -> context. One prompt judging every article."""
+    articles = "".join(
+        _batch_article_block(article_id, context)
+        for article_id, context in contexts.items()
+    )
+    return (
+        f"{SYSTEM_PROMPT}\n"
+        "Judge each of the following newsletters independently.\n\n"
+        f"User Filter: {user_prompt}\n"
+        f"Newsletters:\n{articles}\n"
+        f"{BATCH_OUTPUT_PROMPT}"
+    )
+
+
+def make_batches(
+    contexts, user_prompt, token_budget=BATCH_TOKEN_BUDGET, max_batch_size=None
+):
+    """
+    Greedily pack contexts (dict of article id -> context) into batches whose
+    estimated prompt plus output tokens stay within token_budget. An article
+    that alone exceeds the budget gets a batch of its own.
+    Returns a list of dicts of article id -> context.
+    """
+    overhead = estimate_tokens(build_batch_filter_prompt({}, user_prompt))
+    batches = []
+    batch, used = {}, overhead
+    for article_id, context in contexts.items():
+        cost = (
+            estimate_tokens(_batch_article_block(article_id, context))
+            + MAX_OUTPUT_TOKENS
+        )
+        full = max_batch_size is not None and len(batch) >= max_batch_size
+        if batch and (full or used + cost > token_budget):
+            batches.append(batch)
+            batch, used = {}, overhead
+        batch[article_id] = context
+        used += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def parse_batch_response(text, article_ids):
+    """
+    Parse a batched response into a dict of article id -> result dict.
+    Elements that fail validation, carry an unknown id or repeat an id are
+    dropped, so the caller can retry just those articles.
+    """
+    raw = json.loads(clean_json_response(text))
+    if isinstance(raw, dict):
+        # tolerate {"results": [...]} style wrappers
+        raw = next((v for v in raw.values() if isinstance(v, list)), [raw])
+    results = {}
+    for element in raw:
         try:
-            from langchain_community.chat_models import ChatOllama
+            item = BatchNewsletterResult(**element)
+        except (TypeError, ValidationError) as e:
+            logging.warning(f"Invalid batch result element {element!r}: {e}")
+            continue
+        if item.id in article_ids and item.id not in results:
+            results[item.id] = dict(item.model_dump(exclude={"id"}))
+    return results
 
-            json_llm = ChatOllama(model="gemma3:1b", format="json")
-            response = json_llm.invoke(full_prompt)
-            content = response.content if hasattr(response, "content") else response
 
-            logging.info(f"Ollama response: {content}, prompt: {full_prompt}")
-            raw_result = json.loads(content)
-            result = NewsletterResult(**raw_result)
-            return dict(result)
+def ai_newsletter_filter_batch(
+    contexts,
+    user_prompt,
+    ai_provider,
+    api_keys,
+    ollama_url=None,
+    limiter=None,
+    max_retries=5,
+    parse_retries=2,
+):
+    """
+    Judge several newsletters in one request.
+    contexts: dict of article id -> context (title, content)
+    Returns a dict of article id -> {"match": bool, "confidence": float, "reason": str}.
+    Articles whose results are missing or fail validation are re-sent in a
+    smaller batch up to parse_retries more times; any still missing get a
+    non-matching error result. Other arguments are as for ai_newsletter_filter.
+    """
+    label = PROVIDER_LABELS.get(ai_provider, ai_provider)
+    results = {}
+    pending = dict(contexts)
+    error = None
+    for _ in range(parse_retries + 1):
+        error = None
+        full_prompt = build_batch_filter_prompt(pending, user_prompt)
+        max_tokens = MAX_OUTPUT_TOKENS * len(pending)
+        logging.info(f"AI Provider: {ai_provider}, batch of {len(pending)}")
+
+        def attempt():
+            if limiter is not None:
+                limiter.acquire(estimate_tokens(full_prompt) + max_tokens)
+            return _generate_text(
+                full_prompt, ai_provider, api_keys, ollama_url, max_tokens
+            )
+
+        text = None
+        try:
+            text = call_with_backoff(attempt, max_retries=max_retries)
+            if text is None:
+                error = "No AI provider or key available."
+                break
+            logging.info(f"{label} batch response: {text}")
+            results.update(parse_batch_response(text, set(pending)))
         except Exception as e:
-            logging.exception("Ollama error during newsletter filter:")
-            return {"match": False, "confidence": 0.0, "reason": f"Ollama error: {e}"}
+            if is_rate_limit_error(e):
+                logging.exception(
+                    f"{ai_provider} rate limit not cleared after retries:"
+                )
+                error = f"{ai_provider} rate limit error: {e}"
+                break
+            logging.exception(f"{label} error during batch newsletter filter:")
+            logging.info(f"Response text: {text}")
+            error = f"{label} error: {e}"
+        pending = {k: v for k, v in pending.items() if k not in results}
+        if not pending:
+            break
+        logging.warning(f"{len(pending)} articles missing from batch response")
+    error = error or f"{label} error: no valid result for this article in batch"
+    for article_id in pending:
+        results[article_id] = {
+            "match": False,
+            "confidence": 0.0,
+            "reason": error,
+            "error": True,
+        }
+    return results
+
+
+def newsletter_context(n):
+    return f"Title: {n.title}\nContent: {n.content}\n"
+
+
+def prefilter_by_embedding(
+    newsletters, user_prompt, min_similarity, embed_fn=None, embed_query_fn=None
+):
+    """
+    Score newsletters by cosine similarity between their embedding and the
+    embedded user_prompt, so obviously unrelated ones can skip the LLM.
+    Newsletters without an embedding are embedded from title + content.
+    embed_fn: texts -> vectors, default embedding.compute_embeddings_cached
+    embed_query_fn: text -> vector for user_prompt, default
+    embedding.compute_query_embedding, which keeps one-off prompts out of the
+    persistent cache
+    Returns (kept, rejected), lists of (position in newsletters, score); kept is
+    ordered by descending score, rejected holds scores below min_similarity.
+    """
+    if not newsletters:
+        return [], []
+    # imported lazily: loading the embedding model is slow
+    if embed_fn is None:
+        from embedding import compute_embeddings_cached as embed_fn
+    if embed_query_fn is None:
+        from embedding import compute_query_embedding as embed_query_fn
+
+    missing = [i for i, n in enumerate(newsletters) if n.embedding is None]
+    embeddings = [n.embedding for n in newsletters]
+    if missing:
+        vectors = embed_fn(
+            [newsletters[i].title + " " + newsletters[i].content for i in missing]
+        )
+        for i, emb in zip(missing, vectors):
+            embeddings[i] = emb
+    scores = normalize_rows(embeddings) @ normalize_rows(embed_query_fn(user_prompt))[0]
+    order = np.argsort(-scores, kind="stable")
+    kept = [(int(i), float(scores[i])) for i in order if scores[i] >= min_similarity]
+    rejected = [(int(i), float(scores[i])) for i in order if scores[i] < min_similarity]
+    return kept, rejected
+
+
+def _ai_newsletter_filter_each(
+    contexts, user_prompt, ai_provider, api_keys, ollama_url=None, limiter=None
+):
+    """ai_newsletter_filter per article, shaped like ai_newsletter_filter_batch."""
     return {
-        "match": False,
-        "confidence": 0.0,
-        "reason": "No AI provider or key available.",
+        article_id: ai_newsletter_filter(
+            context, user_prompt, ai_provider, api_keys, ollama_url, limiter
+        )
+        for article_id, context in contexts.items()
     }
 
 
+def _record_result(n, result, filter_key, record=None):
+    if record is not None:
+        record(n, result)
+    else:
+        n.filters = n.filters or {}
+        # save result in newsletter filters
+        n.filters[filter_key] = result
+
+    if result.get("match"):
+        st.write(
+            f"Matched: {n.title} (Confidence: {result.get('confidence', 0.0):.2f}) - {result.get('reason', '')}"
+        )
+    elif result.get("match") is None:
+        logging.warning(
+            f"AI filter returned None match for newsletter '{n.title}': {result}"
+        )
+
+
 def filter_newsletters_with_ai(
     newsletters,
     user_prompt,
@@ -158,10 +442,36 @@ def filter_newsletters_with_ai(
     ollama_url=None,
     filter_key="AI_filter",
     pass_date=True,
+    limiter=None,
+    max_workers=None,
+    batch_size=1,
+    batch_token_budget=BATCH_TOKEN_BUDGET,
+    cache=None,
+    min_similarity=None,
+    embed_fn=None,
+    embed_query_fn=None,
+    record=None,
 ):
     """
     Runs AI filtering on a list of newsletters, updates each newsletter's filters dict with the result under filter_key, and returns the filtered list.
+    With record, each verdict is passed to record(newsletter, verdict) on
+    the calling thread instead, e.g. to store it in filter_engine columns.
+    Requests run concurrently on up to max_workers threads (default: the
+    provider's max_concurrency) and are paced by limiter (default: the shared
+    per-provider limiter from rate_limit.get_rate_limiter), so throughput is
+    bounded by the provider quota. Results are reported as they complete.
+    With batch_size > 1, up to batch_size articles (and at most
+    batch_token_budget estimated tokens) are judged per request.
+    If cache (a verdict_cache.VerdictCache) is given, articles already judged
+    for the same provider, model and prompt are answered from it without an
+    API call, and new successful verdicts are stored in it.
+    If min_similarity is set, the remaining articles are first scored by
+    embedding similarity to user_prompt (see prefilter_by_embedding); those
+    below it are rejected without an LLM call and the rest are sent in order
+    of descending score.
     """
+    limiter = limiter or get_rate_limiter(ai_provider)
+    max_workers = max_workers or limiter.max_concurrency
     progress_bar = st.progress(
         0,
         text="Filtering newsletters with AI within date range. Please be patient, limited by API rate limits.",
@@ -174,40 +484,97 @@ def filter_newsletters_with_ai(
         if not pass_date or (n.filters and n.filters.get("date_filter") is True)
     ]
     total = len(to_process)
-    # estimate 2 seconds per request for rate limiting, so show progress accordingly
-    estimated_time = total * 2  # seconds
+    contexts = {str(i): newsletter_context(n) for i, n in enumerate(to_process)}
+    done = 0
+    keys = {}
+    if cache is not None:
+        model = PROVIDER_MODELS.get(ai_provider, "")
+        keys = {
+            i: verdict_key(ai_provider, model, user_prompt, c)
+            for i, c in contexts.items()
+        }
+        cached = cache.get_many(keys.values())
+        for i in list(contexts):
+            if keys[i] in cached:
+                _record_result(to_process[int(i)], cached[keys[i]], filter_key, record)
+                del contexts[i]
+                done += 1
+        if done:
+            st.info(f"Reused {done} cached AI verdicts.")
+            progress_bar.progress(done / total)
+    if min_similarity is not None and contexts:
+        ids = list(contexts)
+        kept, rejected = prefilter_by_embedding(
+            [to_process[int(i)] for i in ids],
+            user_prompt,
+            min_similarity,
+            embed_fn,
+            embed_query_fn,
+        )
+        for pos, score in rejected:
+            _record_result(
+                to_process[int(ids[pos])],
+                {
+                    "match": False,
+                    "confidence": 0.0,
+                    "reason": f"Embedding prefilter: similarity {score:.2f} below {min_similarity:.2f}.",
+                    "similarity": score,
+                },
+                filter_key,
+                record,
+            )
+        contexts = {ids[pos]: contexts[ids[pos]] for pos, _ in kept}
+        done += len(rejected)
+        st.info(
+            f"Embedding prefilter rejected {len(rejected)} of {len(ids)} newsletters, saving {len(rejected)} LLM judgements."
+        )
+        progress_bar.progress(done / total)
+    if batch_size > 1:
+        batches = make_batches(
+            contexts, user_prompt, batch_token_budget, max_batch_size=batch_size
+        )
+        prompts = [build_batch_filter_prompt(b, user_prompt) for b in batches]
+    else:
+        batches = [{i: c} for i, c in contexts.items()]
+        prompts = [build_filter_prompt(c, user_prompt) for c in contexts.values()]
+    n_requests = len(prompts)
+    tokens_per_request = (
+        sum(estimate_tokens(p) for p in prompts) + MAX_OUTPUT_TOKENS * len(contexts)
+    ) // max(n_requests, 1)
+    estimated_time = limiter.seconds_for(n_requests, tokens_per_request)
     # tell the user estimated time
     st.info(
-        f"Estimated time for AI filtering: {estimated_time} seconds for {total} newsletters."
+        f"Estimated time for AI filtering: {estimated_time:.0f} seconds for {len(contexts)} newsletters in {n_requests} requests."
     )
-    for idx, n in enumerate(to_process):
-        n.filters = n.filters or {}
-
-        if pass_date and n.filters and n.filters.get("date_filter") is True:
-            context = f"Title: {n.title}\nContent: {n.content}\n"
-            result = ai_newsletter_filter(
-                context, user_prompt, ai_provider, api_keys, ollama_url
-            )
-            # save result in newsletter filters
-            n.filters[filter_key] = result
-
-            if result.get("match"):
-                st.write(
-                    f"Matched: {n.title} (Confidence: {result.get('confidence', 0.0):.2f}) - {result.get('reason', '')}"
-                )
-            elif result.get("match") is None:
-                logging.warning(
-                    f"AI filter returned None match for newsletter '{n.title}': {result}"
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        filter_fn = (
+            ai_newsletter_filter_batch if batch_size > 1 else _ai_newsletter_filter_each
+        )
+        futures = {
+            pool.submit(
+                filter_fn,
+                batch,
+                user_prompt,
+                ai_provider,
+                api_keys,
+                ollama_url,
+                limiter,
+            ): batch
+            for batch in batches
+        }
+        # Streamlit calls stay on this thread; workers only talk to the provider
+        for future in as_completed(futures):
+            results = future.result()
+            for i, result in results.items():
+                _record_result(to_process[int(i)], result, filter_key, record)
+            if cache is not None:
+                cache.put_many(
+                    {keys[i]: r for i, r in results.items() if not r.get("error")}
                 )
+            done += len(futures[future])
             progress_bar.progress(
-                (idx + 1) / total,
-                text=f"Filtering newsletters with AI... ({idx + 1}/{total})",
+                done / total,
+                text=f"Filtering newsletters with AI... ({done}/{total})",
             )
-        else:
-            n.filters[filter_key] = {
-                "match": None,
-                "confidence": None,
-                "reason": "Filtered out by date.",
-            }
 
     progress_bar.empty()
@@ -1,19 +1,205 @@
-from dataclasses import dataclass
+import sys
+import zlib
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Callable, List, Sequence, Union
+
+import numpy as np
+
+# Bodies at least this long are kept zlib-compressed and inflated on access
+COMPRESS_MIN_CHARS = 512
+
+# A body is a str, zlib-compressed UTF-8 bytes, or a zero-argument loader
+Body = Union[str, bytes, Callable[[], Optional[str]], None]
+
+
+def _pack_body(text: Body) -> Body:
+    if isinstance(text, str) and len(text) >= COMPRESS_MIN_CHARS:
+        return zlib.compress(text.encode("utf-8"))
+    return text
+
+
+def _unpack_body(body: Body) -> Optional[str]:
+    if isinstance(body, bytes):
+        return zlib.decompress(body).decode("utf-8")
+    if callable(body):
+        # lazily loaded body, e.g. from a store; not cached on the instance
+        return body()
+    return body
 
 
-@dataclass
 class Newsletter:
-    title: str
-    content: str
-    publication_date: datetime
-    url: Optional[str] = None
-    embedding: Optional[List[float]] = None
-    tsne: Optional[List[float]] = None
-    filters: Dict[str, Any] = (
-        None  # e.g. {'date_filter': True, 'AI_filter': {'match': True, ...}}
+    """
+    One article. Slotted rather than a dataclass so large archives carry no
+    per-instance __dict__; the constructor matches the old dataclass.
+
+    content and full_text accept a string or a zero-argument loader called on
+    each access; long strings are stored compressed. domain is interned since
+    few distinct values are shared by many articles.
+    """
+
+    __slots__ = (
+        "title",
+        "_content",
+        "publication_date",
+        "url",
+        "embedding",
+        "tsne",
+        "filters",
+        "_full_text",
+        "user_selected",
+        "domain",
+        "guid",
     )
-    full_text: Optional[str] = None  # For storing full text if content is a summary
-    user_selected: bool = False
-    domain: Optional[str] = None  # e.g. 'tech', 'health', etc.
+
+    def __init__(
+        self,
+        title: str,
+        content: Body,
+        publication_date: datetime,
+        url: Optional[str] = None,
+        # float32 rows, normally zero-copy views into a matrix shared by the
+        # collection (see assign_rows / stack_rows)
+        embedding: Optional[np.ndarray] = None,
+        tsne: Optional[np.ndarray] = None,
+        # e.g. {'date_filter': True, 'AI_filter': {'match': True, ...}}
+        filters: Optional[Dict[str, Any]] = None,
+        full_text: Body = None,  # For storing full text if content is a summary
+        user_selected: bool = False,
+        domain: Optional[str] = None,  # e.g. 'tech', 'health', etc.
+        guid: Optional[str] = None,  # feed entry id, falls back to link/title
+    ):
+        self.title = title
+        self.content = content
+        self.publication_date = publication_date
+        self.url = url
+        self.embedding = embedding
+        self.tsne = tsne
+        self.filters = filters
+        self.full_text = full_text
+        self.user_selected = user_selected
+        self.domain = sys.intern(domain) if domain is not None else None
+        self.guid = guid
+
+    @property
+    def content(self) -> Optional[str]:
+        return _unpack_body(self._content)
+
+    @content.setter
+    def content(self, value: Body) -> None:
+        self._content = _pack_body(value)
+
+    @property
+    def full_text(self) -> Optional[str]:
+        return _unpack_body(self._full_text)
+
+    @full_text.setter
+    def full_text(self, value: Body) -> None:
+        self._full_text = _pack_body(value)
+
+    def _fields(self):
+        return (
+            self.title,
+            self.content,
+            self.publication_date,
+            self.url,
+            self.filters,
+            self.full_text,
+            self.user_selected,
+            self.domain,
+            self.guid,
+        )
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (
+            self._fields() == other._fields()
+            and _rows_equal(self.embedding, other.embedding)
+            and _rows_equal(self.tsne, other.tsne)
+        )
+
+    # mutable, like the dataclass it replaces
+    __hash__ = None
+
+    def __repr__(self):
+        return (
+            f"Newsletter(title={self.title!r}, publication_date={self.publication_date!r}, "
+            f"url={self.url!r}, domain={self.domain!r}, guid={self.guid!r})"
+        )
+
+
+def _rows_equal(a, b) -> bool:
+    if a is None or b is None:
+        return a is b
+    return np.array_equal(a, b)
+
+
+def newsletter_key(newsletter: Newsletter) -> str:
+    """Identity used by indexes: the feed GUID, else the URL, else the title."""
+    return newsletter.guid or newsletter.url or newsletter.title
+
+
+def assign_rows(
+    newsletters: Sequence[Newsletter],
+    attr: str,
+    matrix,
+    mmap_path: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Store matrix (one row per newsletter) as a single contiguous float32 block
+    and set each newsletter's attr ("embedding" or "tsne") to a view of its row.
+    With mmap_path the block is saved there as .npy and memory-mapped read-only.
+    Returns the block.
+    """
+    block = np.ascontiguousarray(matrix, dtype=np.float32)
+    if block.shape[0] != len(newsletters):
+        raise ValueError(
+            f"Got {block.shape[0]} rows for {len(newsletters)} newsletters"
+        )
+    if mmap_path is not None:
+        np.save(mmap_path, block)
+        block = np.load(mmap_path, mmap_mode="r")
+    for n, row in zip(newsletters, block):
+        setattr(n, attr, row)
+    return block
+
+
+def stack_rows(newsletters: Sequence[Newsletter], attr: str) -> np.ndarray:
+    """
+    float32 matrix of each newsletter's attr. When the rows are consecutive
+    views into one block, as assign_rows leaves them, that block is returned
+    without copying; otherwise the rows are stacked into a new array.
+    """
+    rows = [getattr(n, attr) for n in newsletters]
+    block = _shared_block(rows)
+    if block is not None:
+        return block
+    if not rows:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.asarray(rows, dtype=np.float32)
+
+
+def _shared_block(rows: List[Any]) -> Optional[np.ndarray]:
+    if not rows or not isinstance(rows[0], np.ndarray):
+        return None
+    base = rows[0].base
+    if (
+        not isinstance(base, np.ndarray)
+        or base.ndim != 2
+        or base.dtype != np.float32
+        or not base.flags["C_CONTIGUOUS"]
+    ):
+        return None
+    stride = base.strides[0]
+    base_ptr = base.__array_interface__["data"][0]
+    start, rem = divmod(rows[0].__array_interface__["data"][0] - base_ptr, stride)
+    if rem or start + len(rows) > base.shape[0]:
+        return None
+    for i, row in enumerate(rows):
+        if (
+            not isinstance(row, np.ndarray)
+            or row.base is not base
+            or row.__array_interface__["data"][0] != base_ptr + (start + i) * stride
+        ):
+            return None
+    return base[start : start + len(rows)]
@@ -1,33 +1,593 @@
-from typing import List, Optional
-from newsletter import Newsletter
+import bisect
+import copy
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, time
+from itertools import count
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from config import load_config
+from newsletter import Newsletter, assign_rows, newsletter_key
+
+DateBound = Union[date, datetime, None]
+
+
+def _date_key(d: datetime) -> datetime:
+    # Wall-clock time as published, like the app's date filter, so feeds with
+    # and without timezones sort together
+    return d.replace(tzinfo=None)
+
+
+def _lower(bound: DateBound) -> Optional[datetime]:
+    if isinstance(bound, datetime):
+        return _date_key(bound)
+    return None if bound is None else datetime.combine(bound, time.min)
+
+
+def _upper(bound: DateBound) -> Optional[datetime]:
+    if isinstance(bound, datetime):
+        return _date_key(bound)
+    return None if bound is None else datetime.combine(bound, time.max)
 
 
 class NewsletterStore:
-    def __init__(self):
-        self._newsletters: List[Newsletter] = []
+    """
+    In-memory newsletters with hash indexes on title, URL and GUID and
+    date-sorted indexes over all newsletters and per domain, so lookups are
+    O(1) and date/domain range queries avoid a full scan.
+    Titles, URLs and GUIDs need not be unique; lookups return the oldest match.
+    """
+
+    def __init__(self, index=None):
+        """
+        index: optional vector index (see vector_index.py) kept in sync with the
+        embeddings of the stored newsletters.
+        """
+        # Insertion-ordered; ids are never reused, so list_all keeps creation order
+        self._newsletters: Dict[int, Newsletter] = {}
+        self._ids = count()
+        self._by_title: Dict[str, List[int]] = {}
+        self._by_url: Dict[str, List[int]] = {}
+        self._by_guid: Dict[str, List[int]] = {}
+        # sorted (date key, id) pairs
+        self._by_date: List[Tuple[datetime, int]] = []
+        self._by_domain: Dict[Optional[str], List[Tuple[datetime, int]]] = {}
+        self._index = index
+
+    def __len__(self) -> int:
+        return len(self._newsletters)
+
+    def __iter__(self) -> Iterator[Newsletter]:
+        return iter(list(self._newsletters.values()))
+
+    def _index_add(self, newsletter: Newsletter) -> None:
+        if self._index is not None and newsletter.embedding is not None:
+            self._index.add([newsletter_key(newsletter)], [newsletter.embedding])
+
+    def _index_remove(self, newsletter: Newsletter) -> None:
+        if self._index is not None:
+            self._index.remove([newsletter_key(newsletter)])
+
+    def _hash_indexes(self, n: Newsletter):
+        return (
+            (self._by_title, n.title),
+            (self._by_url, n.url),
+            (self._by_guid, n.guid),
+        )
+
+    def _link(self, nid: int, n: Newsletter) -> None:
+        for index, key in self._hash_indexes(n):
+            if key:
+                index.setdefault(key, []).append(nid)
+        entry = (_date_key(n.publication_date), nid)
+        bisect.insort(self._by_date, entry)
+        bisect.insort(self._by_domain.setdefault(n.domain, []), entry)
+
+    def _unlink(self, nid: int, n: Newsletter) -> None:
+        for index, key in self._hash_indexes(n):
+            if key:
+                ids = index[key]
+                ids.remove(nid)
+                if not ids:
+                    del index[key]
+        entry = (_date_key(n.publication_date), nid)
+        for entries in (self._by_date, self._by_domain[n.domain]):
+            del entries[bisect.bisect_left(entries, entry)]
+        if not self._by_domain[n.domain]:
+            del self._by_domain[n.domain]
+
+    def _first(self, index: Dict[str, List[int]], key: str) -> Optional[int]:
+        ids = index.get(key)
+        return ids[0] if ids else None
 
     def create(self, newsletter: Newsletter) -> None:
-        self._newsletters.append(newsletter)
+        nid = next(self._ids)
+        self._newsletters[nid] = newsletter
+        self._link(nid, newsletter)
+        self._index_add(newsletter)
 
-    def read(self, title: str) -> Optional[Newsletter]:
-        for n in self._newsletters:
-            if n.title == title:
-                return n
+    def extend(self, newsletters: Iterable[Newsletter]) -> None:
+        for n in newsletters:
+            self.create(n)
+
+    def _id_for_key(self, n: Newsletter) -> Optional[int]:
+        key = newsletter_key(n)
+        index = self._by_guid if n.guid else self._by_url if n.url else self._by_title
+        for nid in index.get(key, []):
+            if newsletter_key(self._newsletters[nid]) == key:
+                return nid
         return None
 
+    def upsert_many(self, newsletters: Iterable[Newsletter]) -> None:
+        """
+        Insert newsletters, replacing stored ones with the same newsletter_key.
+        Filter results are merged: those of filters a replacement does not
+        carry are kept.
+        """
+        for n in newsletters:
+            nid = self._id_for_key(n)
+            if nid is None:
+                self.create(n)
+            elif self._newsletters[nid] is not n:
+                stored = self._newsletters[nid].filters or {}
+                if set(stored) - set(n.filters or {}):
+                    n = copy.copy(n)
+                    n.filters = {**stored, **(n.filters or {})}
+                self._replace(nid, n)
+
+    def read(self, title: str) -> Optional[Newsletter]:
+        nid = self._first(self._by_title, title)
+        return None if nid is None else self._newsletters[nid]
+
+    def read_by_url(self, url: str) -> Optional[Newsletter]:
+        nid = self._first(self._by_url, url)
+        return None if nid is None else self._newsletters[nid]
+
+    def read_by_guid(self, guid: str) -> Optional[Newsletter]:
+        nid = self._first(self._by_guid, guid)
+        return None if nid is None else self._newsletters[nid]
+
+    def update(self, title: str, new_newsletter: Newsletter) -> bool:
+        nid = self._first(self._by_title, title)
+        if nid is None:
+            return False
+        self._replace(nid, new_newsletter)
+        return True
+
+    def _replace(self, nid: int, new_newsletter: Newsletter) -> None:
+        old = self._newsletters[nid]
+        self._unlink(nid, old)
+        # Reusing the id keeps the newsletter's place in list_all
+        self._newsletters[nid] = new_newsletter
+        self._link(nid, new_newsletter)
+        self._index_remove(old)
+        self._index_add(new_newsletter)
+
+    def set_full_texts(self, full_texts: Dict[str, str]) -> None:
+        """
+        Save fetched full texts by newsletter_key, leaving everything else as
+        stored. Stored newsletters are replaced by updated copies, not changed.
+        """
+        for nid, n in list(self._newsletters.items()):
+            text = full_texts.get(newsletter_key(n))
+            if text is not None:
+                updated = copy.copy(n)
+                updated.full_text = text
+                self._newsletters[nid] = updated
+
+    def delete(self, title: str) -> bool:
+        nid = self._first(self._by_title, title)
+        if nid is None:
+            return False
+        n = self._newsletters.pop(nid)
+        self._unlink(nid, n)
+        self._index_remove(n)
+        return True
+
+    def list_all(self) -> List[Newsletter]:
+        return list(self._newsletters.values())
+
+    def domain_counts(self) -> Dict[Optional[str], int]:
+        return {domain: len(entries) for domain, entries in self._by_domain.items()}
+
+    def in_range(
+        self, start: DateBound = None, end: DateBound = None, domain: str = None
+    ) -> List[Newsletter]:
+        """
+        Newsletters published between start and end (inclusive; a date bound
+        covers that whole day), oldest first, optionally only from domain.
+        Uses the sorted date indexes, so cost is O(log n + matches).
+        """
+        entries = self._by_domain.get(domain, []) if domain else self._by_date
+        lower, upper = _lower(start), _upper(end)
+        lo = 0 if lower is None else bisect.bisect_left(entries, (lower, -1))
+        hi = (
+            len(entries)
+            if upper is None
+            else bisect.bisect_right(entries, (upper, float("inf")))
+        )
+        return [self._newsletters[nid] for _, nid in entries[lo:hi]]
+
+
+def _iso_key(d: Optional[datetime]) -> Optional[str]:
+    # Fixed-width ISO strings sort like the datetimes they encode
+    return None if d is None else d.isoformat(timespec="microseconds")
+
+
+def _vector_blob(v) -> Optional[bytes]:
+    return None if v is None else np.asarray(v, dtype=np.float32).tobytes()
+
+
+def _vector_rows(newsletters: List[Newsletter], attr: str, blobs: List[bytes]):
+    """Set attr from float32 BLOBs, as views into one block when all are present."""
+    if not blobs or any(b is None for b in blobs) or len(set(map(len, blobs))) > 1:
+        for n, b in zip(newsletters, blobs):
+            setattr(n, attr, None if b is None else np.frombuffer(b, np.float32))
+        return
+    matrix = np.empty((len(blobs), len(blobs[0]) // 4), dtype=np.float32)
+    for row, b in zip(matrix, blobs):
+        row[:] = np.frombuffer(b, dtype=np.float32)
+    assign_rows(newsletters, attr, matrix)
+
+
+class SQLiteNewsletterStore:
+    """
+    Durable NewsletterStore backed by SQLite in WAL mode, so a restart opens
+    the database instead of re-ingesting and re-embedding every feed.
+
+    Newsletters are upserted by newsletter_key (GUID, else URL, else title).
+    Embeddings and t-SNE coordinates are stored as float32 BLOBs and filter
+    results in their own table, where saving a newsletter replaces only the
+    results of the filters it carries; date, domain, URL and title are indexed.
+    Reads return new Newsletter objects, so changes made to them are only
+    persisted by passing them to upsert_many or update. Their content and
+    full_text are not read with them: each access loads the body by key.
+
+    The vector index is rebuilt from the stored embeddings when it does not
+    hold exactly their keys on opening (e.g. after a crash between saving
+    articles and saving the index), and when articles arrive with embeddings
+    of another dimension than it holds (a new embedding model).
+    """
+
+    _COLUMNS = (
+        "key, title, content, published, date_key, url, domain, guid, "
+        "full_text, user_selected, embedding, tsne"
+    )
+    # everything but the bodies, which are loaded on access (see _body)
+    _LISTED = (
+        "id, key, title, published, url, domain, guid, user_selected, embedding, tsne"
+    )
+    _EMBEDDED = "SELECT {} FROM newsletters WHERE embedding IS NOT NULL"
+
+    def __init__(self, path: str, index=None):
+        """
+        path: SQLite file, created with its directory if missing (or ":memory:").
+        index: optional vector index kept in sync, as for NewsletterStore.
+        """
+        self.path = path
+        self._index = index
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS newsletters (
+                    id INTEGER PRIMARY KEY,
+                    key TEXT NOT NULL UNIQUE,
+                    title TEXT NOT NULL,
+                    content TEXT,
+                    published TEXT NOT NULL,
+                    date_key TEXT NOT NULL,
+                    url TEXT,
+                    domain TEXT,
+                    guid TEXT,
+                    full_text TEXT,
+                    user_selected INTEGER NOT NULL DEFAULT 0,
+                    embedding BLOB,
+                    tsne BLOB
+                );
+                CREATE INDEX IF NOT EXISTS newsletters_date
+                    ON newsletters (date_key);
+                CREATE INDEX IF NOT EXISTS newsletters_domain_date
+                    ON newsletters (domain, date_key);
+                CREATE INDEX IF NOT EXISTS newsletters_url ON newsletters (url);
+                CREATE INDEX IF NOT EXISTS newsletters_title ON newsletters (title);
+                CREATE INDEX IF NOT EXISTS newsletters_guid ON newsletters (guid);
+                CREATE TABLE IF NOT EXISTS filters (
+                    newsletter_id INTEGER NOT NULL
+                        REFERENCES newsletters (id) ON DELETE CASCADE,
+                    name TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (newsletter_id, name)
+                );
+                """)
+        if index is not None:
+            keys = [k for (k,) in self._conn.execute(self._EMBEDDED.format("key"))]
+            if len(index) != len(keys) or not all(k in index for k in keys):
+                logging.info(f"Rebuilding the vector index from {path}")
+                self._rebuild_index()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM newsletters").fetchone()[0]
+
+    def __iter__(self) -> Iterator[Newsletter]:
+        return iter(self.list_all())
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _row(self, n: Newsletter) -> Tuple[Any, ...]:
+        return (
+            newsletter_key(n),
+            n.title,
+            n.content,
+            n.publication_date.isoformat(),
+            _iso_key(_date_key(n.publication_date)),
+            n.url,
+            n.domain,
+            n.guid,
+            n.full_text,
+            int(bool(n.user_selected)),
+            _vector_blob(n.embedding),
+            _vector_blob(n.tsne),
+        )
+
+    def _write_filters(self, ids: List[int], newsletters: List[Newsletter]) -> None:
+        self._conn.executemany(
+            "INSERT INTO filters (newsletter_id, name, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (newsletter_id, name) DO UPDATE SET value = excluded.value",
+            [
+                (i, name, json.dumps(value, default=str))
+                for i, n in zip(ids, newsletters)
+                for name, value in (n.filters or {}).items()
+            ],
+        )
+
+    def _ids_for_keys(self, keys: List[str]) -> Dict[str, int]:
+        ids = {}
+        # SQLite caps bound parameters per statement, so look up in chunks
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            ids.update(
+                self._conn.execute(
+                    f"SELECT key, id FROM newsletters "
+                    f"WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+            )
+        return ids
+
+    def upsert_many(self, newsletters: Iterable[Newsletter]) -> None:
+        """
+        Insert newsletters, replacing stored ones with the same key, in one
+        transaction. Replaced newsletters keep their place in list_all and the
+        stored results of filters they do not carry.
+        """
+        # the last copy of a key wins, as it would with one upsert per newsletter
+        by_key = {newsletter_key(n): n for n in newsletters}
+        if not by_key:
+            return
+        newsletters = list(by_key.values())
+        updates = ", ".join(
+            f"{c} = excluded.{c}" for c in self._COLUMNS.split(", ")[1:]
+        )
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO newsletters ({self._COLUMNS}) "
+                f"VALUES ({', '.join('?' * 12)}) "
+                f"ON CONFLICT (key) DO UPDATE SET {updates}",
+                [self._row(n) for n in newsletters],
+            )
+            ids = self._ids_for_keys(list(by_key))
+            self._write_filters([ids[k] for k in by_key], newsletters)
+        if self._index is not None:
+            self._index.remove(list(by_key))
+            self._index_add(newsletters)
+
+    def _index_add(self, newsletters: List[Newsletter]) -> None:
+        """Add the embeddings of newsletters to the index in one call."""
+        embedded = [n for n in newsletters if n.embedding is not None]
+        if self._index is None or not embedded:
+            return
+        dim = len(embedded[-1].embedding)
+        if self._index.dim not in (None, dim):
+            logging.info(f"Embeddings now have dimension {dim}, rebuilding the index")
+            self._rebuild_index(dim)
+            return
+        embedded = [n for n in embedded if len(n.embedding) == dim]
+        self._index.add(
+            [newsletter_key(n) for n in embedded],
+            np.stack([n.embedding for n in embedded]),
+        )
+
+    def _rebuild_index(self, dim: Optional[int] = None) -> None:
+        """
+        Refill the index with the stored embeddings of dimension dim (default:
+        that of the newest one); embeddings of another dimension are left out.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                self._EMBEDDED.format("key, embedding") + " ORDER BY id"
+            ).fetchall()
+        self._index.clear()
+        if not rows:
+            return
+        size = 4 * dim if dim else len(rows[-1][1])
+        rows = [(k, b) for k, b in rows if len(b) == size]
+        self._index.add(
+            [k for k, _ in rows],
+            np.frombuffer(b"".join(b for _, b in rows), np.float32).reshape(
+                len(rows), size // 4
+            ),
+        )
+
+    def create(self, newsletter: Newsletter) -> None:
+        self.upsert_many([newsletter])
+
+    def extend(self, newsletters: Iterable[Newsletter]) -> None:
+        self.upsert_many(newsletters)
+
+    def _select(
+        self, where: str = "", params: Tuple = (), order: str = "id", limit: int = -1
+    ) -> List[Newsletter]:
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            rows = cursor.execute(
+                f"SELECT {self._LISTED} FROM newsletters {where} "
+                f"ORDER BY {order} LIMIT ?",
+                params + (limit,),
+            ).fetchall()
+            filters: Dict[int, Dict[str, Any]] = {}
+            ids = [r["id"] for r in rows]
+            for start in range(0, len(ids), 500):
+                chunk = ids[start : start + 500]
+                for nid, name, value in self._conn.execute(
+                    f"SELECT newsletter_id, name, value FROM filters "
+                    f"WHERE newsletter_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ):
+                    filters.setdefault(nid, {})[name] = json.loads(value)
+        newsletters = [
+            Newsletter(
+                title=r["title"],
+                content=functools.partial(self._body, r["key"], "content"),
+                publication_date=datetime.fromisoformat(r["published"]),
+                url=r["url"],
+                filters=filters.get(r["id"]),
+                full_text=functools.partial(self._body, r["key"], "full_text"),
+                user_selected=bool(r["user_selected"]),
+                domain=r["domain"],
+                guid=r["guid"],
+            )
+            for r in rows
+        ]
+        _vector_rows(newsletters, "embedding", [r["embedding"] for r in rows])
+        _vector_rows(newsletters, "tsne", [r["tsne"] for r in rows])
+        return newsletters
+
+    def _body(self, key: str, column: str) -> Optional[str]:
+        """The stored content or full_text of the newsletter with key."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {column} FROM newsletters WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _first(self, column: str, value: str) -> Optional[Newsletter]:
+        found = self._select(f"WHERE {column} = ?", (value,), limit=1)
+        return found[0] if found else None
+
+    def read(self, title: str) -> Optional[Newsletter]:
+        return self._first("title", title)
+
+    def read_by_url(self, url: str) -> Optional[Newsletter]:
+        return self._first("url", url)
+
+    def read_by_guid(self, guid: str) -> Optional[Newsletter]:
+        return self._first("guid", guid)
+
+    def _id_by_title(self, title: str) -> Optional[Tuple[int, str]]:
+        return self._conn.execute(
+            "SELECT id, key FROM newsletters WHERE title = ? ORDER BY id LIMIT 1",
+            (title,),
+        ).fetchone()
+
     def update(self, title: str, new_newsletter: Newsletter) -> bool:
-        for i, n in enumerate(self._newsletters):
-            if n.title == title:
-                self._newsletters[i] = new_newsletter
-                return True
-        return False
+        with self._lock, self._conn:
+            found = self._id_by_title(title)
+            if found is None:
+                return False
+            nid, old_key = found
+            # Reusing the id keeps the newsletter's place in list_all
+            self._conn.execute(
+                f"UPDATE newsletters SET ({self._COLUMNS}) = "
+                f"({', '.join('?' * 12)}) WHERE id = ?",
+                self._row(new_newsletter) + (nid,),
+            )
+            self._conn.execute("DELETE FROM filters WHERE newsletter_id = ?", (nid,))
+            self._write_filters([nid], [new_newsletter])
+        if self._index is not None:
+            self._index.remove([old_key])
+            self._index_add([new_newsletter])
+        return True
+
+    def set_full_texts(self, full_texts: Dict[str, str]) -> None:
+        """
+        Save fetched full texts by newsletter_key, leaving everything else as
+        stored.
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE newsletters SET full_text = ? WHERE key = ?",
+                [(text, key) for key, text in full_texts.items()],
+            )
 
     def delete(self, title: str) -> bool:
-        for i, n in enumerate(self._newsletters):
-            if n.title == title:
-                del self._newsletters[i]
-                return True
-        return False
+        with self._lock, self._conn:
+            found = self._id_by_title(title)
+            if found is None:
+                return False
+            self._conn.execute("DELETE FROM newsletters WHERE id = ?", (found[0],))
+        if self._index is not None:
+            self._index.remove([found[1]])
+        return True
 
     def list_all(self) -> List[Newsletter]:
-        return list(self._newsletters)
+        return self._select()
+
+    def domain_counts(self) -> Dict[Optional[str], int]:
+        with self._lock:
+            return dict(
+                self._conn.execute(
+                    "SELECT domain, COUNT(*) FROM newsletters GROUP BY domain"
+                ).fetchall()
+            )
+
+    def in_range(
+        self, start: DateBound = None, end: DateBound = None, domain: str = None
+    ) -> List[Newsletter]:
+        """Like NewsletterStore.in_range, answered from the date/domain indexes."""
+        clauses, params = [], []
+        for op, bound in (
+            (">=", _iso_key(_lower(start))),
+            ("<=", _iso_key(_upper(end))),
+        ):
+            if bound is not None:
+                clauses.append(f"date_key {op} ?")
+                params.append(bound)
+        if domain:
+            clauses.append("domain = ?")
+            params.append(domain)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._select(where, tuple(params), order="date_key, id")
+
+
+def newsletter_store_from_config(
+    config_path: str = "config.yaml", index=None
+) -> Union[NewsletterStore, SQLiteNewsletterStore]:
+    """
+    Open the newsletter database named in config.yaml (newsletter_db_path).
+    Falls back to an in-memory NewsletterStore when the key is empty or the
+    file cannot be opened.
+    """
+    config = load_config(config_path)
+    path = config.get("newsletter_db_path", "data/newsletters.sqlite")
+    if not path:
+        return NewsletterStore(index=index)
+    try:
+        return SQLiteNewsletterStore(path, index=index)
+    except sqlite3.DatabaseError as e:
+        logging.warning(f"Ignoring unreadable newsletter database {path}: {e}")
+        return NewsletterStore(index=index)
@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from clustering import fit_projection, tsne_transform
+from config import load_config
+
+
+class Projection:
+    """
+    Persistent 2-D layout of embeddings, keyed like the vector index. Full
+    fits use clustering.fit_projection with method (t-SNE for small archives
+    under "auto", UMAP or PCA for large ones).
+
+    project() keeps the coordinates of keys it has already placed with the
+    same embedding. New keys, and keys whose embedding changed, are placed
+    into the fixed map by the backend of the last fit: tsne_transform for a
+    t-SNE layout, the fitted model's transform for PCA and UMAP. So existing
+    positions stay put across runs. A full refit happens when there is no
+    layout yet, the embedding dimension changed, more than refit_fraction
+    of the keys would have been placed incrementally since the last fit, or
+    a PCA or UMAP layout loaded from disk has no fitted model to place with.
+    A refit starts from the current coordinates to keep the map recognizable.
+    """
+
+    def __init__(
+        self,
+        perplexity: Optional[float] = None,
+        refit_fraction: float = 0.5,
+        random_state: int = 0,
+        method: str = "auto",
+    ):
+        self.method = method
+        self.perplexity = perplexity
+        self.refit_fraction = refit_fraction
+        self.random_state = random_state
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._embeddings = np.empty((0, 0), dtype=np.float32)
+        self._coords = np.empty((0, 2), dtype=np.float32)
+        # keys placed incrementally since the last full fit
+        self.placed = 0
+        # backend of the last full fit and its model (None for t-SNE, and
+        # after load: fitted models are not saved)
+        self.fitted_method: Optional[str] = None
+        self._model = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _fit(self, keys: List[str], embeddings: np.ndarray) -> None:
+        init = "pca"
+        if self._keys and embeddings.shape[1] == self._embeddings.shape[1]:
+            # unknown keys start at the centroid of the current map
+            centroid = self._coords.mean(axis=0)
+            init = np.array(
+                [
+                    self._coords[self._rows[k]] if k in self._rows else centroid
+                    for k in keys
+                ]
+            )
+        logging.info(f"Fitting {self.method} projection of {len(keys)} embeddings")
+        coords, self.fitted_method, self._model = fit_projection(
+            embeddings,
+            method=self.method,
+            perplexity=self.perplexity and min(self.perplexity, len(keys) - 1),
+            init=init,
+            random_state=self.random_state,
+        )
+        self._set(keys, embeddings, coords)
+        self.placed = 0
+
+    def _place(self, embeddings: np.ndarray, kept: List[int]) -> Optional[np.ndarray]:
+        """New points' coordinates in the current map, None if it cannot place them."""
+        if self.fitted_method == "tsne":
+            return tsne_transform(
+                embeddings,
+                self._embeddings[kept],
+                self._coords[kept],
+                perplexity=self.perplexity,
+            )
+        if self._model is not None:
+            return self._model.transform(embeddings)
+        return None
+
+    def _set(self, keys: List[str], embeddings: np.ndarray, coords) -> None:
+        self._keys = list(keys)
+        self._rows = {k: i for i, k in enumerate(self._keys)}
+        self._embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self._coords = np.ascontiguousarray(coords, dtype=np.float32)
+
+    def project(self, keys: Sequence[str], embeddings) -> np.ndarray:
+        """
+        (n, 2) float32 coordinates for keys, with one row of embeddings per
+        key. Keys not passed stay in the layout as anchors. Known keys whose
+        embedding changed are placed again like new ones, and a change of
+        embedding dimension refits the whole layout.
+        """
+        keys = list(keys)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if not keys:
+            return np.empty((0, 2), dtype=np.float32)
+        if not self._keys or embeddings.shape[1] != self._embeddings.shape[1]:
+            self._fit(keys, embeddings)
+            return self._coords
+        known = [i for i, k in enumerate(keys) if k in self._rows]
+        rows = [self._rows[keys[i]] for i in known]
+        changed = np.any(self._embeddings[rows] != embeddings[known], axis=1)
+        stale = {keys[known[j]] for j in np.flatnonzero(changed)}
+        moved = [i for i, k in enumerate(keys) if k not in self._rows or k in stale]
+        kept = [r for r, k in enumerate(self._keys) if k not in stale]
+        placed = None
+        within = self.placed + len(moved) <= self.refit_fraction * len(keys)
+        if moved and kept and within:
+            placed = self._place(embeddings[moved], kept)
+        if moved and placed is None:
+            self._fit(keys, embeddings)
+        elif moved:
+            self._set(
+                [self._keys[r] for r in kept] + [keys[i] for i in moved],
+                np.vstack([self._embeddings[kept], embeddings[moved]]),
+                np.vstack([self._coords[kept], placed]),
+            )
+            self.placed += len(moved)
+        return self._coords[[self._rows[k] for k in keys]]
+
+    def save(self, path: str) -> None:
+        """Persist to <path>.npz."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            meta=np.array(
+                json.dumps({"placed": self.placed, "method": self.fitted_method})
+            ),
+            keys=np.array(self._keys, dtype=str),
+            embeddings=self._embeddings,
+            coords=self._coords,
+        )
+        os.replace(tmp_path, path + ".npz")
+
+    def load(self, path: str) -> bool:
+        """Load a layout written by save(path). Returns False if there is none."""
+        if not os.path.exists(path + ".npz"):
+            return False
+        with np.load(path + ".npz") as data:
+            self._set(
+                [str(k) for k in data["keys"]], data["embeddings"], data["coords"]
+            )
+            meta = json.loads(str(data["meta"]))
+            self.placed = meta["placed"]
+            # layouts saved before the backend was recorded were placed with t-SNE
+            self.fitted_method = meta.get("method", "tsne")
+            self._model = None
+        return True
+
+
+def projection_from_config(config_path: str = "config.yaml"):
+    """
+    Load the persisted layout named in config.yaml (projection_path), or start
+    an empty one fitted with projection_method and projection_perplexity and
+    refit past projection_refit_fraction.
+    Returns (projection, path).
+    """
+    config = load_config(config_path)
+    path = config.get("projection_path", "data/projection/tsne")
+    settings = dict(
+        method=config.get("projection_method", "auto"),
+        perplexity=config.get("projection_perplexity"),
+        refit_fraction=config.get("projection_refit_fraction", 0.5),
+    )
+    projection = Projection(**settings)
+    try:
+        projection.load(path)
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable projection {path}: {e}")
+        projection = Projection(**settings)
+    return projection, path
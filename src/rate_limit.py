@@ -0,0 +1,182 @@
+import logging
+import random
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+from config import load_config
+
+# Default quotas per AI provider (overridable under llm_rate_limits in config.yaml).
+# None means unlimited; max_concurrency caps in-flight requests.
+DEFAULT_PROVIDER_LIMITS = {
+    "Google": {
+        "requests_per_minute": 30,
+        "tokens_per_minute": 15000,
+        "max_concurrency": 8,
+    },
+    "OpenAI": {
+        "requests_per_minute": 500,
+        "tokens_per_minute": 200000,
+        "max_concurrency": 16,
+    },
+    "Claude": {
+        "requests_per_minute": 50,
+        "tokens_per_minute": 40000,
+        "max_concurrency": 8,
+    },
+    "Ollama (local)": {
+        "requests_per_minute": None,
+        "tokens_per_minute": None,
+        "max_concurrency": 2,
+    },
+}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at rate_per_minute.
+    acquire() blocks until the requested amount is available.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Take amount tokens, waiting if needed. Returns seconds spent waiting."""
+        # A single request larger than the bucket would never fit; cap it
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                wait = (amount - self._tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+
+class RateLimiter:
+    """
+    Combined requests-per-minute and tokens-per-minute limit for one provider.
+    Either limit may be None to disable it.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: int = 4,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.max_concurrency = max_concurrency
+        self.requests = (
+            TokenBucket(requests_per_minute, clock=clock, sleep=sleep)
+            if requests_per_minute
+            else None
+        )
+        self.tokens = (
+            TokenBucket(tokens_per_minute, clock=clock, sleep=sleep)
+            if tokens_per_minute
+            else None
+        )
+
+    def acquire(self, tokens: int = 0) -> None:
+        if self.requests is not None:
+            self.requests.acquire(1)
+        if self.tokens is not None and tokens:
+            self.tokens.acquire(tokens)
+
+    def seconds_for(self, n_requests: int, tokens_per_request: int = 0) -> float:
+        """Lower bound on the time n_requests take under this limiter."""
+        seconds = 0.0
+        if self.requests is not None:
+            seconds = max(seconds, n_requests / self.requests.rate)
+        if self.tokens is not None:
+            seconds = max(seconds, n_requests * tokens_per_request / self.tokens.rate)
+        return seconds
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, config_path: str = "config.yaml") -> RateLimiter:
+    """
+    Process-wide limiter for provider, so concurrent runs and Streamlit reruns
+    share one quota. Limits come from llm_rate_limits in config.yaml, falling
+    back to DEFAULT_PROVIDER_LIMITS.
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            limits = dict(DEFAULT_PROVIDER_LIMITS.get(provider, {}))
+            config = load_config(config_path)
+            limits.update((config.get("llm_rate_limits") or {}).get(provider, {}))
+            _limiters[provider] = RateLimiter(**limits)
+        return _limiters[provider]
+
+
+# Status text that provider and HTTP errors start with when rate limited, e.g.
+# "429 RESOURCE_EXHAUSTED. {...}" or "429 Client Error: Too Many Requests"
+_RATE_LIMIT_MESSAGE_RE = re.compile(r"^\s*(?:429|RESOURCE_EXHAUSTED)\b")
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """
+    True for provider errors that mean 'slow down' (HTTP 429 / quota exhausted):
+    a status or code attribute on the error or its HTTP response, a provider
+    RateLimitError, or a message starting with that status. A 429 elsewhere in
+    a message (e.g. a JSON parse position) does not count.
+    """
+    response = getattr(exc, "response", None)
+    for source in (exc, response):
+        for attr in ("status_code", "code", "status"):
+            if getattr(source, attr, None) in (429, "429", "RESOURCE_EXHAUSTED"):
+                return True
+    if type(exc).__name__ == "RateLimitError":
+        return True
+    return bool(_RATE_LIMIT_MESSAGE_RE.match(str(exc)))
+
+
+def call_with_backoff(
+    fn: Callable,
+    max_retries: int = 5,
+    base_delay: float = 2.0,
+    max_delay: float = 60.0,
+    sleep: Optional[Callable[[float], None]] = None,
+):
+    """
+    Call fn(), retrying with exponential backoff and jitter while it raises
+    rate-limit errors. Other exceptions, and the last rate-limit error, propagate.
+    """
+    sleep = sleep or time.sleep
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_retries or not is_rate_limit_error(e):
+                raise
+            delay = min(max_delay, base_delay * 2**attempt)
+            delay *= random.uniform(0.5, 1.0)
+            logging.warning(f"Rate limited, retrying in {delay:.1f}s: {e}")
+            sleep(delay)
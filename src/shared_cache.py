@@ -0,0 +1,189 @@
+import copy
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import load_config
+from newsletter import Newsletter, newsletter_key
+
+
+def cache_key(*parts) -> str:
+    """
+    Hex digest identifying a computation by its inputs: bytes and strings are
+    hashed as-is, arrays by dtype, shape and data, lists and tuples part by
+    part, anything else by repr.
+    """
+    digest = hashlib.sha256()
+
+    def feed(part):
+        if isinstance(part, bytes):
+            digest.update(part)
+        elif isinstance(part, str):
+            digest.update(part.encode("utf-8"))
+        elif isinstance(part, np.ndarray):
+            digest.update(f"{part.dtype}{part.shape}".encode("ascii"))
+            digest.update(np.ascontiguousarray(part).tobytes())
+        elif isinstance(part, (list, tuple)):
+            digest.update(b"[")
+            for p in part:
+                feed(p)
+            digest.update(b"]")
+        else:
+            digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\0")
+
+    for part in parts:
+        feed(part)
+    return digest.hexdigest()
+
+
+class ComputationCache:
+    """
+    Process-wide memo of expensive pure computations, shared by every session
+    of the app. Results are keyed by cache_key of their inputs and parameters.
+    A computation that is already running is joined rather than repeated, so
+    concurrent sessions asking for the same key cost one run. The
+    least recently used results beyond max_entries are dropped from memory;
+    with a path they are also pickled to <path>/<key>.pkl and survive restarts.
+
+    Results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 64):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return self._lookup(key)[0]
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key + ".pkl")
+
+    def _remember(self, key: str, value) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _lookup(self, key: str) -> Tuple[bool, Any]:
+        """(found, value) from memory, then disk. Caller holds the lock."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return True, self._entries[key]
+        if self.path and os.path.exists(self._file(key)):
+            try:
+                with open(self._file(key), "rb") as f:
+                    value = pickle.load(f)
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable cached result {key}: {e}")
+                return False, None
+            self._remember(key, value)
+            return True, value
+        return False, None
+
+    def _store(self, key: str, value) -> None:
+        with self._lock:
+            self._remember(key, value)
+        if not self.path:
+            return
+        tmp_path = self._file(key) + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._file(key))
+        except Exception as e:
+            logging.warning(f"Could not write cached result {key}: {e}")
+
+    def _claim(self, key: str) -> Tuple[Future, bool]:
+        """
+        The Future holding key's result and whether the caller must compute it:
+        a finished Future for a cached result, or the running computation's.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.hits += 1
+                return future, False
+            found, value = self._lookup(key)
+            future = Future()
+            if found:
+                self.hits += 1
+                future.set_result(value)
+                return future, False
+            self.misses += 1
+            self._in_flight[key] = future
+            return future, True
+
+    def _run(self, key: str, future: Future, fn: Callable, args, kwargs):
+        try:
+            value = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self._store(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def get_or_compute(self, key: str, fn: Callable, *args, **kwargs):
+        """fn(*args, **kwargs) computed at most once for key, on this thread."""
+        future, owner = self._claim(key)
+        if not owner:
+            return future.result()
+        return self._run(key, future, fn, args, kwargs)
+
+
+def overlay_newsletters(
+    shared: Iterable[Newsletter], previous: Iterable[Newsletter] = ()
+) -> List[Newsletter]:
+    """
+    One session's view of the shared newsletters: shallow copies whose
+    user_selected and filters belong to the session, so selections and filter
+    results do not leak between users while bodies and embeddings stay shared.
+    State of previous copies of the same articles is carried over; other
+    articles start unselected, whatever the shared object says.
+    """
+    state = {newsletter_key(n): (n.user_selected, n.filters) for n in previous}
+    view = []
+    for n in list(shared):
+        c = copy.copy(n)
+        c.user_selected, c.filters = state.get(
+            newsletter_key(n), (False, dict(n.filters or {}))
+        )
+        view.append(c)
+    return view
+
+
+def computation_cache_from_config(config_path: str = "config.yaml"):
+    """
+    Computation cache configured in config.yaml: computation_cache_max_entries
+    results in memory, also kept on disk under computation_cache_path if set.
+    """
+    config = load_config(config_path)
+    path = config.get("computation_cache_path") or None
+    max_entries = config.get("computation_cache_max_entries", 64)
+    try:
+        return ComputationCache(path, max_entries=max_entries)
+    except OSError as e:
+        logging.warning(f"Keeping computation cache in memory, {path} unusable: {e}")
+        return ComputationCache(max_entries=max_entries)
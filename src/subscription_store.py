@@ -1,35 +1,101 @@
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from subscription import Subscription
+from user import User
+
+SubscriptionKey = Tuple[str, str]
+
+
+def _key(subscription: Subscription) -> SubscriptionKey:
+    return subscription.user.email, subscription.newsletter.title
 
 
 class SubscriptionStore:
+    """
+    Subscriptions keyed by (user email, newsletter title), with reverse
+    indexes from each user to their subscriptions and from each newsletter to
+    its subscribers, so every lookup is O(1) or O(matches) rather than a scan.
+    A pair is subscribed at most once: creating it again replaces it.
+    """
+
     def __init__(self):
-        self._subscriptions: List[Subscription] = []
+        # Insertion-ordered, so list_all keeps creation order
+        self._subscriptions: Dict[SubscriptionKey, Subscription] = {}
+        # email -> newsletter titles and title -> emails, as ordered sets
+        self._by_user: Dict[str, Dict[str, None]] = {}
+        self._by_newsletter: Dict[str, Dict[str, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def _link(self, email: str, title: str) -> None:
+        self._by_user.setdefault(email, {})[title] = None
+        self._by_newsletter.setdefault(title, {})[email] = None
+
+    def _unlink(self, email: str, title: str) -> None:
+        for index, outer, inner in (
+            (self._by_user, email, title),
+            (self._by_newsletter, title, email),
+        ):
+            keys = index[outer]
+            del keys[inner]
+            if not keys:
+                del index[outer]
 
     def create(self, subscription: Subscription) -> None:
-        self._subscriptions.append(subscription)
+        key = _key(subscription)
+        self._subscriptions[key] = subscription
+        self._link(*key)
+
+    def create_many(self, subscriptions: Iterable[Subscription]) -> None:
+        for s in subscriptions:
+            self.create(s)
 
     def read(self, user_email: str, newsletter_title: str) -> Optional[Subscription]:
-        for s in self._subscriptions:
-            if s.user.email == user_email and s.newsletter.title == newsletter_title:
-                return s
-        return None
+        return self._subscriptions.get((user_email, newsletter_title))
 
     def update(
         self, user_email: str, newsletter_title: str, new_subscription: Subscription
     ) -> bool:
-        for i, s in enumerate(self._subscriptions):
-            if s.user.email == user_email and s.newsletter.title == newsletter_title:
-                self._subscriptions[i] = new_subscription
-                return True
-        return False
+        key = (user_email, newsletter_title)
+        if key not in self._subscriptions:
+            return False
+        new_key = _key(new_subscription)
+        if new_key != key:
+            # a subscription moved to another user or newsletter goes to the
+            # end of list_all, replacing any subscription already at new_key
+            self.delete(*key)
+            self.delete(*new_key)
+        self.create(new_subscription)
+        return True
 
     def delete(self, user_email: str, newsletter_title: str) -> bool:
-        for i, s in enumerate(self._subscriptions):
-            if s.user.email == user_email and s.newsletter.title == newsletter_title:
-                del self._subscriptions[i]
-                return True
-        return False
+        if self._subscriptions.pop((user_email, newsletter_title), None) is None:
+            return False
+        self._unlink(user_email, newsletter_title)
+        return True
+
+    def delete_many(self, keys: Iterable[SubscriptionKey]) -> int:
+        """Delete (user email, newsletter title) pairs; returns how many were stored."""
+        return sum(self.delete(email, title) for email, title in keys)
+
+    def delete_for_user(self, user_email: str) -> int:
+        """Delete all of a user's subscriptions; returns how many there were."""
+        titles = list(self._by_user.get(user_email, ()))
+        return self.delete_many((user_email, t) for t in titles)
+
+    def for_user(self, user_email: str) -> List[Subscription]:
+        """The user's subscriptions, oldest first."""
+        return [
+            self._subscriptions[(user_email, t)]
+            for t in self._by_user.get(user_email, ())
+        ]
+
+    def subscribers(self, newsletter_title: str) -> List[User]:
+        """Users subscribed to the newsletter, in subscription order."""
+        return [
+            self._subscriptions[(e, newsletter_title)].user
+            for e in self._by_newsletter.get(newsletter_title, ())
+        ]
 
     def list_all(self) -> List[Subscription]:
-        return list(self._subscriptions)
+        return list(self._subscriptions.values())
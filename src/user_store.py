@@ -1,33 +1,45 @@
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 from user import User
 
 
 class UserStore:
+    """
+    Users keyed by email, so lookups are O(1). Emails are unique: creating a
+    user whose email is already stored replaces that user.
+    """
+
     def __init__(self):
-        self._users: List[User] = []
+        # Insertion-ordered, so list_all keeps creation order
+        self._users: Dict[str, User] = {}
+
+    def __len__(self) -> int:
+        return len(self._users)
 
     def create(self, user: User) -> None:
-        self._users.append(user)
+        self._users[user.email] = user
+
+    def create_many(self, users: Iterable[User]) -> None:
+        for u in users:
+            self._users[u.email] = u
 
     def read(self, email: str) -> Optional[User]:
-        for u in self._users:
-            if u.email == email:
-                return u
-        return None
+        return self._users.get(email)
 
     def update(self, email: str, new_user: User) -> bool:
-        for i, u in enumerate(self._users):
-            if u.email == email:
-                self._users[i] = new_user
-                return True
-        return False
+        if email not in self._users:
+            return False
+        if new_user.email != email:
+            # a changed email moves the user to the end of list_all
+            del self._users[email]
+        self._users[new_user.email] = new_user
+        return True
 
     def delete(self, email: str) -> bool:
-        for i, u in enumerate(self._users):
-            if u.email == email:
-                del self._users[i]
-                return True
-        return False
+        return self._users.pop(email, None) is not None
+
+    def delete_many(self, emails: Iterable[str]) -> int:
+        """Delete users by email; returns how many were stored."""
+        return sum(self._users.pop(e, None) is not None for e in emails)
 
     def list_all(self) -> List[User]:
-        return list(self._users)
+        return list(self._users.values())
@@ -0,0 +1,541 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import load_config
+from grouping import normalize_rows
+
+
+class ExactIndex:
+    """
+    Brute-force cosine-similarity index over unit-normalized float32 vectors.
+    Vectors are addressed by string keys; add() upserts and remove() marks rows
+    dead until enough of them accumulate to compact the matrix.
+    This is also the ground truth the approximate backends are measured against.
+    """
+
+    backend = "exact"
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim
+        self._vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        self._size = 0
+        self._keys: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def keys(self) -> List[str]:
+        return list(self._rows)
+
+    def clear(self) -> None:
+        """Remove every vector, so vectors of another dimension can be added."""
+        self.dim = None
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        self._size = 0
+        self._keys = []
+        self._rows = {}
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        return None if row is None else self._vectors[row]
+
+    def _reserve(self, n_new: int) -> None:
+        needed = self._size + n_new
+        if needed <= len(self._vectors):
+            return
+        capacity = max(needed, 2 * len(self._vectors), 64)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[: self._size] = self._vectors[: self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self._size] = self._alive[: self._size]
+        self._vectors, self._alive = vectors, alive
+
+    def add(self, keys: Sequence[str], vectors) -> None:
+        """Insert or replace the vectors for keys."""
+        if len(keys) == 0:
+            return
+        X = normalize_rows(vectors)
+        if self.dim is None:
+            self.dim = X.shape[1]
+            self._vectors = np.empty((0, self.dim), dtype=np.float32)
+        if X.shape[1] != self.dim:
+            raise ValueError(
+                f"Expected vectors of dimension {self.dim}, got {X.shape[1]}"
+            )
+        new_rows = []
+        for key, vec in zip(keys, X):
+            row = self._rows.get(key)
+            if row is not None:
+                self._vectors[row] = vec
+                self._on_update(row)
+                continue
+            self._reserve(1)
+            row = self._size
+            self._size += 1
+            self._vectors[row] = vec
+            self._alive[row] = True
+            self._keys.append(key)
+            self._rows[key] = row
+            new_rows.append(row)
+        self._on_insert(np.asarray(new_rows, dtype=np.int64))
+
+    def remove(self, keys: Sequence[str]) -> int:
+        """Delete keys from the index; returns how many were present."""
+        removed = 0
+        for key in keys:
+            row = self._rows.pop(key, None)
+            if row is None:
+                continue
+            self._alive[row] = False
+            self._keys[row] = None
+            removed += 1
+        dead = self._size - len(self._rows)
+        if dead > 1024 and dead > len(self._rows):
+            self._compact()
+        return removed
+
+    def _compact(self) -> None:
+        rows = np.flatnonzero(self._alive[: self._size])
+        self._remap(rows)
+        self._vectors = self._vectors[rows].copy()
+        self._alive = np.ones(len(rows), dtype=bool)
+        self._keys = [self._keys[r] for r in rows]
+        self._rows = {k: i for i, k in enumerate(self._keys)}
+        self._size = len(rows)
+
+    # Hooks for subclasses that keep per-row structures
+    def _on_insert(self, rows: np.ndarray) -> None:
+        pass
+
+    def _on_update(self, row: int) -> None:
+        pass
+
+    def _remap(self, kept_rows: np.ndarray) -> None:
+        pass
+
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Rows worth scoring for query, or None to scan everything."""
+        return None
+
+    def _scores(self, query) -> Tuple[np.ndarray, np.ndarray]:
+        q = normalize_rows(query)[0]
+        rows = self._candidate_rows(q)
+        if rows is None:
+            rows = np.flatnonzero(self._alive[: self._size])
+        else:
+            rows = rows[self._alive[rows]]
+        return rows, self._vectors[rows] @ q
+
+    def search(self, query, k: int = 10) -> List[Tuple[str, float]]:
+        """The k keys most similar to query as (key, cosine similarity), best first."""
+        if not self._rows or k <= 0:
+            return []
+        rows, sims = self._scores(query)
+        if len(rows) > k:
+            top = np.argpartition(-sims, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return [(self._keys[rows[i]], float(sims[i])) for i in top]
+
+    def radius_search(self, query, threshold: float) -> List[Tuple[str, float]]:
+        """All keys with cosine similarity above threshold, best first."""
+        if not self._rows:
+            return []
+        rows, sims = self._scores(query)
+        hits = np.flatnonzero(sims > threshold)
+        hits = hits[np.argsort(-sims[hits], kind="stable")]
+        return [(self._keys[rows[i]], float(sims[i])) for i in hits]
+
+    def _state(self) -> Tuple[dict, Dict[str, np.ndarray]]:
+        return {"dim": self.dim}, {}
+
+    def save(self, path: str) -> None:
+        """Persist to <path>.npz; dead rows are compacted away first."""
+        if self._size != len(self._rows):
+            self._compact()
+        meta, arrays = self._state()
+        meta["backend"] = self.backend
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            meta=np.array(json.dumps(meta)),
+            keys=np.array(self._keys[: self._size], dtype=str),
+            vectors=self._vectors[: self._size],
+            **arrays,
+        )
+        os.replace(tmp_path, path + ".npz")
+
+    @classmethod
+    def _load(cls, meta: dict, data) -> "ExactIndex":
+        index = cls(dim=meta["dim"])
+        keys = [str(k) for k in data["keys"]]
+        index._vectors = np.array(data["vectors"], dtype=np.float32)
+        if index.dim is not None:
+            index._vectors = index._vectors.reshape(len(keys), index.dim)
+        index._alive = np.ones(len(keys), dtype=bool)
+        index._size = len(keys)
+        index._keys = keys
+        index._rows = {k: i for i, k in enumerate(keys)}
+        return index
+
+
+class IVFIndex(ExactIndex):
+    """
+    Inverted-file index: vectors are bucketed by their nearest k-means centroid
+    and queries only score the nprobe buckets closest to them.
+    Falls back to exact search until min_train_size vectors have been added,
+    and retrains when the collection has grown 4x since the last training.
+    """
+
+    backend = "ivf"
+
+    def __init__(
+        self,
+        dim: Optional[int] = None,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        min_train_size: int = 2048,
+        seed: int = 0,
+    ):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.seed = seed
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.empty(0, dtype=np.int32)
+        self._trained_size = 0
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def clear(self) -> None:
+        super().clear()
+        self._centroids = None
+        self._assign = np.empty(0, dtype=np.int32)
+        self._trained_size = 0
+
+    def _reserve(self, n_new: int) -> None:
+        super()._reserve(n_new)
+        if len(self._assign) < len(self._vectors):
+            assign = np.full(len(self._vectors), -1, dtype=np.int32)
+            assign[: self._size] = self._assign[: self._size]
+            self._assign = assign
+
+    def train(self, iterations: int = 10) -> None:
+        """Fit centroids with spherical k-means on (a sample of) the live vectors."""
+        rows = np.flatnonzero(self._alive[: self._size])
+        if len(rows) == 0:
+            return
+        nlist = self.nlist or max(1, int(np.sqrt(len(rows))))
+        nlist = min(nlist, len(rows))
+        rng = np.random.default_rng(self.seed)
+        sample = rows
+        if len(rows) > 64 * nlist:
+            sample = rng.choice(rows, 64 * nlist, replace=False)
+        X = self._vectors[sample]
+        centroids = X[rng.choice(len(X), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(X @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, X)
+            counts = np.bincount(labels, minlength=nlist)
+            # Empty clusters keep their previous centroid
+            filled = counts > 0
+            centroids[filled] = normalize_rows(sums[filled])
+        self._centroids = centroids
+        self._assign[: self._size] = -1
+        self._assign_rows(rows)
+        self._trained_size = len(rows)
+        logging.info(f"Trained IVF index: {nlist} lists over {len(rows)} vectors")
+
+    def _assign_rows(self, rows: np.ndarray) -> None:
+        for start in range(0, len(rows), 8192):
+            block = rows[start : start + 8192]
+            self._assign[block] = np.argmax(
+                self._vectors[block] @ self._centroids.T, axis=1
+            )
+
+    def _on_insert(self, rows: np.ndarray) -> None:
+        if not self.trained:
+            if len(self) >= self.min_train_size:
+                self.train()
+        elif len(self) > 4 * self._trained_size:
+            self.train()
+        elif len(rows):
+            self._assign_rows(rows)
+
+    def _on_update(self, row: int) -> None:
+        if self.trained:
+            self._assign_rows(np.array([row]))
+
+    def _remap(self, kept_rows: np.ndarray) -> None:
+        self._assign = self._assign[kept_rows].copy()
+
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if not self.trained:
+            return None
+        nprobe = min(self.nprobe, len(self._centroids))
+        probes = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        return np.flatnonzero(np.isin(self._assign[: self._size], probes))
+
+    def _state(self) -> Tuple[dict, Dict[str, np.ndarray]]:
+        meta = {
+            "dim": self.dim,
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "min_train_size": self.min_train_size,
+            "seed": self.seed,
+            "trained_size": self._trained_size,
+        }
+        arrays = {"assign": self._assign[: self._size]}
+        if self.trained:
+            arrays["centroids"] = self._centroids
+        return meta, arrays
+
+    @classmethod
+    def _load(cls, meta: dict, data) -> "IVFIndex":
+        index = super()._load(meta, data)
+        index.nlist = meta["nlist"]
+        index.nprobe = meta["nprobe"]
+        index.min_train_size = meta["min_train_size"]
+        index.seed = meta["seed"]
+        index._trained_size = meta["trained_size"]
+        index._assign = np.array(data["assign"], dtype=np.int32)
+        if "centroids" in data:
+            index._centroids = np.array(data["centroids"], dtype=np.float32)
+        return index
+
+
+class HnswlibIndex:
+    """
+    HNSW graph index backed by the optional hnswlib package.
+    Same interface as ExactIndex; deletes are tombstoned by hnswlib and their
+    slots reused by later inserts.
+    """
+
+    backend = "hnswlib"
+
+    def __init__(
+        self,
+        dim: Optional[int] = None,
+        M: int = 16,
+        ef_construction: int = 200,
+        ef: int = 64,
+    ):
+        import hnswlib  # noqa: F401  (fail early if the backend is missing)
+
+        self.dim = dim
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self._index = None
+        self._labels: Dict[str, int] = {}
+        self._keys: Dict[int, str] = {}
+        self._free: List[int] = []
+        self._next_label = 0
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._labels
+
+    def keys(self) -> List[str]:
+        return list(self._labels)
+
+    def clear(self) -> None:
+        self.dim = None
+        self._index = None
+        self._labels = {}
+        self._keys = {}
+        self._free = []
+        self._next_label = 0
+
+    def _init(self, dim: int, capacity: int) -> None:
+        import hnswlib
+
+        self.dim = dim
+        self._index = hnswlib.Index(space="cosine", dim=dim)
+        self._index.init_index(
+            max_elements=max(capacity, 1024),
+            ef_construction=self.ef_construction,
+            M=self.M,
+            allow_replace_deleted=True,
+        )
+        self._index.set_ef(self.ef)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        label = self._labels.get(key)
+        if label is None:
+            return None
+        return normalize_rows(self._index.get_items([label]))[0]
+
+    def add(self, keys: Sequence[str], vectors) -> None:
+        if len(keys) == 0:
+            return
+        X = normalize_rows(vectors)
+        if self._index is None:
+            self._init(X.shape[1], 2 * len(keys))
+        needed = len(self._labels) + len(self._free) + len(keys)
+        if needed > self._index.get_max_elements():
+            self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+        labels, replace = [], []
+        for key in keys:
+            label = self._labels.get(key)
+            if label is None:
+                if self._free:
+                    label = self._free.pop()
+                    replace.append(True)
+                else:
+                    label = self._next_label
+                    self._next_label += 1
+                    replace.append(False)
+                self._labels[key] = label
+                self._keys[label] = key
+            else:
+                replace.append(False)
+            labels.append(label)
+        labels = np.asarray(labels)
+        replace = np.asarray(replace)
+        if (~replace).any():
+            self._index.add_items(X[~replace], labels[~replace])
+        if replace.any():
+            self._index.add_items(X[replace], labels[replace], replace_deleted=True)
+
+    def remove(self, keys: Sequence[str]) -> int:
+        removed = 0
+        for key in keys:
+            label = self._labels.pop(key, None)
+            if label is None:
+                continue
+            del self._keys[label]
+            self._index.mark_deleted(label)
+            self._free.append(label)
+            removed += 1
+        return removed
+
+    def search(self, query, k: int = 10) -> List[Tuple[str, float]]:
+        if not self._labels or k <= 0:
+            return []
+        k = min(k, len(self._labels))
+        self._index.set_ef(max(self.ef, k))
+        labels, distances = self._index.knn_query(normalize_rows(query), k=k)
+        return [
+            (self._keys[int(label)], float(1.0 - dist))
+            for label, dist in zip(labels[0], distances[0])
+        ]
+
+    def radius_search(self, query, threshold: float) -> List[Tuple[str, float]]:
+        # hnswlib has no range query: widen k until the k-th hit falls below threshold
+        k = 32
+        while True:
+            hits = self.search(query, k)
+            if len(hits) < k or hits[-1][1] <= threshold:
+                return [(key, sim) for key, sim in hits if sim > threshold]
+            k *= 4
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        meta = {
+            "backend": self.backend,
+            "dim": self.dim,
+            "M": self.M,
+            "ef_construction": self.ef_construction,
+            "ef": self.ef,
+            "labels": self._labels,
+            "free": self._free,
+            "next_label": self._next_label,
+        }
+        if self._index is not None:
+            self._index.save_index(path + ".hnsw")
+        with open(path + ".json", "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def _load(cls, path: str, meta: dict) -> "HnswlibIndex":
+        import hnswlib
+
+        index = cls(
+            dim=meta["dim"],
+            M=meta["M"],
+            ef_construction=meta["ef_construction"],
+            ef=meta["ef"],
+        )
+        if os.path.exists(path + ".hnsw"):
+            index._index = hnswlib.Index(space="cosine", dim=meta["dim"])
+            index._index.load_index(path + ".hnsw", allow_replace_deleted=True)
+            index._index.set_ef(index.ef)
+        index._labels = meta["labels"]
+        index._keys = {label: key for key, label in index._labels.items()}
+        index._free = meta["free"]
+        index._next_label = meta["next_label"]
+        return index
+
+
+BACKENDS = {"exact": ExactIndex, "ivf": IVFIndex, "hnswlib": HnswlibIndex}
+
+
+def hnswlib_available() -> bool:
+    try:
+        import hnswlib  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def make_vector_index(backend: str = "auto", **kwargs):
+    """
+    Create an empty index. backend is one of 'exact', 'ivf', 'hnswlib', or
+    'auto' (hnswlib when installed, else the pure-NumPy IVF index).
+    """
+    if backend == "auto":
+        backend = "hnswlib" if hnswlib_available() else "ivf"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector index backend: {backend}")
+    return BACKENDS[backend](**kwargs)
+
+
+def load_vector_index(path: str):
+    """Load an index written by save(path), or return None if there is none."""
+    if os.path.exists(path + ".npz"):
+        with np.load(path + ".npz") as data:
+            meta = json.loads(str(data["meta"]))
+            return BACKENDS[meta["backend"]]._load(meta, data)
+    if os.path.exists(path + ".json"):
+        with open(path + ".json", "r") as f:
+            meta = json.load(f)
+        return BACKENDS[meta["backend"]]._load(path, meta)
+    return None
+
+
+def vector_index_from_config(config_path: str = "config.yaml"):
+    """
+    Load the persisted index named in config.yaml (vector_index_path), or create an
+    empty one with the configured backend (vector_index_backend).
+    Returns (index, path).
+    """
+    config = load_config(config_path)
+    path = config.get("vector_index_path", "data/vector_index/newsletters")
+    backend = config.get("vector_index_backend", "auto")
+    try:
+        index = load_vector_index(path)
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable vector index {path}: {e}")
+        index = None
+    if index is None:
+        index = make_vector_index(backend)
+    return index, path
@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from config import load_config
+from embedding_cache import content_hash
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case- and whitespace-insensitive form of a user filter prompt."""
+    return re.sub(r"\s+", " ", prompt).strip().lower()
+
+
+def verdict_key(provider: str, model: str, user_prompt: str, context: str) -> str:
+    """Cache key for one (provider, model, filter prompt, article content) verdict."""
+    return content_hash(
+        "\0".join(
+            [provider, model, normalize_prompt(user_prompt), content_hash(context)]
+        )
+    )
+
+
+class VerdictCache:
+    """
+    Persistent SQLite cache of LLM filter verdicts.
+
+    Entries older than ttl_seconds are treated as misses and purged. When more
+    than max_entries are stored, the least recently used ones are evicted.
+    hits and misses count lookups since the cache was opened.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS verdicts_accessed ON verdicts (accessed)"
+        )
+        self.purge_expired()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def _cutoff(self) -> Optional[float]:
+        if self.ttl_seconds is None:
+            return None
+        return self._clock() - self.ttl_seconds
+
+    def purge_expired(self) -> int:
+        """Delete entries older than the TTL. Returns how many were removed."""
+        cutoff = self._cutoff()
+        if cutoff is None:
+            return 0
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM verdicts WHERE created < ?", (cutoff,)
+            ).rowcount
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        """Return the cached verdicts among keys; missing or expired keys are left out."""
+        keys = list(dict.fromkeys(keys))
+        cutoff = self._cutoff()
+        found = {}
+        with self._lock, self._conn:
+            # SQLite caps bound parameters per statement, so look up in chunks
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, result, created FROM verdicts "
+                    f"WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, result, created in rows:
+                    if cutoff is None or created >= cutoff:
+                        found[key] = json.loads(result)
+            if found:
+                now = self._clock()
+                self._conn.executemany(
+                    "UPDATE verdicts SET accessed = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, results: Dict[str, dict]) -> None:
+        """Store verdicts by key, then evict least recently used entries over max_entries."""
+        if not results:
+            return
+        now = self._clock()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO verdicts (key, result, created, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                [(k, json.dumps(r), now, now) for k, r in results.items()],
+            )
+            if self.max_entries is not None:
+                self._conn.execute(
+                    "DELETE FROM verdicts WHERE key IN ("
+                    "SELECT key FROM verdicts ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def put(self, key: str, result: dict) -> None:
+        self.put_many({key: result})
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def verdict_cache_from_config(config_path: str = "config.yaml") -> VerdictCache:
+    """
+    Open the verdict cache named in config.yaml (llm_cache_path), with
+    llm_cache_ttl_days and llm_cache_max_entries as its limits.
+    """
+    config = load_config(config_path)
+    path = config.get("llm_cache_path", "data/llm_cache/verdicts.sqlite")
+    ttl_days = config.get("llm_cache_ttl_days", 30)
+    try:
+        return VerdictCache(
+            path,
+            ttl_seconds=ttl_days * 86400 if ttl_days else None,
+            max_entries=config.get("llm_cache_max_entries", 100000),
+        )
+    except sqlite3.DatabaseError as e:
+        logging.warning(f"Ignoring unreadable LLM verdict cache {path}: {e}")
+        return VerdictCache(":memory:")
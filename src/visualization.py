@@ -1,40 +1,50 @@
-from embedding import compute_embeddings
-from clustering import tsne_cluster
-from grouping import group_by_cosine_similarity, plotly_cosine_dendrogram
+from embedding import compute_embeddings_cached
+from clustering import project_2d
+from grouping import (
+    group_by_cosine_similarity,
+    group_with_index,
+    plotly_cosine_dendrogram,
+)
+from newsletter import assign_rows, newsletter_key, stack_rows
 import pandas as pd
-import plotly.express as px
 import streamlit as st
 
+WEBGL_MIN_POINTS = 1000
 
-def compute_and_assign_embeddings_tsne(newsletters, perplexity=3):
+
+def compute_and_assign_embeddings_tsne(
+    newsletters, perplexity=None, index=None, projection=None
+):
+    """
+    Embeds and t-SNE-projects newsletters in place.
+    If a vector index is given, the embeddings are also upserted into it.
+    With a Projection (see projection.py) articles it has already placed keep
+    their coordinates and only new ones are positioned; otherwise all of them
+    are projected again with project_2d's automatic backend.
+    """
     if not newsletters:
         return
     texts = [n.title + " " + n.content for n in newsletters]
-    embeddings = compute_embeddings(texts)
-    for n, emb in zip(newsletters, embeddings):
-        n.embedding = emb
-    X_embedded = tsne_cluster(embeddings, perplexity=perplexity)
-    for n, tsne_coords in zip(newsletters, X_embedded):
-        n.tsne = list(tsne_coords)
+    embeddings = assign_rows(newsletters, "embedding", compute_embeddings_cached(texts))
+    keys = [newsletter_key(n) for n in newsletters]
+    if index is not None:
+        index.add(keys, embeddings)
+    if projection is not None:
+        coords = projection.project(keys, embeddings)
+    else:
+        coords = project_2d(embeddings, perplexity=perplexity)
+    assign_rows(newsletters, "tsne", coords)
 
 
-def tsne_visualization(newsletters, color_by=None):
+def tsne_visualization(newsletters, color_by=None, projection=None):
     """
     Visualizes t-SNE clustering for the given newsletters using their attributes.
     Optionally colors by a filter key (color_by).
     """
     st.subheader("t-SNE Visualization of News Embeddings")
-    embeddings = [n.embedding for n in newsletters]
-    tsne_coords = [n.tsne for n in newsletters]
-    if any(e is None for e in embeddings) or any(t is None for t in tsne_coords):
-        texts = [n.title + " " + n.content for n in newsletters]
-        embeddings = compute_embeddings(texts)
-        X_embedded = tsne_cluster(embeddings, perplexity=3)
-        for n, emb, tsne_val in zip(newsletters, embeddings, X_embedded):
-            n.embedding = emb
-            n.tsne = list(tsne_val)
-        tsne_coords = [n.tsne for n in newsletters]
-    df_vis = pd.DataFrame(tsne_coords, columns=["x", "y"])
+    if any(n.embedding is None or n.tsne is None for n in newsletters):
+        compute_and_assign_embeddings_tsne(newsletters, projection=projection)
+    df_vis = pd.DataFrame(stack_rows(newsletters, "tsne"), columns=["x", "y"])
     df_vis["title"] = [n.title for n in newsletters]
     # Add color column if color_by or color_override is specified
     color_arg = None
@@ -57,6 +67,8 @@ def tsne_visualization(newsletters, color_by=None):
 
         df_vis["color"] = [get_color_val(n) for n in newsletters]
         color_arg = "color"
+    import plotly.express as px
+
     fig = px.scatter(
         df_vis,
         x="x",
@@ -72,15 +84,21 @@ def tsne_visualization(newsletters, color_by=None):
         ),
         width=600,
         height=600,
+        # WebGL keeps large archives interactive; SVG slows down past a few thousand points
+        render_mode="webgl" if len(df_vis) > WEBGL_MIN_POINTS else "auto",
     )
     st.plotly_chart(fig, use_container_width=True)
 
 
 # --- Grouped Articles Function ---
-def grouped_articles(newsletters):
-    embeddings = [n.embedding for n in newsletters]
+def grouped_articles(newsletters, index=None, mode="greedy"):
     st.subheader("Grouped Articles (Cosine Similarity > 0.7)")
-    groups = group_by_cosine_similarity(embeddings, threshold=0.7)
+    if index is not None:
+        keys = [newsletter_key(n) for n in newsletters]
+        groups = group_with_index(keys, index, threshold=0.7)
+    else:
+        embeddings = stack_rows(newsletters, "embedding")
+        groups = group_by_cosine_similarity(embeddings, threshold=0.7, mode=mode)
     for group_id, indices in groups.items():
         with st.expander(f"Group {group_id+1} ({len(indices)} articles)"):
             for idx in indices:
@@ -97,6 +115,6 @@ def grouped_articles(newsletters):
 # --- Dendrogram Visualization Function ---
 def dendrogram_visualization(newsletters):
     st.subheader("Interactive Cosine Similarity Dendrogram")
-    embeddings = [n.embedding for n in newsletters]
+    embeddings = stack_rows(newsletters, "embedding")
     dendro_fig = plotly_cosine_dendrogram(embeddings, [n.title for n in newsletters])
     st.plotly_chart(dendro_fig, use_container_width=True)
@@ -1,32 +1,92 @@
-def fetch_article_full_text(url: str) -> str:
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from content_cache import NEGATIVE_STATUSES, CachedPage, ContentCache
+
+USER_AGENT = "Mozilla/5.0 (compatible; SmartNewsletterDashboard/1.0)"
+
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    """
+    Seconds until deadline (a time.monotonic() value), None without one.
+    Raises TimeoutError once the deadline has passed.
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Full-text deadline reached")
+    return remaining
+
+
+def fetch_article_full_text(
+    url: str, session: Optional[requests.Session] = None, timeout: float = None
+) -> str:
     """
     Fetch the main article text from a URL using newspaper3k.
     Returns the article text, or an error message if fetching/parsing fails.
     Tolerates network errors, 403 forbidden, and parsing exceptions.
+    With session, the page is downloaded on that (pooled) session instead of
+    a new connection, and HTTP errors are raised.
     """
 
     from newspaper import Article
 
+    if session is not None:
+        resp = session.get(url, timeout=timeout, headers={"User-Agent": USER_AGENT})
+        resp.raise_for_status()
+        return extract_article_text(url, resp.text)
     article = Article(url)
     article.download()
     article.parse()
     return article.text.strip() if article.text else "No article text found."
 
 
-def duckduckgo_search_similar_news(query: str, max_results: int = 10) -> list:
+def extract_article_text(url: str, html: str) -> str:
+    """The main article text of an already downloaded page, using newspaper3k."""
+
+    from newspaper import Article
+
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+    return article.text.strip() if article.text else "No article text found."
+
+
+def duckduckgo_search_similar_news(
+    query: str,
+    max_results: int = 10,
+    fetch: Callable[[str], str] = None,
+    deadline: Optional[float] = None,
+) -> list:
     """
     Search DuckDuckGo for similar news or the original press release.
     Returns a list of dicts with 'title', 'url', and 'snippet'.
     Requires: pip install duckduckgo-search
+    fetch downloads one result's text (default: fetch_article_full_text).
+    With a deadline (a time.monotonic() value) the search request times out
+    at the deadline and no results are downloaded after it.
     """
 
     from ddgs import DDGS
 
+    fetch = fetch or fetch_article_full_text
+
     results = []
 
     search_term = f"{query} news press release"
+    remaining = time_left(deadline)
+    timeout = 5 if remaining is None else min(5, remaining)
     try:
-        with DDGS() as ddgs:
+        with DDGS(timeout=timeout) as ddgs:
             for r in ddgs.text(search_term, max_results=max_results):
                 results.append(
                     {
@@ -43,7 +103,8 @@ def duckduckgo_search_similar_news(query: str, max_results: int = 10) -> list:
     # filter for PR newswire
     for r in results:
         if "www.prnewswire.com" in r["url"]:
-            full_text = fetch_article_full_text(r["url"])
+            time_left(deadline)
+            full_text = fetch(r["url"])
             return full_text
 
     # if no PR newswire, try to scrape 3 other news articles
@@ -52,8 +113,9 @@ def duckduckgo_search_similar_news(query: str, max_results: int = 10) -> list:
     for r in results:
         if success >= 3:
             break
+        time_left(deadline)
         try:
-            full_text += fetch_article_full_text(r["url"])
+            full_text += fetch(r["url"])
             success += 1
         except Exception:
             pass
@@ -61,27 +123,183 @@ def duckduckgo_search_similar_news(query: str, max_results: int = 10) -> list:
     return full_text
 
 
-def find_full_text(url, title):
+def find_full_text(
+    url, title, fetch: Callable[[str], str] = None, deadline: Optional[float] = None
+):
     """
     Try to fetch the full article text from the given URL.
     If forbidden or error, search DuckDuckGo for similar news articles.
     Returns the article text or a message if not found.
+    fetch downloads one page's text (default: fetch_article_full_text).
+    With a deadline (a time.monotonic() value) no search is started after it
+    and TimeoutError is raised instead.
     """
+    fetch = fetch or fetch_article_full_text
+    time_left(deadline)
     try:
-        article_text = fetch_article_full_text(url)
+        article_text = fetch(url)
         if "forbidden" in article_text.lower() or "error" in article_text.lower():
             raise Exception("Access forbidden or error fetching article.")
         return article_text
     except Exception as e:
         print(f"Error fetching article from URL: {e}")
+        time_left(deadline)
         print("Searching DuckDuckGo for similar news...")
-        search_results = duckduckgo_search_similar_news(title)
+        search_results = duckduckgo_search_similar_news(
+            title, fetch=fetch, deadline=deadline
+        )
         if search_results:
             return search_results
         else:
             return "No similar articles found."
 
 
+class FullTextFetcher:
+    """
+    Finds the full text of many articles concurrently on a thread pool.
+    Downloads share one pooled HTTP session and are limited to per_host
+    simultaneous connections per host. Articles not finished within deadline
+    seconds of the start of fetch_all are given up on: no request or search
+    is started after the deadline, requests time out at it, and pages
+    arriving later are not cached.
+
+    With a ContentCache, fresh pages are served without a request, stale ones
+    are revalidated with a conditional request, and pages that answered 403,
+    404 etc. are not requested again until their negative TTL has passed.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        per_host: int = 2,
+        timeout: float = 15.0,
+        deadline: Optional[float] = 120.0,
+        cache: Optional[ContentCache] = None,
+    ):
+        self.cache = cache
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.deadline = deadline
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url or "").netloc
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+    def _timeout(self, deadline: Optional[float]) -> float:
+        remaining = time_left(deadline)
+        return self.timeout if remaining is None else min(self.timeout, remaining)
+
+    def download(self, url: str, deadline: Optional[float] = None) -> str:
+        page = self.cache.get(url) if self.cache is not None else None
+        if page is not None and page.fresh:
+            return self._cached_text(url, page)
+        with self._host_limit(url):
+            timeout = self._timeout(deadline)
+            if self.cache is None:
+                return fetch_article_full_text(url, self._session, timeout)
+            return self._revalidate(url, page, timeout, deadline)
+
+    def _cached_text(self, url: str, page: CachedPage) -> str:
+        if page.status != 200:
+            raise requests.HTTPError(f"{page.status} Error (cached) for url: {url}")
+        return page.text
+
+    def _revalidate(
+        self,
+        url: str,
+        page: Optional[CachedPage],
+        timeout: float,
+        deadline: Optional[float] = None,
+    ) -> str:
+        headers = {"User-Agent": USER_AGENT}
+        cached = page is not None and page.status == 200
+        if cached and page.etag:
+            headers["If-None-Match"] = page.etag
+        if cached and page.last_modified:
+            headers["If-Modified-Since"] = page.last_modified
+        resp = self._session.get(url, headers=headers, timeout=timeout)
+        time_left(deadline)
+        if resp.status_code == 304 and cached:
+            self.cache.revalidated(url)
+            return page.text
+        if resp.status_code in NEGATIVE_STATUSES:
+            self.cache.put_failure(url, resp.status_code)
+        resp.raise_for_status()
+        text = extract_article_text(url, resp.text)
+        self.cache.put(
+            url,
+            resp.text,
+            text,
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+        )
+        return text
+
+    def find(self, url: str, title: str, deadline: Optional[float] = None) -> str:
+        """find_full_text, downloading through the pooled session."""
+        return find_full_text(
+            url,
+            title,
+            fetch=lambda u: self.download(u, deadline),
+            deadline=deadline,
+        )
+
+    def fetch_all(
+        self,
+        articles: List[Tuple[str, str]],
+        on_progress: Callable[[int, int], None] = None,
+    ) -> List[Optional[str]]:
+        """
+        Find the full text of each (url, title) concurrently. Returns texts in
+        input order, None where fetching failed or missed the deadline
+        (failures are logged, not raised). on_progress(done, total) is called
+        from the calling thread as articles finish.
+        """
+        results: List[Optional[str]] = [None] * len(articles)
+        if not articles:
+            return results
+        done = 0
+        deadline = None
+        if self.deadline is not None:
+            deadline = time.monotonic() + self.deadline
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = {
+                pool.submit(self.find, url, title, deadline): i
+                for i, (url, title) in enumerate(articles)
+            }
+            for future in as_completed(futures, timeout=self.deadline):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    logging.error(
+                        f"Failed to fetch full text for {articles[i][0]}: {e}"
+                    )
+                done += 1
+                if on_progress:
+                    on_progress(done, len(articles))
+        except FuturesTimeoutError:
+            logging.warning(
+                f"Full-text deadline of {self.deadline}s reached; "
+                f"skipped {len(articles) - done} of {len(articles)} articles"
+            )
+        finally:
+            # work already running stops at the deadline passed to find
+            pool.shutdown(wait=False, cancel_futures=True)
+        return results
+
+
 if __name__ == "__main__":
     # Example URL (may trigger 403 or work depending on site)
     url = "https://www.fiercebiotech.com/cro/korean-cro-corestemchemon-inks-collaboration-expand-organoids-and-transcriptomics"
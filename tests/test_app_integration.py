@@ -4,7 +4,7 @@ from unittest.mock import patch
 
 def test_app_runs():
     with (
-        patch("ingest.ingest_newsletters_from_feed", return_value=[]),
+        patch("ingest.ingest_new_newsletters_from_feeds", return_value=[]),
         patch("visualization.compute_and_assign_embeddings_tsne", return_value=None),
     ):
         app = st_test.AppTest.from_file("src/app.py")
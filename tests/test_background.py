@@ -0,0 +1,24 @@
+import unittest
+import threading
+import background
+
+
+class TestBackground(unittest.TestCase):
+    def test_submit_runs_off_the_calling_thread(self):
+        future = background.submit("name", threading.current_thread)
+        self.assertIsNot(future.result(timeout=5), threading.current_thread())
+        self.assertTrue(future.result().name.startswith("background"))
+
+    def test_failure_is_logged_and_kept_on_the_future(self):
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertLogs(level="ERROR") as logs:
+            future = background.submit("failing", fail)
+            with self.assertRaises(ValueError):
+                future.result(timeout=5)
+        self.assertIn("Background task failing failed", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,16 @@
+import sys
+import types
 import unittest
+from unittest.mock import MagicMock, patch
 import numpy as np
-from clustering import tsne_cluster
+from clustering import (
+    auto_perplexity,
+    choose_projection_method,
+    fit_projection,
+    project_2d,
+    tsne_cluster,
+    tsne_transform,
+)
 
 
 class TestTSNEClustering(unittest.TestCase):
@@ -12,6 +22,58 @@ class TestTSNEClustering(unittest.TestCase):
         self.assertEqual(X_embedded.shape[1], 2)
         self.assertEqual(X_embedded.shape[0], len(embeddings))
 
+    def test_tsne_transform_places_points_near_their_neighbors(self):
+        anchors = np.array([[0.0, 0.0], [0.0, 0.1], [5.0, 5.0], [5.0, 5.1]])
+        layout = np.array([[-10.0, 0.0], [-10.0, 1.0], [10.0, 0.0], [10.0, 1.0]])
+        placed = tsne_transform(
+            [[5.0, 5.05], [0.0, 0.05]], anchors, layout, perplexity=1
+        )
+        self.assertEqual(placed.shape, (2, 2))
+        self.assertGreater(placed[0, 0], 5)
+        self.assertLess(placed[1, 0], -5)
+
+
+class TestProjectionBackends(unittest.TestCase):
+    def setUp(self):
+        self.X = np.random.default_rng(0).normal(size=(50, 8))
+
+    def test_auto_perplexity_scales_with_size(self):
+        self.assertEqual(auto_perplexity(10), 5)
+        self.assertEqual(auto_perplexity(3000), 30)
+        self.assertEqual(auto_perplexity(100000), 50)
+        self.assertLess(auto_perplexity(4), 4)
+
+    def test_auto_uses_tsne_for_small_archives_only(self):
+        self.assertEqual(choose_projection_method(1000), "tsne")
+        with patch("clustering.umap_available", return_value=False):
+            self.assertEqual(choose_projection_method(100000), "pca")
+        with patch("clustering.umap_available", return_value=True):
+            self.assertEqual(choose_projection_method(100000), "umap")
+
+    def test_pca_and_missing_umap_fallback(self):
+        pca = project_2d(self.X, method="pca", random_state=0)
+        self.assertEqual((pca.shape, pca.dtype), ((50, 2), np.float32))
+        with patch("clustering.umap_available", return_value=False):
+            fallback = project_2d(self.X, method="umap", random_state=0)
+        np.testing.assert_allclose(fallback, pca, atol=1e-4)
+        with self.assertRaises(ValueError):
+            project_2d(self.X, method="mds")
+        self.assertEqual(project_2d(self.X[:2]).shape, (2, 2))
+
+    def test_umap_accepts_previous_coordinates_as_init(self):
+        fake_umap = types.ModuleType("umap")
+        fake_umap.UMAP = MagicMock()
+        fake_umap.UMAP.return_value.fit_transform.return_value = np.ones((50, 2))
+        init = np.zeros((50, 2))
+        with patch.dict(sys.modules, {"umap": fake_umap}):
+            coords, method, model = fit_projection(self.X, method="umap", init=init)
+            project_2d(self.X, method="umap")
+        self.assertEqual((coords.shape, method), ((50, 2), "umap"))
+        self.assertIs(model, fake_umap.UMAP.return_value)
+        first, second = fake_umap.UMAP.call_args_list
+        np.testing.assert_array_equal(first.kwargs["init"], init)
+        self.assertEqual(second.kwargs["init"], "spectral")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,20 @@
+import unittest
+import os
+import tempfile
+from config import load_config
+
+
+class TestLoadConfig(unittest.TestCase):
+    def test_reads_yaml_and_defaults_to_empty(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "config.yaml")
+            self.assertEqual(load_config(path), {})
+            with open(path, "w") as f:
+                f.write("feeds:\n  - a.xml\n")
+            self.assertEqual(load_config(path), {"feeds": ["a.xml"]})
+            open(path, "w").close()
+            self.assertEqual(load_config(path), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
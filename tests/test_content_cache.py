@@ -0,0 +1,68 @@
+import unittest
+import tempfile
+import shutil
+import os
+from content_cache import ContentCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestContentCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.cache_dir, "pages.sqlite")
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_persists_page_and_validators(self):
+        cache = ContentCache(self.path)
+        cache.put("u", "<p>" + "html " * 500 + "</p>", "text", etag='"v1"')
+        cache.close()
+        reopened = ContentCache(self.path)
+        page = reopened.get("u")
+        self.assertEqual((page.status, page.text, page.etag), (200, "text", '"v1"'))
+        self.assertTrue(page.fresh)
+        self.assertTrue(reopened.get_html("u").startswith("<p>html"))
+        self.assertIsNone(reopened.get("missing"))
+        self.assertEqual((reopened.hits, reopened.misses), (1, 1))
+
+    def test_pages_go_stale_and_revalidate(self):
+        cache = ContentCache(self.path, max_age_seconds=60, clock=self.clock)
+        cache.put("u", "<p>x</p>", "x", last_modified="Mon, 01 Sep 2025")
+        self.clock.now += 61
+        self.assertFalse(cache.get("u").fresh)
+        cache.revalidated("u")
+        self.assertTrue(cache.get("u").fresh)
+
+    def test_failures_expire_after_negative_ttl(self):
+        cache = ContentCache(self.path, negative_ttl_seconds=3600, clock=self.clock)
+        cache.put_failure("u", 403)
+        page = cache.get("u")
+        self.assertEqual((page.status, page.text, page.fresh), (403, None, True))
+        self.clock.now += 3601
+        self.assertFalse(cache.get("u").fresh)
+
+    def test_evicts_least_recently_used_over_max_bytes(self):
+        body = os.urandom(600).decode("latin-1")  # incompressible, ~900 bytes
+        cache = ContentCache(self.path, max_bytes=2000, clock=self.clock)
+        for url in ("a", "b"):
+            cache.put(url, body, "t")
+            self.clock.now += 1
+        cache.get("a")
+        self.clock.now += 1
+        cache.put("c", body, "t")
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,8 @@
 import unittest
+import threading
+import numpy as np
+from unittest.mock import patch
+import embedding
 from embedding import compute_embeddings
 
 
@@ -6,9 +10,101 @@ class TestEmbedding(unittest.TestCase):
     def test_embedding_shape(self):
         texts = ["Hello world!", "Test sentence."]
         embeddings = compute_embeddings(texts)
-        self.assertEqual(len(embeddings), 2)
-        self.assertTrue(all(isinstance(vec, list) for vec in embeddings))
-        self.assertTrue(all(len(vec) > 0 for vec in embeddings))
+        self.assertEqual(embeddings.dtype, np.float32)
+        self.assertTrue(embeddings.flags["C_CONTIGUOUS"])
+        self.assertEqual(embeddings.shape[0], 2)
+        self.assertGreater(embeddings.shape[1], 0)
+
+
+class FakeModel:
+    """Embeds a text as [len(text), 1]; records each encode batch."""
+
+    max_seq_length = 8
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size, **kwargs):
+        self.batches.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float64)
+
+
+class TestLengthOrder(unittest.TestCase):
+    def test_encode_longest_first_keeps_input_order(self):
+        model = FakeModel()
+        texts = ["a" * n for n in [1, 30, 5, 20, 3]]
+        result = compute_embeddings(texts, batch_size=2, model=model)
+        self.assertEqual(result.dtype, np.float32)
+        np.testing.assert_array_equal(result[:, 0], [1, 30, 5, 20, 3])
+        self.assertEqual(len(model.batches), 1)
+        self.assertEqual(model.batches[0], ["a" * n for n in [30, 20, 5, 3, 1]])
+
+
+class TestLazyModel(unittest.TestCase):
+    def tearDown(self):
+        embedding._models.pop("fake/model", None)
+
+    def test_model_loaded_once_across_threads(self):
+        with patch("sentence_transformers.SentenceTransformer") as mock_cls:
+            threads = [
+                threading.Thread(target=embedding.get_model, args=("fake/model",))
+                for _ in range(8)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            mock_cls.assert_called_once()
+            self.assertEqual(mock_cls.call_args.args, ("fake/model",))
+            self.assertIs(embedding.get_model("fake/model"), mock_cls.return_value)
+
+    def test_prewarm_loads_in_background(self):
+        with patch("sentence_transformers.SentenceTransformer") as mock_cls:
+            embedding.prewarm("fake/model").join()
+            mock_cls.assert_called_once()
+            self.assertEqual(mock_cls.call_args.args, ("fake/model",))
+            # already loaded: nothing to do
+            self.assertIsNone(embedding.prewarm("fake/model"))
+
+
+class TestCacheName(unittest.TestCase):
+    def test_encoder_settings_select_their_own_cache(self):
+        with patch.object(embedding, "_config", {"embedding_backend": "torch"}):
+            self.assertEqual(embedding.cache_name("m"), "m")
+        onnx = {"embedding_backend": "onnx", "embedding_onnx_file": "q8.onnx"}
+        with (
+            patch.object(embedding, "_config", onnx),
+            patch.dict(embedding._models, {"m": FakeModel()}),
+            patch.dict(embedding._backends, {"m": "onnx"}),
+        ):
+            quantized = embedding.cache_name("m")
+        with patch.object(embedding, "_config", {"embedding_max_seq_length": 128}):
+            truncated = embedding.cache_name("m")
+        self.assertTrue(quantized.startswith("m@"))
+        self.assertEqual(len({"m", quantized, truncated}), 3)
+
+    def test_backend_fallback_uses_the_torch_cache(self):
+        onnx = {"embedding_backend": "onnx", "embedding_onnx_file": "q8.onnx"}
+        with (
+            patch.object(embedding, "_config", onnx),
+            patch.dict(embedding._models, {"m": FakeModel()}),
+            patch.dict(embedding._backends, {"m": "torch"}),
+        ):
+            self.assertEqual(embedding.cache_name("m"), "m")
+
+
+class TestQueryEmbedding(unittest.TestCase):
+    def test_bge_queries_get_the_instruction(self):
+        model = FakeModel()
+        with (
+            patch.object(embedding, "_config", {}),
+            patch.object(embedding, "get_model", return_value=model),
+        ):
+            embedding.compute_query_embedding("AI news")
+            self.assertEqual(embedding.query_prefix("other/model"), "")
+        with patch.object(embedding, "_config", {"embedding_query_prefix": "q: "}):
+            self.assertEqual(embedding.query_prefix(), "q: ")
+        self.assertEqual(model.batches, [[embedding.BGE_QUERY_INSTRUCTION + "AI news"]])
 
 
 if __name__ == "__main__":
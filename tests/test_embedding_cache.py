@@ -0,0 +1,87 @@
+import unittest
+import tempfile
+import shutil
+import numpy as np
+from embedding_cache import EmbeddingCache
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), float(i), 1.0] for i, t in enumerate(texts)]
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.model = FakeModel()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_only_new_texts_are_computed(self):
+        cache = EmbeddingCache(self.cache_dir, "test/model")
+        first = cache.get_or_compute(["a", "bb"], self.model)
+        self.assertEqual(first.dtype, np.float32)
+        self.assertEqual(first.shape, (2, 3))
+        second = cache.get_or_compute(["bb", "ccc", "a"], self.model)
+        self.assertEqual(self.model.calls, [["a", "bb"], ["ccc"]])
+        np.testing.assert_array_equal(second[0], first[1])
+        np.testing.assert_array_equal(second[2], first[0])
+        self.assertEqual(len(cache), 3)
+
+    def test_duplicates_computed_once(self):
+        cache = EmbeddingCache(self.cache_dir, "test/model")
+        result = cache.get_or_compute(["same", "same"], self.model)
+        self.assertEqual(self.model.calls, [["same"]])
+        np.testing.assert_array_equal(result[0], result[1])
+
+    def test_persists_across_instances(self):
+        EmbeddingCache(self.cache_dir, "test/model").get_or_compute(
+            ["x", "yy"], self.model
+        )
+        reopened = EmbeddingCache(self.cache_dir, "test/model")
+        self.assertIn("yy", reopened)
+        result = reopened.get_or_compute(["yy"], self.model)
+        self.assertEqual(len(self.model.calls), 1)
+        np.testing.assert_array_equal(result[0], [2.0, 1.0, 1.0])
+
+    def test_appends_leave_the_header_alone(self):
+        cache = EmbeddingCache(self.cache_dir, "test/model")
+        cache.get_or_compute(["x"], self.model)
+        with open(cache._index_path) as f:
+            header = f.read()
+        cache.get_or_compute(["yy", "zzz"], self.model)
+        with open(cache._index_path) as f:
+            self.assertEqual(f.read(), header)
+        self.assertEqual(len(EmbeddingCache(self.cache_dir, "test/model")), 3)
+
+    def test_interrupted_append_is_dropped(self):
+        cache = EmbeddingCache(self.cache_dir, "test/model")
+        cache.get_or_compute(["x", "yy"], self.model)
+        # a crash after writing a row and part of its key
+        with open(cache._vectors_path, "ab") as f:
+            f.write(np.zeros(3, dtype=np.float32).tobytes())
+        with open(cache._keys_path, "a") as f:
+            f.write("abc")
+        reopened = EmbeddingCache(self.cache_dir, "test/model")
+        self.assertEqual(len(reopened), 2)
+        reopened.get_or_compute(["zzz"], self.model)
+        again = EmbeddingCache(self.cache_dir, "test/model")
+        result = again.get_or_compute(["x", "yy", "zzz"], self.model)
+        self.assertEqual(len(self.model.calls), 2)
+        np.testing.assert_array_equal(result[:, 0], [1.0, 2.0, 3.0])
+
+    def test_models_do_not_share_vectors(self):
+        EmbeddingCache(self.cache_dir, "model-a").get_or_compute(["x"], self.model)
+        other = EmbeddingCache(self.cache_dir, "model-b")
+        self.assertNotIn("x", other)
+        other.get_or_compute(["x"], self.model)
+        self.assertEqual(len(self.model.calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from newsletter import Newsletter
+from filter_engine import DATE_FILTER, FilterColumns, filter_passes
+
+
+def newsletters():
+    return [
+        Newsletter(
+            title,
+            "",
+            datetime(2025, 8, 20 + i, 23, tzinfo=timezone(timedelta(hours=-5))),
+            url=f"https://example.com/{i}",
+            filters=filters,
+        )
+        for i, (title, filters) in enumerate(
+            [
+                ("AI in Health", {"AI_filter": {"match": True, "reason": "x"}}),
+                ("Markets today", {"AI_filter": {"match": False}}),
+                ("The health of AI", None),
+                ("Clinical trials", {"reviewed": True}),
+            ]
+        )
+    ]
+
+
+class TestFilterColumns(unittest.TestCase):
+    def setUp(self):
+        self.articles = newsletters()
+        self.columns = FilterColumns(self.articles)
+
+    def test_stored_results_become_columns(self):
+        self.assertEqual(self.columns.names, ["AI_filter", "reviewed"])
+        np.testing.assert_array_equal(
+            self.columns.column("AI_filter"), [True, False, False, False]
+        )
+        self.assertTrue(filter_passes(True))
+        self.assertFalse(filter_passes({"match": None}))
+
+    def test_date_range_uses_each_articles_own_date(self):
+        mask = self.columns.date_range(date(2025, 8, 21), date(2025, 8, 22))
+        np.testing.assert_array_equal(mask, [False, True, True, False])
+        self.assertIs(
+            self.columns.date_range(date(2025, 8, 21), date(2025, 8, 22)), mask
+        )
+        self.assertTrue(self.columns.date_range(None, None).all())
+        self.assertIn(DATE_FILTER, self.columns)
+
+    def test_keyword_ignores_case_and_does_not_span_titles(self):
+        np.testing.assert_array_equal(
+            self.columns.keyword("HEALTH"), [True, False, True, False]
+        )
+        self.assertFalse(self.columns.keyword("todaythe").any())
+        self.assertFalse(self.columns.keyword("").any())
+        rebuilt = FilterColumns(self.articles, keywords=self.columns.keywords)
+        self.assertEqual(
+            rebuilt.column("HEALTH").tolist(), self.columns.column("HEALTH").tolist()
+        )
+
+    def test_combine_and_select(self):
+        self.columns.keyword("ai")
+        both = self.columns.combine(["AI_filter", "ai"])
+        either = self.columns.combine(["AI_filter", "reviewed"], how="or")
+        self.assertEqual([n.title for n in self.columns.select(both)], ["AI in Health"])
+        self.assertEqual(np.count_nonzero(either), 2)
+        self.assertEqual(len(self.columns.select(self.columns.combine([]))), 4)
+        with self.assertRaises(ValueError):
+            self.columns.combine(["ai"], how="xor")
+
+    def test_filters_of_is_a_display_view(self):
+        self.columns.keyword("markets")
+        self.assertEqual(
+            self.columns.filters_of(self.articles[1]),
+            {"AI_filter": {"match": False}, "reviewed": False, "markets": True},
+        )
+        self.assertNotIn("markets", self.articles[1].filters)
+
+    def test_set_results_keeps_verdicts_per_article(self):
+        # same url, so the same newsletter_key, but separate rows
+        twin = Newsletter("AI in Health", "", self.articles[0].publication_date)
+        twin.url = self.articles[0].url
+        columns = FilterColumns(self.articles + [twin])
+        verdict = {"match": True, "confidence": 0.9, "reason": "health"}
+        mask = columns.set_results("AI_filter", [(self.articles[2], verdict)])
+        np.testing.assert_array_equal(mask, [True, False, True, False, False])
+        self.assertEqual(columns.filters_of(self.articles[2])["AI_filter"], verdict)
+        self.assertEqual(
+            columns.filters_of(self.articles[0])["AI_filter"],
+            {"match": True, "reason": "x"},
+        )
+        self.assertFalse(columns.filters_of(twin)["AI_filter"])
+        self.assertIsNone(self.articles[2].filters)
+
+    def test_set_copies_the_callers_array(self):
+        mask = np.array([True, False, True, False])
+        stored = self.columns.set("manual", mask)
+        mask[0] = False
+        self.assertTrue(stored[0])
+        self.assertTrue(mask.flags.writeable)
+
+    def test_results_carry_over_to_a_rebuilt_engine(self):
+        verdict = {"match": True, "confidence": 0.8}
+        self.columns.set_results("AI_filter", [(self.articles[2], verdict)])
+        rebuilt = FilterColumns(newsletters(), previous=self.columns)
+        np.testing.assert_array_equal(
+            rebuilt.column("AI_filter"), [True, False, True, False]
+        )
+        self.assertEqual(
+            rebuilt.filters_of(rebuilt.newsletters[2])["AI_filter"], verdict
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
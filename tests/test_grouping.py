@@ -1,5 +1,9 @@
 import unittest
-from grouping import group_by_cosine_similarity, render_similar_articles
+from grouping import (
+    group_by_cosine_similarity,
+    render_similar_articles,
+    find_similar_articles,
+)
 import numpy as np
 
 
@@ -15,6 +19,41 @@ class TestGrouping(unittest.TestCase):
         all_indices = sorted([i for group in groups.values() for i in group])
         self.assertEqual(all_indices, list(range(5)))
 
+    def test_blockwise_matches_dense_reference(self):
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(6, 8))
+        emb = centers[rng.integers(0, 6, 120)] + 0.3 * rng.normal(size=(120, 8))
+        X = emb / np.linalg.norm(emb, axis=1, keepdims=True)
+        sim = X @ X.T
+        expected, assigned = [], set()
+        for i in range(len(X)):
+            if i in assigned:
+                continue
+            group = [i] + [
+                j for j in range(i + 1, len(X)) if sim[i, j] > 0.8 and j not in assigned
+            ]
+            assigned.update(group)
+            expected.append(group)
+        for block_size in (1, 7, 1024):
+            groups = group_by_cosine_similarity(
+                emb, threshold=0.8, block_size=block_size
+            )
+            self.assertEqual(list(groups.values()), expected)
+
+    def test_connected_components_mode(self):
+        # a~b and b~c but a and c are not similar: greedy splits, components chain
+        emb = [[1.0, 0.0], [0.8, 0.6], [0.28, 0.96], [-1.0, 0.0]]
+        greedy = group_by_cosine_similarity(emb, threshold=0.7, block_size=2)
+        self.assertEqual(list(greedy.values()), [[0, 1], [2], [3]])
+        components = group_by_cosine_similarity(
+            emb, threshold=0.7, block_size=2, mode="components"
+        )
+        self.assertEqual(list(components.values()), [[0, 1, 2], [3]])
+
+    def test_empty(self):
+        self.assertEqual(group_by_cosine_similarity([]), {})
+        self.assertEqual(group_by_cosine_similarity([], mode="components"), {})
+
 
 class TestRenderSimilarArticles(unittest.TestCase):
     def setUp(self):
@@ -68,5 +107,51 @@ class TestRenderSimilarArticles(unittest.TestCase):
         self.assertNotIn("Selected Article", results)
 
 
+class TestFindSimilarArticles(unittest.TestCase):
+    def setUp(self):
+        from types import SimpleNamespace
+
+        def article(title, embedding, user_selected=False):
+            return SimpleNamespace(
+                title=title, embedding=embedding, user_selected=user_selected
+            )
+
+        self.selected = [article("Sel A", [1.0, 0.0, 0.0], True)]
+        self.selected.append(article("Sel B", [0.0, 1.0, 0.0], True))
+        self.candidates = [
+            article("Near A", [0.95, 0.05, 0.0]),
+            article("Near B", [0.0, 0.8, 0.2]),
+            article("Between", [0.7, 0.7, 0.0]),
+            article("Far", [0.0, 0.0, 1.0]),
+            article("No Embedding", None),
+        ]
+
+    def test_best_similarity_over_selected(self):
+        results = find_similar_articles(self.selected, self.candidates, threshold=0.6)
+        self.assertEqual(list(results), ["Near A", "Near B", "Between"])
+        _, sim = results["Between"]
+        self.assertAlmostEqual(sim, np.sqrt(0.5), places=5)
+
+    def test_top_k(self):
+        results = find_similar_articles(
+            self.selected, self.candidates, threshold=0.0, top_k=2
+        )
+        self.assertEqual(list(results), ["Near A", "Near B"])
+
+    def test_matches_single_article_search(self):
+        batched = find_similar_articles(
+            self.selected[:1], self.candidates, threshold=0.5, block_size=2
+        )
+        single = render_similar_articles(
+            self.selected[0], self.candidates, threshold=0.5
+        )
+        self.assertEqual(set(batched), set(single))
+        for title, (_, sim) in batched.items():
+            self.assertAlmostEqual(sim, single[title][1], places=5)
+
+    def test_nothing_selected(self):
+        self.assertEqual(find_similar_articles([], self.candidates), {})
+
+
 if __name__ == "__main__":
     unittest.main()
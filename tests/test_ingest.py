@@ -1,8 +1,26 @@
 import unittest
 import os
-from datetime import datetime
-from ingest import ingest_newsletters_from_feed, strip_html_tags, clean_title
+import shutil
+import tempfile
+import requests
+from unittest.mock import MagicMock, patch
+from datetime import datetime, timedelta, timezone
+from ingest import (
+    ingest_newsletters_from_feed,
+    strip_html_tags,
+    clean_title,
+    html_to_text,
+    parse_date,
+    FeedState,
+    ingest_new_newsletters,
+    ingest_new_newsletters_from_feeds,
+    ingest_newsletters_from_feeds,
+    FeedFetcher,
+    load_feed_state,
+    save_feed_state,
+)
 from newsletter import Newsletter
+from newsletter_store import NewsletterStore
 
 
 class TestIngestNewsletters(unittest.TestCase):
@@ -61,6 +79,186 @@ class TestIngestNewsletters(unittest.TestCase):
         self.assertEqual(clean_title("<i>STAT+:Test</i>"), "Test")
         self.assertEqual(clean_title("NoPrefix Title"), "NoPrefix Title")
         self.assertEqual(clean_title(""), "")
+        self.assertEqual(clean_title("AT&amp;T <i>deal</i>"), "AT&T deal")
+
+    def test_html_to_text(self):
+        self.assertEqual(html_to_text("  Plain text  "), "Plain text")
+        self.assertEqual(
+            html_to_text("<p>One&nbsp;&amp; two</p>\n\n<p>Three<br/>four</p>"),
+            "One & two\nThree\nfour",
+        )
+        self.assertEqual(
+            html_to_text("<style>p {}</style><script>x()</script>Body"), "Body"
+        )
+
+    def test_parse_date_fast_paths_match_dateutil(self):
+        rfc822 = parse_date("Fri, 22 Aug 2025 10:00:00 +0200")
+        self.assertEqual(
+            rfc822, datetime(2025, 8, 22, 10, tzinfo=timezone(timedelta(hours=2)))
+        )
+        self.assertEqual(
+            parse_date("2025-08-22T08:00:00Z"),
+            datetime(2025, 8, 22, 8, tzinfo=timezone.utc),
+        )
+        # neither RFC 822 nor ISO 8601, handled by the dateutil fallback
+        self.assertEqual(
+            parse_date("August 22, 2025"), datetime(2025, 8, 22, tzinfo=timezone.utc)
+        )
+        # RFC 822 "-0000" means unknown zone; still aware so dates compare
+        self.assertEqual(
+            parse_date("Fri, 22 Aug 2025 10:00:00 -0000"),
+            datetime(2025, 8, 22, 10, tzinfo=timezone.utc),
+        )
+
+
+class TestIncrementalIngest(unittest.TestCase):
+    ITEM = """<item>
+<title>{title}</title>
+<link>https://example.com/{slug}</link>
+<description>Content</description>
+<pubDate>Fri, 22 Aug 2025 10:00:00 +0000</pubDate>
+</item>
+"""
+
+    def setUp(self):
+        self.test_rss = "test_incremental_feed.xml"
+        self.state_path = "test_feed_state.json"
+        self.write_feed(["One", "Two"])
+
+    def tearDown(self):
+        for path in (self.test_rss, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def write_feed(self, titles):
+        items = "".join(self.ITEM.format(title=t, slug=t.lower()) for t in titles)
+        with open(self.test_rss, "w") as f:
+            f.write(f'<?xml version="1.0"?>\n<rss><channel>\n{items}</channel></rss>\n')
+
+    def test_only_new_entries_are_appended(self):
+        state = FeedState()
+        newsletters = []
+        first = ingest_new_newsletters(self.test_rss, newsletters, state)
+        self.assertEqual([n.title for n in first], ["One", "Two"])
+        self.assertEqual(first[0].guid, "https://example.com/one")
+        self.write_feed(["Three", "One", "Two"])
+        second = ingest_new_newsletters(self.test_rss, newsletters, state)
+        self.assertEqual([n.title for n in second], ["Three"])
+        self.assertEqual([n.title for n in newsletters], ["One", "Two", "Three"])
+
+    def test_store_guid_index_dedups_without_state(self):
+        store = NewsletterStore()
+        ingest_new_newsletters(self.test_rss, store, FeedState())
+        # a fresh feed state knows nothing, but the store already holds both entries
+        self.write_feed(["Three", "One"])
+        new = ingest_new_newsletters(self.test_rss, store, FeedState())
+        self.assertEqual([n.title for n in new], ["Three"])
+        self.assertEqual(len(store), 3)
+        self.assertIsNotNone(store.read_by_guid("https://example.com/three"))
+
+    def test_unchanged_feed_short_circuits(self):
+        state = FeedState()
+        newsletters = []
+        ingest_new_newsletters(self.test_rss, newsletters, state)
+        with patch("ingest.feedparser.parse") as mock_parse:
+            self.assertEqual(
+                ingest_new_newsletters(self.test_rss, newsletters, state), []
+            )
+            mock_parse.assert_not_called()
+        self.assertEqual(len(newsletters), 2)
+
+    def test_remote_not_modified(self):
+        state = FeedState(etag='"abc"')
+        fetcher = FeedFetcher()
+        with patch.object(fetcher._session, "get") as mock_get:
+            mock_get.return_value = MagicMock(status_code=304)
+            result = ingest_new_newsletters_from_feeds(
+                ["https://example.com/feed"],
+                [],
+                {"https://example.com/feed": state},
+                fetcher=fetcher,
+            )
+            self.assertEqual(result, [])
+            self.assertEqual(
+                mock_get.call_args.kwargs["headers"], {"If-None-Match": '"abc"'}
+            )
+
+    def test_unparsable_entry_is_not_marked_seen(self):
+        state = FeedState()
+        with patch("ingest.newsletter_from_entry", side_effect=ValueError("bad")):
+            self.assertEqual(ingest_new_newsletters(self.test_rss, [], state), [])
+        self.assertEqual(state.seen_ids, set())
+        state.modified = None  # the feed is fixed and fetched again
+        newsletters = ingest_new_newsletters(self.test_rss, [], state)
+        self.assertEqual([n.title for n in newsletters], ["One", "Two"])
+
+    def test_state_dir_persists_states_between_runs(self):
+        state_dir = tempfile.mkdtemp()
+        try:
+            first = ingest_new_newsletters_from_feeds(
+                [self.test_rss], [], {}, state_dir=state_dir
+            )
+            self.write_feed(["Three", "One", "Two"])
+            # a new process: no states in memory and nothing stored
+            second = ingest_new_newsletters_from_feeds(
+                [self.test_rss], [], {}, state_dir=state_dir
+            )
+        finally:
+            shutil.rmtree(state_dir)
+        self.assertEqual(len(first), 2)
+        self.assertEqual([n.title for n in second], ["Three"])
+
+    def test_state_round_trip(self):
+        state = FeedState(etag="e", modified="m", seen_ids={"a", "b"})
+        save_feed_state(state, self.state_path)
+        self.assertEqual(load_feed_state(self.state_path), state)
+        self.assertEqual(load_feed_state("missing_state.json"), FeedState())
+
+
+class TestMultiFeedIngest(unittest.TestCase):
+    FEED = """<?xml version="1.0"?>
+<rss><channel>
+<item><title>{0}</title><link>https://example.com/{0}</link>
+<pubDate>Fri, 22 Aug 2025 10:00:00 +0000</pubDate></item>
+<item><title>Shared</title><link>https://example.com/shared</link>
+<pubDate>Fri, 22 Aug 2025 11:00:00 +0000</pubDate></item>
+</channel></rss>
+"""
+
+    def setUp(self):
+        self.paths = ["test_feed_a.xml", "test_feed_b.xml"]
+        for path, title in zip(self.paths, ["A", "B"]):
+            with open(path, "w") as f:
+                f.write(self.FEED.format(title))
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+
+    def test_feeds_are_merged_and_deduplicated(self):
+        newsletters = ingest_newsletters_from_feeds(self.paths)
+        self.assertEqual([n.title for n in newsletters], ["A", "Shared", "B"])
+
+    def test_failed_feed_is_skipped(self):
+        newsletters = ingest_newsletters_from_feeds(self.paths + ["missing_feed.xml"])
+        self.assertEqual(len(newsletters), 3)
+
+    def test_remote_fetch_retries_then_succeeds(self):
+        fetcher = FeedFetcher(retries=2, backoff=0)
+        ok = MagicMock(status_code=200, content=self.FEED.format("R").encode())
+        ok.headers = {"ETag": '"v2"'}
+        state = FeedState()
+        with patch.object(fetcher._session, "get") as mock_get:
+            mock_get.side_effect = [requests.ConnectionError("reset"), ok]
+            result = ingest_new_newsletters_from_feeds(
+                ["https://example.com/feed"],
+                [],
+                {"https://example.com/feed": state},
+                fetcher=fetcher,
+            )
+        self.assertEqual([n.title for n in result], ["R", "Shared"])
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(state.etag, '"v2"')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,280 @@
+import unittest
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from unittest.mock import patch
+from newsletter import Newsletter
+from rate_limit import RateLimiter
+from verdict_cache import VerdictCache
+import llm_tagging
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+class TestFilterNewslettersWithAI(unittest.TestCase):
+    def setUp(self):
+        self.newsletters = [
+            Newsletter(
+                title=f"Article {i}",
+                content="AI news" if i % 2 == 0 else "Sports news",
+                publication_date=datetime(2025, 8, 22),
+                filters={"date_filter": i < 6},
+            )
+            for i in range(8)
+        ]
+
+    def fake_provider(self, full_prompt, ai_provider, api_keys, ollama_url=None):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+        return {"match": "AI news" in full_prompt, "confidence": 0.9, "reason": "r"}
+
+    def test_concurrent_filtering_assigns_results(self):
+        self.lock = threading.Lock()
+        self.in_flight = self.max_in_flight = 0
+        with patch.object(
+            llm_tagging, "_ai_newsletter_filter_once", side_effect=self.fake_provider
+        ):
+            llm_tagging.filter_newsletters_with_ai(
+                self.newsletters,
+                "about AI",
+                "Google",
+                {"gemini": "key"},
+                limiter=RateLimiter(max_concurrency=4),
+            )
+        self.assertGreater(self.max_in_flight, 1)
+        for i, n in enumerate(self.newsletters):
+            if i < 6:
+                self.assertEqual(n.filters["AI_filter"]["match"], i % 2 == 0)
+            else:
+                self.assertNotIn("AI_filter", n.filters)
+
+    def test_rate_limited_call_is_retried(self):
+        responses = [RateLimited("429"), {"match": True, "confidence": 1.0}]
+
+        def provider(*args, **kwargs):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        with (
+            patch.object(
+                llm_tagging, "_ai_newsletter_filter_once", side_effect=provider
+            ),
+            patch("rate_limit.time.sleep") as mock_sleep,
+        ):
+            result = llm_tagging.ai_newsletter_filter(
+                "Title: t", "prompt", "Google", {"gemini": "key"}
+            )
+        self.assertTrue(result["match"])
+        mock_sleep.assert_called_once()
+
+
+class TestBatchedFilter(unittest.TestCase):
+    def test_make_batches_respects_budget_and_size(self):
+        contexts = {str(i): "x" * 400 for i in range(10)}
+        batches = llm_tagging.make_batches(contexts, "p", max_batch_size=4)
+        self.assertEqual([len(b) for b in batches], [4, 4, 2])
+        overhead = llm_tagging.estimate_tokens(
+            llm_tagging.build_batch_filter_prompt({}, "p")
+        )
+        batches = llm_tagging.make_batches(contexts, "p", token_budget=overhead + 500)
+        self.assertTrue(all(len(b) == 2 for b in batches))
+        # an oversized article still gets a batch of its own
+        batches = llm_tagging.make_batches({"a": "x" * 10**5}, "p", token_budget=10)
+        self.assertEqual(batches, [{"a": "x" * 10**5}])
+
+    def test_parse_batch_response_drops_invalid_elements(self):
+        text = """```json
+        [{"id": 0, "match": true, "confidence": 0.8, "reason": "r"},
+         {"id": "1", "match": true, "confidence": 7},
+         {"id": "9", "match": false, "confidence": 0.1}]
+        ```"""
+        results = llm_tagging.parse_batch_response(text, {"0", "1"})
+        self.assertEqual(
+            results, {"0": {"match": True, "confidence": 0.8, "reason": "r"}}
+        )
+
+    def test_only_failed_articles_are_retried(self):
+        prompts = []
+        responses = [
+            '[{"id": "0", "match": true, "confidence": 0.9}, {"id": "1", "match": "?"}]',
+            '[{"id": "1", "match": false, "confidence": 0.4}]',
+        ]
+
+        def generate(full_prompt, *args, **kwargs):
+            prompts.append(full_prompt)
+            return responses.pop(0)
+
+        contexts = {"0": "Title: AI\n", "1": "Title: Sports\n"}
+        with patch.object(llm_tagging, "_generate_text", side_effect=generate):
+            results = llm_tagging.ai_newsletter_filter_batch(
+                contexts, "about AI", "Google", {"gemini": "key"}
+            )
+        self.assertTrue(results["0"]["match"])
+        self.assertFalse(results["1"]["match"])
+        self.assertIn("Article id: 0", prompts[0])
+        self.assertNotIn("Article id: 0", prompts[1])
+        self.assertIn("Article id: 1", prompts[1])
+
+    def test_unparsed_articles_get_error_result(self):
+        with patch.object(llm_tagging, "_generate_text", return_value="not json"):
+            results = llm_tagging.ai_newsletter_filter_batch(
+                {"0": "Title: t\n"}, "p", "Google", {"gemini": "key"}
+            )
+        self.assertFalse(results["0"]["match"])
+        self.assertIn("Google gemma-3-12b-it error", results["0"]["reason"])
+
+    def test_filter_newsletters_in_batches(self):
+        newsletters = [
+            Newsletter(
+                title=f"Article {i}",
+                content="AI news" if i % 2 == 0 else "Sports news",
+                publication_date=datetime(2025, 8, 22),
+                filters={"date_filter": True},
+            )
+            for i in range(7)
+        ]
+        calls = []
+
+        def generate(full_prompt, *args, **kwargs):
+            calls.append(full_prompt)
+            ids = re.findall(
+                r"Article id: (\d+) ---\nTitle: .*\nContent: (.*)\n", full_prompt
+            )
+            return json.dumps(
+                [
+                    {"id": i, "match": "AI news" in block, "confidence": 0.9}
+                    for i, block in ids
+                ]
+            )
+
+        with patch.object(llm_tagging, "_generate_text", side_effect=generate):
+            llm_tagging.filter_newsletters_with_ai(
+                newsletters,
+                "about AI",
+                "Google",
+                {"gemini": "key"},
+                limiter=RateLimiter(max_concurrency=2),
+                batch_size=3,
+            )
+        self.assertEqual(len(calls), 3)
+        for i, n in enumerate(newsletters):
+            self.assertEqual(n.filters["AI_filter"]["match"], i % 2 == 0)
+
+
+class TestVerdictCaching(unittest.TestCase):
+    def test_reapplying_filter_makes_no_api_calls(self):
+        newsletters = [
+            Newsletter(
+                title=f"Article {i}",
+                content="AI news",
+                publication_date=datetime(2025, 8, 22),
+                filters={"date_filter": True},
+            )
+            for i in range(3)
+        ]
+        cache = VerdictCache(":memory:")
+        responses = [
+            {"match": False, "confidence": 0.0, "reason": "boom", "error": True},
+            {"match": True, "confidence": 0.9, "reason": "r"},
+            {"match": True, "confidence": 0.9, "reason": "r"},
+        ]
+
+        def provider(*args, **kwargs):
+            return responses.pop(0)
+
+        def run(side_effect):
+            with patch.object(
+                llm_tagging, "_ai_newsletter_filter_once", side_effect=side_effect
+            ) as mock_call:
+                llm_tagging.filter_newsletters_with_ai(
+                    newsletters,
+                    "about AI",
+                    "Google",
+                    {"gemini": "key"},
+                    limiter=RateLimiter(max_concurrency=1),
+                    cache=cache,
+                )
+            return mock_call.call_count
+
+        # errors are not cached, so only the failed article is asked again
+        self.assertEqual(run(provider), 3)
+        self.assertEqual(len(cache), 2)
+        responses.append({"match": False, "confidence": 0.2, "reason": "r"})
+        self.assertEqual(run(provider), 1)
+        self.assertEqual(run(AssertionError("no call expected")), 0)
+        self.assertEqual(cache.hits, 2 + 3)
+
+
+class TestEmbeddingPrefilter(unittest.TestCase):
+    def embed(self, texts):
+        # prompt and AI articles point one way, sports the other
+        return [[1.0, 0.1] if "AI" in t else [0.0, 1.0] for t in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return self.embed([text])[0]
+
+    def setUp(self):
+        self.queries = []
+
+    def test_prefilter_scores_and_orders(self):
+        newsletters = [
+            Newsletter("Sports", "match report", datetime(2025, 8, 22)),
+            Newsletter("AI", "model release", datetime(2025, 8, 22)),
+            Newsletter("Mixed", "", datetime(2025, 8, 22), embedding=[1.0, 1.0]),
+        ]
+        kept, rejected = llm_tagging.prefilter_by_embedding(
+            newsletters,
+            "AI news",
+            0.5,
+            embed_fn=self.embed,
+            embed_query_fn=self.embed_query,
+        )
+        self.assertEqual([i for i, _ in kept], [1, 2])
+        self.assertAlmostEqual(kept[0][1], 1.0, places=5)
+        self.assertEqual([i for i, _ in rejected], [0])
+        self.assertEqual(self.queries, ["AI news"])
+
+    def test_rejected_articles_skip_the_llm(self):
+        newsletters = [
+            Newsletter(
+                title=f"Article {i}",
+                content="AI news" if i % 2 == 0 else "Sports news",
+                publication_date=datetime(2025, 8, 22),
+                filters={"date_filter": True},
+            )
+            for i in range(6)
+        ]
+        with patch.object(
+            llm_tagging,
+            "_ai_newsletter_filter_once",
+            return_value={"match": True, "confidence": 0.9, "reason": "r"},
+        ) as mock_call:
+            llm_tagging.filter_newsletters_with_ai(
+                newsletters,
+                "AI",
+                "Google",
+                {"gemini": "key"},
+                limiter=RateLimiter(max_concurrency=1),
+                min_similarity=0.5,
+                embed_fn=self.embed,
+                embed_query_fn=self.embed_query,
+            )
+        self.assertEqual(mock_call.call_count, 3)
+        for i, n in enumerate(newsletters):
+            self.assertEqual(n.filters["AI_filter"]["match"], i % 2 == 0)
+        self.assertIn("prefilter", newsletters[1].filters["AI_filter"]["reason"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
 import unittest
+import os
+import tempfile
 from datetime import datetime
-from newsletter import Newsletter
+import numpy as np
+from newsletter import Newsletter, assign_rows, stack_rows
 
 
 class TestNewsletter(unittest.TestCase):
@@ -20,6 +23,98 @@ class TestNewsletter(unittest.TestCase):
         )
         self.assertIsInstance(n.publication_date, datetime)
 
+    def test_no_instance_dict(self):
+        n = Newsletter(title="T", content="c", publication_date=datetime.now())
+        self.assertFalse(hasattr(n, "__dict__"))
+        with self.assertRaises(AttributeError):
+            n.unknown_field = 1
+
+    def test_long_content_is_compressed(self):
+        body = "long newsletter body " * 100
+        n = Newsletter(title="T", content=body, publication_date=datetime.now())
+        self.assertIsInstance(n._content, bytes)
+        self.assertLess(len(n._content), len(body))
+        self.assertEqual(n.content, body)
+        n.full_text = body
+        self.assertEqual(n.full_text, body)
+
+    def test_lazy_body_loader(self):
+        calls = []
+
+        def load():
+            calls.append(1)
+            return "loaded body"
+
+        n = Newsletter(title="T", content=load, publication_date=datetime.now())
+        self.assertEqual(calls, [])
+        self.assertEqual(n.content, "loaded body")
+        self.assertEqual(len(calls), 1)
+
+    def test_domain_is_interned(self):
+        a = Newsletter("A", "", datetime.now(), domain="".join(["te", "ch"]))
+        b = Newsletter("B", "", datetime.now(), domain="".join(["t", "ech"]))
+        self.assertIs(a.domain, b.domain)
+
+    def test_equality(self):
+        date = datetime(2025, 8, 22)
+        a = Newsletter("A", "c", date, embedding=np.ones(3, dtype=np.float32))
+        b = Newsletter("A", "c", date, embedding=np.ones(3, dtype=np.float32))
+        self.assertEqual(a, b)
+        b.embedding = np.zeros(3, dtype=np.float32)
+        self.assertNotEqual(a, b)
+
+
+class TestEmbeddingRows(unittest.TestCase):
+    def setUp(self):
+        self.newsletters = [
+            Newsletter(
+                title=f"n{i}", content="", publication_date=datetime(2025, 8, 22)
+            )
+            for i in range(4)
+        ]
+        self.matrix = np.arange(12, dtype=np.float64).reshape(4, 3)
+
+    def test_rows_are_views_of_one_block(self):
+        block = assign_rows(self.newsletters, "embedding", self.matrix)
+        self.assertEqual(block.dtype, np.float32)
+        self.assertTrue(np.shares_memory(self.newsletters[2].embedding, block))
+        np.testing.assert_array_equal(self.newsletters[2].embedding, [6, 7, 8])
+        # whole collection and consecutive slices come back without a copy
+        self.assertTrue(
+            np.shares_memory(stack_rows(self.newsletters, "embedding"), block)
+        )
+        sub = stack_rows(self.newsletters[1:3], "embedding")
+        self.assertTrue(np.shares_memory(sub, block))
+        np.testing.assert_array_equal(sub, self.matrix[1:3])
+
+    def test_non_consecutive_rows_are_stacked(self):
+        block = assign_rows(self.newsletters, "embedding", self.matrix)
+        picked = [self.newsletters[3], self.newsletters[0]]
+        stacked = stack_rows(picked, "embedding")
+        self.assertFalse(np.shares_memory(stacked, block))
+        np.testing.assert_array_equal(stacked, self.matrix[[3, 0]])
+        self.newsletters[1].embedding = [0.0, 0.0, 1.0]
+        np.testing.assert_array_equal(
+            stack_rows(self.newsletters[:2], "embedding"), [[0, 1, 2], [0, 0, 1]]
+        )
+
+    def test_memory_mapped_block(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "embeddings.npy")
+            block = assign_rows(self.newsletters, "embedding", self.matrix, path)
+            self.assertIsInstance(block, np.memmap)
+            self.assertTrue(
+                np.shares_memory(stack_rows(self.newsletters, "embedding"), block)
+            )
+            np.testing.assert_array_equal(self.newsletters[3].embedding, [9, 10, 11])
+            del block
+            for n in self.newsletters:
+                n.embedding = None
+
+    def test_row_count_must_match(self):
+        with self.assertRaises(ValueError):
+            assign_rows(self.newsletters, "tsne", np.zeros((3, 2)))
+
 
 if __name__ == "__main__":
     unittest.main()
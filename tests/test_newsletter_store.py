@@ -1,7 +1,15 @@
+import copy
+import os
+import tempfile
 import unittest
-from datetime import datetime
-from newsletter import Newsletter
-from newsletter_store import NewsletterStore
+from datetime import date, datetime, timezone
+from unittest.mock import patch
+
+import numpy as np
+
+from newsletter import Newsletter, stack_rows
+from newsletter_store import NewsletterStore, SQLiteNewsletterStore
+from vector_index import ExactIndex
 
 
 class TestNewsletterStore(unittest.TestCase):
@@ -45,5 +53,260 @@ class TestNewsletterStore(unittest.TestCase):
         self.assertEqual(newsletters[0].title, "Weekly Update")
 
 
+class TestNewsletterStoreIndexes(unittest.TestCase):
+    def setUp(self):
+        self.store = NewsletterStore()
+        self.items = [
+            Newsletter(
+                title=f"n{i}",
+                content="",
+                publication_date=datetime(2025, 8, 20 + i % 5, 9 + i),
+                url=f"https://example.com/{i}",
+                domain="tech" if i % 2 == 0 else "health",
+                guid=f"guid-{i}",
+            )
+            for i in range(10)
+        ]
+        self.store.extend(self.items)
+
+    def test_hash_lookups(self):
+        self.assertIs(self.store.read_by_url("https://example.com/3"), self.items[3])
+        self.assertIs(self.store.read_by_guid("guid-7"), self.items[7])
+        self.assertIsNone(self.store.read_by_guid("missing"))
+
+    def test_duplicate_titles_return_oldest(self):
+        dup = Newsletter(
+            title="n2", content="dup", publication_date=datetime(2025, 1, 1)
+        )
+        self.store.create(dup)
+        self.assertIs(self.store.read("n2"), self.items[2])
+        self.store.delete("n2")
+        self.assertIs(self.store.read("n2"), dup)
+
+    def test_range_queries(self):
+        # dates are 20..24 Aug, item i on day 20 + i % 5
+        in_range = self.store.in_range(date(2025, 8, 21), date(2025, 8, 22))
+        self.assertEqual([n.title for n in in_range], ["n1", "n6", "n2", "n7"])
+        tech = self.store.in_range(date(2025, 8, 21), date(2025, 8, 22), domain="tech")
+        self.assertEqual([n.title for n in tech], ["n6", "n2"])
+        self.assertEqual(len(self.store.in_range()), 10)
+        self.assertEqual(self.store.domain_counts(), {"tech": 5, "health": 5})
+
+    def test_timezone_aware_dates_sort_with_naive(self):
+        aware = Newsletter(
+            title="aware",
+            content="",
+            publication_date=datetime(2025, 8, 21, 23, 30, tzinfo=timezone.utc),
+        )
+        self.store.create(aware)
+        titles = [
+            n.title for n in self.store.in_range(date(2025, 8, 21), date(2025, 8, 21))
+        ]
+        self.assertEqual(titles, ["n1", "n6", "aware"])
+
+    def test_update_and_delete_keep_indexes_consistent(self):
+        moved = Newsletter(
+            title="n4",
+            content="moved",
+            publication_date=datetime(2025, 9, 1),
+            domain="science",
+            guid="guid-4b",
+        )
+        self.assertTrue(self.store.update("n4", moved))
+        self.assertIsNone(self.store.read_by_guid("guid-4"))
+        self.assertIs(self.store.read_by_guid("guid-4b"), moved)
+        self.assertEqual(self.store.in_range(date(2025, 9, 1)), [moved])
+        self.assertEqual(self.store.list_all()[4], moved)
+        self.assertTrue(self.store.delete("n4"))
+        self.assertNotIn("science", self.store.domain_counts())
+        self.assertEqual(len(self.store.in_range()), 9)
+        self.assertIsNone(self.store.read_by_url("https://example.com/4"))
+
+    def test_upsert_many_replaces_by_key(self):
+        self.store.upsert_many(self.items[:2])
+        self.assertEqual(len(self.store), 10)
+        replacement = Newsletter(
+            title="n3 v2",
+            content="",
+            publication_date=datetime(2025, 8, 23),
+            guid="guid-3",
+        )
+        self.store.upsert_many([replacement, self.items[0]])
+        self.assertEqual(len(self.store), 10)
+        self.assertIs(self.store.list_all()[3], replacement)
+        self.assertIsNone(self.store.read("n3"))
+
+    def test_upsert_many_keeps_other_filters(self):
+        self.store.upsert_many([self.items[3]])
+        judged = Newsletter("n3", "", datetime(2025, 8, 23), guid="guid-3")
+        judged.filters = {"AI_filter": True}
+        self.store.upsert_many([judged])
+        embedded = Newsletter("n3", "", datetime(2025, 8, 23), guid="guid-3")
+        self.store.upsert_many([embedded])
+        self.assertEqual(self.store.read_by_guid("guid-3").filters, {"AI_filter": True})
+        self.assertIsNone(embedded.filters)
+
+    def test_set_full_texts_replaces_stored_copies(self):
+        original = self.store.read_by_guid("guid-2")
+        self.store.set_full_texts({"guid-2": "full", "missing": "x"})
+        self.assertEqual(self.store.read_by_guid("guid-2").full_text, "full")
+        self.assertIsNone(original.full_text)
+        self.assertEqual(len(self.store.in_range(domain="tech")), 5)
+
+
+class TestSQLiteNewsletterStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "db", "newsletters.sqlite")
+        self.store = SQLiteNewsletterStore(self.path)
+        self.items = [
+            Newsletter(
+                title=f"n{i}",
+                content=f"content {i}",
+                publication_date=datetime(2025, 8, 20 + i % 5, 9 + i),
+                url=f"https://example.com/{i}",
+                embedding=np.full(4, i, dtype=np.float32),
+                tsne=np.array([i, -i], dtype=np.float32),
+                filters={"date_filter": i % 2 == 0},
+                domain="tech" if i % 2 == 0 else "health",
+                guid=f"guid-{i}",
+            )
+            for i in range(10)
+        ]
+        self.store.upsert_many(self.items)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_round_trip_after_reopen(self):
+        aware = Newsletter(
+            title="aware",
+            content="x" * 2000,
+            publication_date=datetime(2025, 8, 21, 23, 30, tzinfo=timezone.utc),
+            embedding=np.ones(4, dtype=np.float32),
+            tsne=np.zeros(2, dtype=np.float32),
+            filters={"AI_filter": {"match": True, "reason": "r"}},
+            full_text="full",
+            user_selected=True,
+        )
+        self.store.create(aware)
+        self.store.close()
+        self.store = SQLiteNewsletterStore(self.path)
+        loaded = self.store.list_all()
+        self.assertEqual(loaded[:10], self.items)
+        self.assertEqual(loaded[10], aware)
+        # vectors come back as views into one float32 block
+        block = stack_rows(loaded, "embedding")
+        self.assertTrue(np.shares_memory(block, loaded[0].embedding))
+        self.assertEqual(block.dtype, np.float32)
+
+    def test_upsert_replaces_rows_and_merges_filters(self):
+        replacement = Newsletter(
+            title="n3 v2",
+            content="new",
+            publication_date=datetime(2025, 8, 23),
+            filters={"AI_filter": {"match": False}},
+            guid="guid-3",
+        )
+        self.store.upsert_many([replacement])
+        self.assertEqual(len(self.store), 10)
+        loaded = self.store.list_all()
+        self.assertEqual(loaded[3].content, "new")
+        self.assertIsNone(loaded[3].embedding)
+        self.assertEqual(
+            loaded[3].filters,
+            {"date_filter": False, "AI_filter": {"match": False}},
+        )
+        self.assertIsNone(self.store.read("n3"))
+        self.store.upsert_many(
+            [Newsletter("n3 v3", "", datetime(2025, 8, 23), guid="guid-3")]
+        )
+        self.assertEqual(self.store.read("n3 v3").filters, loaded[3].filters)
+
+    def test_lookups_and_range_queries(self):
+        self.assertEqual(self.store.read_by_url("https://example.com/3"), self.items[3])
+        self.assertEqual(self.store.read_by_guid("guid-7"), self.items[7])
+        self.assertIsNone(self.store.read_by_guid("missing"))
+        in_range = self.store.in_range(date(2025, 8, 21), date(2025, 8, 22))
+        self.assertEqual([n.title for n in in_range], ["n1", "n6", "n2", "n7"])
+        tech = self.store.in_range(date(2025, 8, 21), date(2025, 8, 22), domain="tech")
+        self.assertEqual([n.title for n in tech], ["n6", "n2"])
+        self.assertEqual(self.store.domain_counts(), {"tech": 5, "health": 5})
+
+    def test_update_and_delete(self):
+        moved = Newsletter(
+            title="n4",
+            content="moved",
+            publication_date=datetime(2025, 9, 1),
+            domain="science",
+            guid="guid-4b",
+        )
+        self.assertTrue(self.store.update("n4", moved))
+        self.assertIsNone(self.store.read_by_guid("guid-4"))
+        self.assertEqual(self.store.list_all()[4], moved)
+        self.assertEqual(self.store.in_range(date(2025, 9, 1)), [moved])
+        self.assertTrue(self.store.delete("n4"))
+        self.assertFalse(self.store.delete("n4"))
+        self.assertNotIn("science", self.store.domain_counts())
+        self.assertEqual(len(self.store), 9)
+
+    def test_bodies_are_loaded_on_access(self):
+        loaded = self.store.read_by_guid("guid-2")
+        self.assertTrue(callable(loaded._content))
+        self.assertIsNone(loaded.full_text)
+        self.store.set_full_texts({"guid-2": "fetched later"})
+        self.assertEqual(loaded.full_text, "fetched later")
+        self.assertEqual(loaded.content, "content 2")
+
+    def test_set_full_texts_keeps_other_fields(self):
+        self.store.set_full_texts({"guid-2": "full", "missing": "x"})
+        loaded = self.store.read_by_guid("guid-2")
+        self.assertEqual(loaded.full_text, "full")
+        self.assertEqual(loaded.filters, self.items[2].filters)
+        np.testing.assert_array_equal(loaded.embedding, self.items[2].embedding)
+        self.assertEqual(len(self.store), 10)
+
+    def test_vector_index_follows_the_store(self):
+        index = ExactIndex()
+        self.store.close()
+        self.store = SQLiteNewsletterStore(":memory:", index=index)
+        self.store.upsert_many(self.items[1:4])
+        self.assertEqual(sorted(index.keys()), ["guid-1", "guid-2", "guid-3"])
+        moved = Newsletter("n2", "moved", datetime(2025, 9, 1), guid="guid-2b")
+        self.assertTrue(self.store.update("n2", moved))
+        self.assertTrue(self.store.delete("n3"))
+        self.assertEqual(index.keys(), ["guid-1"])
+
+    def test_stale_vector_index_is_rebuilt_on_opening(self):
+        index = ExactIndex()
+        index.add(["guid-1", "gone"], np.ones((2, 4), dtype=np.float32))
+        self.store.close()
+        self.store = SQLiteNewsletterStore(self.path, index=index)
+        self.assertEqual(sorted(index.keys()), [f"guid-{i}" for i in range(10)])
+        np.testing.assert_allclose(index.get("guid-3"), np.full(4, 0.5))
+
+    def test_new_embedding_dimension_rebuilds_the_index(self):
+        index = ExactIndex()
+        self.store.close()
+        self.store = SQLiteNewsletterStore(self.path, index=index)
+        self.assertEqual(index.dim, 4)
+        wider = [copy.copy(n) for n in self.items[:3]]
+        for n in wider:
+            n.embedding = np.ones(8, dtype=np.float32)
+        self.store.upsert_many(wider)
+        self.assertEqual(index.dim, 8)
+        self.assertEqual(sorted(index.keys()), ["guid-0", "guid-1", "guid-2"])
+
+    def test_index_gets_one_batched_add(self):
+        index = ExactIndex()
+        self.store.close()
+        self.store = SQLiteNewsletterStore(":memory:", index=index)
+        with patch.object(index, "add", wraps=index.add) as add:
+            self.store.upsert_many(self.items)
+        add.assert_called_once()
+        self.assertEqual(len(index), 10)
+
+
 if __name__ == "__main__":
     unittest.main()
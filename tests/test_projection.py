@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from projection import Projection
+
+
+def blobs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(3, 16)) * 10
+    labels = np.arange(n) % 3
+    return centers[labels] + rng.normal(size=(n, 16)), labels
+
+
+class TestProjection(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.X, self.labels = blobs(63)
+        self.keys = [f"k{i}" for i in range(63)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_new_keys_are_placed_without_moving_the_map(self):
+        projection = Projection(perplexity=5)
+        before = projection.project(self.keys[:60], self.X[:60]).copy()
+        with patch("projection.fit_projection") as mock_fit:
+            after = projection.project(self.keys, self.X)
+        mock_fit.assert_not_called()
+        np.testing.assert_array_equal(after[:60], before)
+        self.assertEqual(projection.placed, 3)
+        # each new point lands next to points of its own cluster
+        for i in range(60, 63):
+            nearest = np.argmin(((before - after[i]) ** 2).sum(axis=1))
+            self.assertEqual(self.labels[nearest], self.labels[i])
+
+    def test_refits_once_too_many_points_were_placed(self):
+        projection = Projection(perplexity=5, refit_fraction=0.1)
+        projection.project(self.keys[:40], self.X[:40])
+        with patch("projection.tsne_transform") as mock_place:
+            projection.project(self.keys, self.X)
+        mock_place.assert_not_called()
+        self.assertEqual((len(projection), projection.placed), (63, 0))
+
+    def test_changed_embedding_is_placed_again(self):
+        projection = Projection(perplexity=5)
+        before = projection.project(self.keys, self.X).copy()
+        X = self.X.copy()
+        X[0] = self.X[1]  # k0 now reads like an article of k1's cluster
+        with patch("projection.fit_projection") as mock_fit:
+            after = projection.project(self.keys, X)
+        mock_fit.assert_not_called()
+        self.assertEqual(projection.placed, 1)
+        np.testing.assert_array_equal(after[1:], before[1:])
+        nearest = 1 + np.argmin(((before[1:] - after[0]) ** 2).sum(axis=1))
+        self.assertEqual(self.labels[nearest], self.labels[1])
+
+    def test_dimension_change_refits_known_keys(self):
+        projection = Projection(perplexity=5)
+        projection.project(self.keys, self.X)
+        with patch("projection.fit_projection") as mock_fit:
+            mock_fit.return_value = (np.zeros((63, 2)), "tsne", None)
+            coords = projection.project(self.keys, self.X[:, :8])
+        mock_fit.assert_called_once()
+        np.testing.assert_array_equal(coords, np.zeros((63, 2)))
+
+    def test_pca_layouts_place_new_keys_with_the_fitted_model(self):
+        projection = Projection(method="pca")
+        projection.project(self.keys[:60], self.X[:60])
+        self.assertEqual(projection.fitted_method, "pca")
+        with patch("projection.tsne_transform") as mock_place:
+            coords = projection.project(self.keys, self.X)
+        mock_place.assert_not_called()
+        self.assertEqual(projection.placed, 3)
+        np.testing.assert_allclose(
+            coords[60:], projection._model.transform(self.X[60:]), rtol=1e-5
+        )
+        # a reloaded PCA layout has no model, so new keys mean a refit
+        path = os.path.join(self.tmp_dir, "pca")
+        projection.save(path)
+        loaded = Projection(method="pca")
+        loaded.load(path)
+        self.assertEqual(loaded.fitted_method, "pca")
+        X = np.vstack([self.X, self.X[:1] + 1])
+        loaded.project(self.keys + ["new"], X)
+        self.assertEqual((loaded.placed, len(loaded)), (0, 64))
+
+    def test_save_and_load_round_trip(self):
+        path = os.path.join(self.tmp_dir, "layout")
+        projection = Projection(perplexity=5)
+        coords = projection.project(self.keys, self.X)
+        projection.save(path)
+        loaded = Projection(perplexity=5)
+        self.assertTrue(loaded.load(path))
+        self.assertFalse(Projection().load(os.path.join(self.tmp_dir, "missing")))
+        with patch("projection.fit_projection") as mock_fit:
+            np.testing.assert_array_equal(
+                loaded.project(self.keys[::-1], self.X[::-1]), coords[::-1]
+            )
+        mock_fit.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+from rate_limit import (
+    TokenBucket,
+    RateLimiter,
+    call_with_backoff,
+    is_rate_limit_error,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_paced(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, clock=clock, sleep=clock.sleep)
+        for _ in range(60):
+            self.assertEqual(bucket.acquire(), 0.0)
+        # bucket is empty: the next token arrives after one second
+        self.assertAlmostEqual(bucket.acquire(), 1.0)
+        self.assertAlmostEqual(clock.now, 1.0)
+
+    def test_oversized_request_is_capped(self):
+        clock = FakeClock()
+        bucket = TokenBucket(100, clock=clock, sleep=clock.sleep)
+        bucket.acquire(100)
+        self.assertAlmostEqual(bucket.acquire(500), 60.0)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_limit_dominates(self):
+        clock = FakeClock()
+        limiter = RateLimiter(
+            requests_per_minute=60,
+            tokens_per_minute=1000,
+            clock=clock,
+            sleep=clock.sleep,
+        )
+        for _ in range(3):
+            limiter.acquire(tokens=500)
+        # 1500 tokens at 1000/min with a 1000 burst: waits 30s
+        self.assertAlmostEqual(clock.now, 30.0)
+        self.assertAlmostEqual(limiter.seconds_for(10, 500), 300.0)
+
+    def test_unlimited(self):
+        limiter = RateLimiter()
+        limiter.acquire(tokens=10**9)
+        self.assertEqual(limiter.seconds_for(100, 100), 0.0)
+
+
+class TestBackoff(unittest.TestCase):
+    def test_retries_rate_limit_errors(self):
+        calls = []
+        sleeps = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise RateLimited("quota")
+            return "ok"
+
+        result = call_with_backoff(flaky, base_delay=1.0, sleep=sleeps.append)
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(sleeps), 2)
+        self.assertTrue(0.5 <= sleeps[0] <= 1.0 and 1.0 <= sleeps[1] <= 2.0)
+
+    def test_other_errors_are_not_retried(self):
+        def broken():
+            raise ValueError("bad json")
+
+        with self.assertRaises(ValueError):
+            call_with_backoff(broken, sleep=lambda s: self.fail("slept"))
+
+    def test_gives_up_after_max_retries(self):
+        def always_limited():
+            raise RateLimited("quota")
+
+        with self.assertRaises(RateLimited):
+            call_with_backoff(always_limited, max_retries=2, sleep=lambda s: None)
+
+    def test_is_rate_limit_error(self):
+        self.assertTrue(is_rate_limit_error(RateLimited()))
+        self.assertTrue(is_rate_limit_error(Exception("429 RESOURCE_EXHAUSTED")))
+        self.assertFalse(is_rate_limit_error(Exception("500 internal")))
+        self.assertTrue(
+            is_rate_limit_error(Exception("429 Client Error: Too Many Requests"))
+        )
+        # a 429 that is not a status must not trigger a paid retry
+        self.assertFalse(
+            is_rate_limit_error(
+                ValueError("Expecting value: line 1 column 430 (char 429)")
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
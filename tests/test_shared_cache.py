@@ -0,0 +1,114 @@
+import unittest
+import tempfile
+import shutil
+import threading
+from datetime import datetime
+import numpy as np
+from newsletter import Newsletter
+from shared_cache import ComputationCache, cache_key, overlay_newsletters
+
+
+class TestCacheKey(unittest.TestCase):
+    def test_key_depends_on_values_and_order(self):
+        self.assertEqual(cache_key("a", [1, 2]), cache_key("a", [1, 2]))
+        self.assertNotEqual(cache_key("a", [1, 2]), cache_key("a", [2, 1]))
+        self.assertNotEqual(cache_key("ab", "c"), cache_key("a", "bc"))
+        vectors = np.ones((2, 3), dtype=np.float32)
+        self.assertNotEqual(cache_key(vectors), cache_key(vectors.reshape(3, 2)))
+
+
+class TestComputationCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_result_is_computed_once(self):
+        cache = ComputationCache()
+        calls = []
+        for _ in range(3):
+            value = cache.get_or_compute("k", lambda x: calls.append(x) or x * 2, 21)
+        self.assertEqual((value, calls), (42, [21]))
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_concurrent_requests_share_one_run(self):
+        cache = ComputationCache()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return "done"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_compute("k", slow))
+            )
+            for _ in range(2)
+        ]
+        for t in threads:
+            t.start()
+        while not calls:
+            threading.Event().wait(0.01)
+        release.set()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(results, ["done", "done"])
+        self.assertEqual(calls, [1])
+
+    def test_failures_are_not_cached(self):
+        cache = ComputationCache()
+
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            cache.get_or_compute("k", fail)
+        self.assertEqual(cache.get_or_compute("k", lambda: 1), 1)
+
+    def test_least_recently_used_entries_are_dropped(self):
+        cache = ComputationCache(max_entries=2)
+        for key in ("a", "b"):
+            cache.get_or_compute(key, lambda: key)
+        cache.get_or_compute("a", lambda: None)
+        cache.get_or_compute("c", lambda: "c")
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+
+    def test_results_persist_on_disk(self):
+        ComputationCache(self.cache_dir).get_or_compute("k", lambda: [("x", 0.5)])
+        reopened = ComputationCache(self.cache_dir)
+        self.assertEqual(reopened.get_or_compute("k", lambda: None), [("x", 0.5)])
+
+
+class TestOverlayNewsletters(unittest.TestCase):
+    def test_sessions_keep_their_own_selection_and_filters(self):
+        date = datetime(2025, 8, 22)
+        shared = [
+            Newsletter("A", "a", date, url="https://a", filters={"f": True}),
+            Newsletter("B", "b", date, url="https://b"),
+        ]
+        first = overlay_newsletters(shared)
+        second = overlay_newsletters(shared)
+        first[0].user_selected = True
+        first[0].filters["kw"] = {"match": True}
+        self.assertFalse(second[0].user_selected)
+        self.assertEqual(second[0].filters, {"f": True})
+        self.assertEqual(shared[0].filters, {"f": True})
+        # the shared list grew and got embeddings; the session keeps its state
+        shared[0].embedding = np.ones(3, dtype=np.float32)
+        shared.append(Newsletter("C", "c", date, url="https://c"))
+        shared[1].user_selected = True
+        rebuilt = overlay_newsletters(shared, first)
+        self.assertEqual([n.title for n in rebuilt], ["A", "B", "C"])
+        self.assertFalse(overlay_newsletters(shared)[1].user_selected)
+        self.assertTrue(rebuilt[0].user_selected)
+        self.assertIn("kw", rebuilt[0].filters)
+        self.assertIsNotNone(rebuilt[0].embedding)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -57,5 +57,65 @@ class TestSubscriptionStore(unittest.TestCase):
         self.assertEqual(subs[0].newsletter.title, "Weekly Update")
 
 
+class TestSubscriptionStoreIndexes(unittest.TestCase):
+    def setUp(self):
+        self.store = SubscriptionStore()
+        self.users = [
+            User(email=f"u{i}@example.com", password_hash="h") for i in range(3)
+        ]
+        self.newsletters = [
+            Newsletter(title=t, content="", publication_date=datetime(2025, 8, 22))
+            for t in ("A", "B")
+        ]
+        self.store.create_many(
+            Subscription(user=u, newsletter=n, subscribed_at=datetime(2025, 8, 22))
+            for u in self.users
+            for n in self.newsletters
+        )
+
+    def test_reverse_lookups(self):
+        self.assertEqual(len(self.store), 6)
+        subs = self.store.for_user("u1@example.com")
+        self.assertEqual([s.newsletter.title for s in subs], ["A", "B"])
+        self.assertEqual(self.store.subscribers("B"), self.users)
+        self.assertEqual(self.store.for_user("nobody"), [])
+        self.assertEqual(self.store.subscribers("C"), [])
+
+    def test_bulk_delete_updates_reverse_indexes(self):
+        removed = self.store.delete_many(
+            [("u0@example.com", "A"), ("u2@example.com", "A"), ("u0@example.com", "C")]
+        )
+        self.assertEqual(removed, 2)
+        self.assertEqual(self.store.subscribers("A"), [self.users[1]])
+        self.assertEqual(self.store.delete_for_user("u1@example.com"), 2)
+        self.assertEqual(self.store.subscribers("A"), [])
+        self.assertEqual(len(self.store), 2)
+
+    def test_update_moves_subscription(self):
+        moved = Subscription(
+            user=self.users[0],
+            newsletter=Newsletter(
+                title="C", content="", publication_date=datetime(2025, 8, 22)
+            ),
+            subscribed_at=datetime(2025, 8, 23),
+        )
+        self.assertTrue(self.store.update("u0@example.com", "A", moved))
+        self.assertIsNone(self.store.read("u0@example.com", "A"))
+        self.assertEqual(self.store.subscribers("C"), [self.users[0]])
+        titles = [s.newsletter.title for s in self.store.for_user("u0@example.com")]
+        self.assertEqual(titles, ["B", "C"])
+
+    def test_update_onto_an_existing_pair_moves_it_to_the_end(self):
+        moved = Subscription(
+            user=self.users[0],
+            newsletter=self.newsletters[1],
+            subscribed_at=datetime(2025, 8, 24),
+        )
+        self.assertTrue(self.store.update("u0@example.com", "A", moved))
+        self.assertEqual(len(self.store), 5)
+        self.assertIs(self.store.list_all()[-1], moved)
+        self.assertEqual(self.store.subscribers("B")[-1], self.users[0])
+
+
 if __name__ == "__main__":
     unittest.main()
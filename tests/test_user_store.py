@@ -44,6 +44,28 @@ class TestUserStore(unittest.TestCase):
         self.assertEqual(len(users), 1)
         self.assertEqual(users[0].email, "test@example.com")
 
+    def test_bulk_create_and_delete(self):
+        users = [User(email=f"u{i}@example.com", password_hash="h") for i in range(5)]
+        self.store.create_many(users)
+        # emails are unique, so re-creating replaces in place
+        self.store.create(User(email="u1@example.com", password_hash="h2"))
+        self.assertEqual(len(self.store), 5)
+        self.assertEqual(self.store.list_all()[1].password_hash, "h2")
+        removed = self.store.delete_many(["u0@example.com", "u3@example.com", "nobody"])
+        self.assertEqual(removed, 2)
+        self.assertEqual(
+            [u.email for u in self.store.list_all()],
+            ["u1@example.com", "u2@example.com", "u4@example.com"],
+        )
+
+    def test_update_changes_email(self):
+        self.store.create(self.user)
+        renamed = User(email="new@example.com", password_hash="h")
+        self.assertTrue(self.store.update("test@example.com", renamed))
+        self.assertIsNone(self.store.read("test@example.com"))
+        self.assertIs(self.store.read("new@example.com"), renamed)
+        self.assertFalse(self.store.update("missing@example.com", renamed))
+
 
 if __name__ == "__main__":
     unittest.main()
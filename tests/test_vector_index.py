@@ -0,0 +1,140 @@
+import unittest
+import os
+import shutil
+import tempfile
+from datetime import datetime
+import numpy as np
+from newsletter import Newsletter
+from newsletter_store import NewsletterStore
+from grouping import group_by_cosine_similarity, group_with_index
+from vector_index import (
+    ExactIndex,
+    IVFIndex,
+    hnswlib_available,
+    load_vector_index,
+    make_vector_index,
+)
+
+
+def clustered_vectors(n, dim=16, n_clusters=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    labels = rng.integers(0, n_clusters, size=n)
+    return (centers[labels] + 0.1 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+class IndexContract:
+    """Behaviour every backend must share; mixed into one TestCase per backend."""
+
+    def make_index(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.index = self.make_index()
+        self.index.add(
+            ["x", "y", "xy"], [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [1.0, 1.0, 0.0]]
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_search(self):
+        hits = self.index.search([1.0, 0.1, 0.0], k=2)
+        self.assertEqual([key for key, _ in hits], ["x", "xy"])
+        self.assertAlmostEqual(hits[0][1], 1.0 / np.sqrt(1.01), places=5)
+
+    def test_radius_search(self):
+        hits = self.index.radius_search([1.0, 0.0, 0.0], threshold=0.5)
+        self.assertEqual([key for key, _ in hits], ["x", "xy"])
+
+    def test_update_and_remove(self):
+        self.index.add(["x"], [[0.0, 0.0, 1.0]])
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.search([0.0, 0.0, 1.0], k=1)[0][0], "x")
+        self.assertEqual(self.index.remove(["x", "missing"]), 1)
+        self.assertNotIn("x", self.index)
+        self.assertNotIn("x", [k for k, _ in self.index.search([0.0, 0.0, 1.0], 3)])
+        self.index.add(["z"], [[0.0, 0.0, 1.0]])
+        self.assertEqual(self.index.search([0.0, 0.0, 1.0], k=1)[0][0], "z")
+
+    def test_clear_allows_a_new_dimension(self):
+        self.index.clear()
+        self.assertEqual(len(self.index), 0)
+        self.index.add(["w"], [[0.0, 1.0, 0.0, 0.0, 0.0]])
+        self.assertEqual(self.index.search([0.0, 1.0, 0.0, 0.0, 0.0], k=1)[0][0], "w")
+
+    def test_save_and_load(self):
+        self.index.remove(["y"])
+        path = os.path.join(self.tmp_dir, "index")
+        self.index.save(path)
+        loaded = load_vector_index(path)
+        self.assertEqual(type(loaded), type(self.index))
+        self.assertEqual(sorted(loaded.keys()), ["x", "xy"])
+        self.assertEqual(loaded.search([1.0, 0.0, 0.0], k=1)[0][0], "x")
+        self.assertIsNone(load_vector_index(os.path.join(self.tmp_dir, "missing")))
+
+
+class TestExactIndex(IndexContract, unittest.TestCase):
+    def make_index(self):
+        return ExactIndex()
+
+
+class TestIVFIndex(IndexContract, unittest.TestCase):
+    def make_index(self):
+        return IVFIndex(min_train_size=2, nlist=2, nprobe=2)
+
+    def test_recall_against_exact(self):
+        X = clustered_vectors(3000)
+        keys = [str(i) for i in range(len(X))]
+        exact, ivf = ExactIndex(), IVFIndex(nprobe=8)
+        exact.add(keys, X)
+        ivf.add(keys, X)
+        self.assertTrue(ivf.trained)
+        found = 0
+        for q in X[:50]:
+            truth = {k for k, _ in exact.search(q, k=10)}
+            found += len(truth & {k for k, _ in ivf.search(q, k=10)})
+        self.assertGreater(found / 500, 0.9)
+
+
+@unittest.skipUnless(hnswlib_available(), "hnswlib not installed")
+class TestHnswlibIndex(IndexContract, unittest.TestCase):
+    def make_index(self):
+        return make_vector_index("hnswlib")
+
+
+class TestIndexIntegration(unittest.TestCase):
+    def newsletter(self, title, embedding):
+        return Newsletter(
+            title=title,
+            content="",
+            publication_date=datetime(2025, 8, 22),
+            url=f"https://example.com/{title}",
+            embedding=embedding,
+        )
+
+    def test_store_keeps_index_in_sync(self):
+        index = ExactIndex()
+        store = NewsletterStore(index=index)
+        store.create(self.newsletter("a", [1.0, 0.0]))
+        store.create(self.newsletter("b", [0.0, 1.0]))
+        self.assertEqual(len(index), 2)
+        store.update("a", self.newsletter("a", [0.0, 1.0]))
+        self.assertEqual(len(index.radius_search([0.0, 1.0], 0.99)), 2)
+        store.delete("b")
+        self.assertEqual(index.keys(), ["https://example.com/a"])
+
+    def test_group_with_index_matches_dense_grouping(self):
+        X = clustered_vectors(200, n_clusters=5)
+        keys = [str(i) for i in range(len(X))]
+        index = ExactIndex()
+        index.add(keys, X)
+        self.assertEqual(
+            group_with_index(keys, index, threshold=0.9),
+            group_by_cosine_similarity(X, threshold=0.9),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import tempfile
+import shutil
+import os
+from verdict_cache import VerdictCache, verdict_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestVerdictCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.cache_dir, "verdicts.sqlite")
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_key_normalizes_prompt_only(self):
+        key = verdict_key("Google", "gemma", "About  AI", "Title: t")
+        self.assertEqual(key, verdict_key("Google", "gemma", " about ai\n", "Title: t"))
+        self.assertNotEqual(key, verdict_key("Google", "gemma", "About AI", "Title: u"))
+        self.assertNotEqual(key, verdict_key("Google", "other", "About AI", "Title: t"))
+        self.assertNotEqual(key, verdict_key("Claude", "gemma", "About AI", "Title: t"))
+
+    def test_persists_and_counts(self):
+        cache = VerdictCache(self.path)
+        cache.put("a", {"match": True, "confidence": 0.9, "reason": "r"})
+        cache.close()
+        reopened = VerdictCache(self.path)
+        self.assertEqual(
+            reopened.get_many(["a", "b"]),
+            {"a": {"match": True, "confidence": 0.9, "reason": "r"}},
+        )
+        self.assertEqual((reopened.hits, reopened.misses), (1, 1))
+
+    def test_ttl_expiry(self):
+        cache = VerdictCache(self.path, ttl_seconds=60, clock=self.clock)
+        cache.put("a", {"match": False})
+        self.clock.now += 30
+        self.assertIsNotNone(cache.get("a"))
+        self.clock.now += 31
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.purge_expired(), 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        cache = VerdictCache(self.path, max_entries=2, clock=self.clock)
+        cache.put("a", {"match": True})
+        self.clock.now += 1
+        cache.put("b", {"match": True})
+        self.clock.now += 1
+        cache.get("a")  # a is now more recently used than b
+        self.clock.now += 1
+        cache.put("c", {"match": True})
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(set(cache.get_many(["a", "b", "c"])), {"a", "c"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,10 @@
+import threading
+import time
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+import requests
 import web_search
+from content_cache import ContentCache
 
 
 class TestWebSearch(unittest.TestCase):
@@ -65,5 +69,122 @@ class TestWebSearch(unittest.TestCase):
         self.assertEqual(result, "DuckDuckGo fallback text")
 
 
+class TestFullTextFetcher(unittest.TestCase):
+    @patch("newspaper.Article")
+    def test_download_uses_pooled_session(self, mock_article):
+        mock_article.return_value.text = "Pooled text."
+        fetcher = web_search.FullTextFetcher()
+        with patch.object(fetcher._session, "get") as mock_get:
+            mock_get.return_value = MagicMock(text="<html></html>")
+            self.assertEqual(fetcher.download("http://example.com/a"), "Pooled text.")
+        mock_article.return_value.download.assert_called_once_with(
+            input_html="<html></html>"
+        )
+        self.assertEqual(mock_get.call_args.kwargs["timeout"], fetcher.timeout)
+
+    def test_fetch_all_caps_per_host_and_keeps_order(self):
+        fetcher = web_search.FullTextFetcher(max_workers=6, per_host=2)
+        active, peak, lock = {}, {}, threading.Lock()
+
+        def fake_fetch(url, session, timeout):
+            host = url.split("/")[2]
+            with lock:
+                active[host] = active.get(host, 0) + 1
+                peak[host] = max(peak.get(host, 0), active[host])
+            time.sleep(0.02)
+            with lock:
+                active[host] -= 1
+            return f"text of {url}"
+
+        articles = [(f"http://{h}.com/{i}", f"t{i}") for h in "ab" for i in range(4)]
+        progress = []
+        with patch("web_search.fetch_article_full_text", side_effect=fake_fetch):
+            texts = fetcher.fetch_all(
+                articles, on_progress=lambda done, total: progress.append(done)
+            )
+        self.assertEqual(texts, [f"text of {url}" for url, _ in articles])
+        self.assertEqual(peak, {"a.com": 2, "b.com": 2})
+        self.assertEqual(progress, list(range(1, 9)))
+
+    def test_fetch_all_deadline_skips_slow_articles(self):
+        fetcher = web_search.FullTextFetcher(max_workers=2, deadline=0.1)
+        release = threading.Event()
+
+        def fake_find(url, title, deadline=None):
+            if url == "slow":
+                release.wait(5)
+            return f"text of {url}"
+
+        with patch.object(fetcher, "find", side_effect=fake_find):
+            texts = fetcher.fetch_all([("fast", "f"), ("slow", "s")])
+        release.set()
+        self.assertEqual(texts, ["text of fast", None])
+
+    @patch("web_search.duckduckgo_search_similar_news")
+    def test_deadline_bounds_requests_and_fallback_searches(self, mock_duck):
+        fetcher = web_search.FullTextFetcher(timeout=15.0, deadline=0.2)
+        timeouts = []
+
+        def slow_get(url, session, timeout):
+            timeouts.append(timeout)
+            time.sleep(0.3)
+            raise requests.Timeout(url)
+
+        with patch("web_search.fetch_article_full_text", side_effect=slow_get):
+            texts = fetcher.fetch_all([("http://a.com/1", "t")])
+            time.sleep(0.2)
+        self.assertEqual(texts, [None])
+        self.assertLessEqual(timeouts[0], 0.2)
+        mock_duck.assert_not_called()
+        with self.assertRaises(TimeoutError):
+            web_search.find_full_text(
+                "http://a.com/1", "t", fetch=MagicMock(), deadline=time.monotonic()
+            )
+
+
+class TestCachedFullTextFetcher(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.cache = ContentCache(
+            ":memory:", max_age_seconds=60, clock=lambda: self.now
+        )
+        self.fetcher = web_search.FullTextFetcher(cache=self.cache)
+
+    @patch("web_search.extract_article_text", return_value="Article text.")
+    def test_fresh_pages_skip_the_network(self, mock_extract):
+        ok = MagicMock(status_code=200, text="<html></html>")
+        ok.headers = {"ETag": '"v1"'}
+        with patch.object(self.fetcher._session, "get", return_value=ok) as mock_get:
+            self.assertEqual(self.fetcher.download("http://a.com/1"), "Article text.")
+            self.assertEqual(self.fetcher.download("http://a.com/1"), "Article text.")
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(self.cache.get_html("http://a.com/1"), "<html></html>")
+
+    @patch("web_search.extract_article_text", return_value="Article text.")
+    def test_stale_pages_are_revalidated(self, mock_extract):
+        self.cache.put("http://a.com/1", "<html></html>", "Old text.", etag='"v1"')
+        self.now += 61
+        not_modified = MagicMock(status_code=304)
+        with patch.object(
+            self.fetcher._session, "get", return_value=not_modified
+        ) as mock_get:
+            self.assertEqual(self.fetcher.download("http://a.com/1"), "Old text.")
+        self.assertEqual(mock_get.call_args.kwargs["headers"]["If-None-Match"], '"v1"')
+        mock_extract.assert_not_called()
+        self.assertTrue(self.cache.get("http://a.com/1").fresh)
+
+    def test_blocked_pages_are_negatively_cached(self):
+        forbidden = requests.Response()
+        forbidden.status_code = 403
+        forbidden.url = "http://a.com/1"
+        with patch.object(
+            self.fetcher._session, "get", return_value=forbidden
+        ) as mock_get:
+            for _ in range(2):
+                with self.assertRaises(requests.HTTPError):
+                    self.fetcher.download("http://a.com/1")
+        self.assertEqual(mock_get.call_count, 1)
+
+
 if __name__ == "__main__":
     unittest.main()